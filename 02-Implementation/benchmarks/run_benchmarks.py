@@ -0,0 +1,252 @@
+"""
+Benchmarks of the dataset operations on a synthetic dataset.
+
+Every benchmark runs in a fresh process so that its peak memory is measured on its own.
+Run from the 02-Implementation folder, e.g.:
+
+    python -m benchmarks.run_benchmarks --images 2000 --boxes 10 --output results.json
+    python -m benchmarks.run_benchmarks --dataset /tmp/bench --baseline results.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.synthetic import DATASET_DIRECTORY, RAW_DIRECTORY, generate_dataset, load_dataset_info
+
+IMPLEMENTATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULT_VERSION = 1
+DEFAULT_TOLERANCE = 0.2  # Allowed relative loss of throughput or growth of peak memory
+
+
+def quiet(message: str):
+    pass
+
+
+def bench_convert(root: str, work_dir: str, info: Dict) -> int:
+    from core.converter import convert_all_images_in_directory
+
+    counts = convert_all_images_in_directory(os.path.join(root, RAW_DIRECTORY), info["width"], info["height"],
+                                             log=quiet, force=True)
+    return counts["converted"]
+
+
+def bench_coco(root: str, work_dir: str, info: Dict) -> int:
+    from core.coco import yolo_to_coco
+
+    yolo_to_coco(os.path.join(root, DATASET_DIRECTORY), {i: f"class{i}" for i in range(info["classes"])}, log=quiet,
+                 output_json=os.path.join(work_dir, "coco.json"))
+    return info["images"]
+
+
+def bench_voc(root: str, work_dir: str, info: Dict) -> int:
+    from core.voc import yolo_to_voc
+
+    counts = yolo_to_voc(os.path.join(root, DATASET_DIRECTORY), {i: f"class{i}" for i in range(info["classes"])},
+                         log=quiet, force=True)
+    return counts["written"]
+
+
+def bench_overlaps(root: str, work_dir: str, info: Dict) -> int:
+    from core.validation import find_overlapping_boxes
+
+    find_overlapping_boxes(os.path.join(root, DATASET_DIRECTORY), 0.5, log=quiet)
+    return info["images"]
+
+
+def bench_split(root: str, work_dir: str, info: Dict) -> int:
+    from core.splitter import write_split
+
+    splits = write_split(os.path.join(root, DATASET_DIRECTORY), 0.6, 0.2, 0.2, mode='list',
+                         output_dir=os.path.join(work_dir, "split"), log=quiet, incremental=False)
+    return sum(len(files) for files in splits.values())
+
+
+def bench_label_load(root: str, work_dir: str, info: Dict) -> int:
+    from core.yolo_labels import iter_label_files, read_yolo_labels
+
+    files = 0
+    for label_path in iter_label_files(os.path.join(root, DATASET_DIRECTORY)):
+        read_yolo_labels(label_path)
+        files += 1
+    return files
+
+
+def bench_label_store(root: str, work_dir: str, info: Dict) -> int:
+    from core.label_store import LABEL_STORE_DIRECTORY, sync_label_store
+
+    # Cold sync: every label file is read and packed
+    dataset_dir = os.path.join(root, DATASET_DIRECTORY)
+    shutil.rmtree(os.path.join(dataset_dir, LABEL_STORE_DIRECTORY), ignore_errors=True)
+    store = sync_label_store(dataset_dir, log=quiet)
+    return len(store)
+
+
+def bench_catalog(root: str, work_dir: str, info: Dict) -> int:
+    from core.catalog import DatasetCatalog
+
+    # Cold refresh: every image header and label file is read
+    catalog_path = os.path.join(work_dir, "catalog.sqlite")
+    with DatasetCatalog(os.path.join(root, DATASET_DIRECTORY), catalog_path) as catalog:
+        counts = catalog.refresh()
+    return counts["added"]
+
+
+# Benchmark name -> function(dataset root, empty work folder, dataset info) returning the number of images or
+# label files processed
+BENCHMARKS: Dict[str, Callable[[str, str, Dict], int]] = {
+    "convert": bench_convert,
+    "coco": bench_coco,
+    "voc": bench_voc,
+    "overlaps": bench_overlaps,
+    "split": bench_split,
+    "label_load": bench_label_load,
+    "label_store": bench_label_store,
+    "catalog": bench_catalog,
+}
+
+
+def peak_memory_mb() -> Dict[str, Optional[float]]:
+    """Return the peak resident memory of this process and of its finished children in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"peak_rss_mb": None, "children_peak_rss_mb": None}
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        "children_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+
+
+def run_one(name: str, root: str) -> Dict:
+    """Run one benchmark in this process and return its measurements."""
+    info = load_dataset_info(root)
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        start = time.perf_counter()
+        items = BENCHMARKS[name](root, work_dir, info)
+        seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {"seconds": seconds, "items": items, **peak_memory_mb()}
+
+
+def run_isolated(name: str, root: str) -> Dict:
+    """Run one benchmark in a fresh interpreter."""
+    completed = subprocess.run([sys.executable, "-m", "benchmarks.run_benchmarks", "--run-one", name, "--dataset", root],
+                               cwd=IMPLEMENTATION_DIR, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark {name} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    seconds = [run["seconds"] for run in runs]
+    median = statistics.median(seconds)
+    summary = {
+        "seconds": round(median, 4),
+        "min_seconds": round(min(seconds), 4),
+        "runs": [round(value, 4) for value in seconds],
+        "items": runs[0]["items"],
+        "items_per_second": round(runs[0]["items"] / median, 1) if median > 0 else None,
+    }
+    for key in ("peak_rss_mb", "children_peak_rss_mb"):
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = max(values) if values else None
+    return summary
+
+
+def environment() -> Dict:
+    import numpy
+    import PIL
+
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "numpy": numpy.__version__, "pillow": PIL.__version__}
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a message for every benchmark whose throughput or peak memory regressed beyond tolerance."""
+    regressions = []
+    for name, result in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        if previous.get("items_per_second") and result["items_per_second"] is not None \
+                and result["items_per_second"] < previous["items_per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['items_per_second']} items/s, "
+                               f"baseline {previous['items_per_second']} items/s")
+        for key in ("peak_rss_mb", "children_peak_rss_mb"):
+            if previous.get(key) and result[key] is not None and result[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {result[key]} MB, baseline {previous[key]} MB")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run_benchmarks", description=__doc__.splitlines()[1])
+    parser.add_argument("--dataset", default=None,
+                        help="Folder of the synthetic dataset, generated if it does not exist (default: a temporary folder)")
+    parser.add_argument("--images", type=int, default=1000, help="Number of images (default: 1000)")
+    parser.add_argument("--boxes", type=int, default=10, help="Boxes per image (default: 10)")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--classes", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark, the median is reported (default: 3)")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="Run only this benchmark, may be repeated")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--baseline", default=None, help="Results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative throughput loss or memory growth (default: 0.2)")
+    parser.add_argument("--run-one", default=None, help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one, args.dataset)))
+        return 0
+
+    root = args.dataset or tempfile.mkdtemp(prefix="yolo8_bench_")
+    try:
+        info = load_dataset_info(root)
+        if info is None:
+            info = generate_dataset(root, args.images, args.boxes, args.width, args.height, args.classes, args.seed)
+        else:
+            print(f"Using the existing dataset in {root}: {info['images']} images with {info['boxes']} boxes each")
+
+        results = {"version": RESULT_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "environment": environment(), "dataset": info, "results": {}}
+        for name in args.only or BENCHMARKS:
+            summary = summarize([run_isolated(name, root) for _ in range(args.repeat)])
+            results["results"][name] = summary
+            print(f"{name:<12} {summary['seconds']:>9.3f} s  {summary['items_per_second'] or 0:>12.1f} items/s  "
+                  f"peak {summary['peak_rss_mb']} MB (workers {summary['children_peak_rss_mb']} MB)")
+    finally:
+        if args.dataset is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"Regression: {message}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
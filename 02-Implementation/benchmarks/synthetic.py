@@ -0,0 +1,97 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from core.yolo_labels import format_yolo_labels
+
+DATASET_DIRECTORY = "dataset"  # Annotated .png images with their YOLO labels
+RAW_DIRECTORY = "raw"  # The same images in raw_format, input of the PNG conversion
+INFO_FILE = "synthetic.json"
+CHUNK_SIZE = 64  # Images generated per worker task
+
+
+def synthetic_labels(rng: np.random.Generator, boxes: int, classes: int):
+    """Return (class_ids, normalized xywh boxes) of random boxes covering 2% to 30% of each side."""
+    size = rng.uniform(0.02, 0.3, (boxes, 2))
+    center = size / 2 + rng.random((boxes, 2)) * (1 - size)
+    return rng.integers(0, classes, boxes), np.hstack([center, size])
+
+
+def _generate_chunk(output_dir: str, first: int, count: int, boxes: int, width: int, height: int,
+                    classes: int, seed: int, raw_format: Optional[str]):
+    from PIL import Image, ImageDraw
+
+    dataset_dir = os.path.join(output_dir, DATASET_DIRECTORY)
+    raw_dir = os.path.join(output_dir, RAW_DIRECTORY)
+    for index in range(first, first + count):
+        rng = np.random.default_rng([seed, index])
+        class_ids, xywh = synthetic_labels(rng, boxes, classes)
+        # A noisy background with the boxes filled in, so the files compress like real photos
+        pixels = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+        image = Image.fromarray(pixels)
+        draw = ImageDraw.Draw(image)
+        for class_id, (x, y, w, h) in zip(class_ids, xywh):
+            color = tuple(int(c) for c in rng.integers(64, 256, 3))
+            draw.rectangle([(x - w / 2) * width, (y - h / 2) * height, (x + w / 2) * width, (y + h / 2) * height],
+                           fill=color)
+        name = f"image{index:07d}"
+        image.save(os.path.join(dataset_dir, name + ".png"))
+        with open(os.path.join(dataset_dir, name + ".txt"), "w") as f:
+            f.write(format_yolo_labels(class_ids, xywh))
+        if raw_format:
+            image.save(os.path.join(raw_dir, f"{name}.{raw_format}"))
+    return count
+
+
+def generate_dataset(output_dir: str, images: int = 1000, boxes: int = 10, width: int = 640, height: int = 480,
+                     classes: int = 3, seed: int = 0, raw_format: Optional[str] = "jpg",
+                     max_workers: Optional[int] = None, log: Callable[[str], None] = print) -> Dict:
+    """
+    Write a synthetic YOLO dataset of random images and boxes.
+
+    output_dir/dataset receives the .png images with one .txt label file each and
+    output_dir/raw the same images in raw_format for the PNG conversion. The content only
+    depends on the parameters, so a dataset can be regenerated identically.
+
+    Args:
+        output_dir: Folder receiving the dataset.
+        images: Number of images.
+        boxes: Number of boxes per image.
+        width: Image width in pixels.
+        height: Image height in pixels.
+        classes: Number of class ids drawn from.
+        seed: Seed of the random content.
+        raw_format: Extension of the raw copies, None to skip them.
+        max_workers: Number of worker processes, defaults to the number of CPUs.
+        log: Callable receiving progress messages.
+
+    Returns:
+        The parameters, which are also stored in output_dir/synthetic.json.
+    """
+    info = {"images": images, "boxes": boxes, "width": width, "height": height, "classes": classes,
+            "seed": seed, "raw_format": raw_format}
+    os.makedirs(os.path.join(output_dir, DATASET_DIRECTORY), exist_ok=True)
+    if raw_format:
+        os.makedirs(os.path.join(output_dir, RAW_DIRECTORY), exist_ok=True)
+    log(f"Generating {images} images of {width}x{height} with {boxes} boxes each in {output_dir}")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_generate_chunk, output_dir, first, min(CHUNK_SIZE, images - first), boxes,
+                                   width, height, classes, seed, raw_format)
+                   for first in range(0, images, CHUNK_SIZE)]
+        for future in futures:
+            future.result()
+    with open(os.path.join(output_dir, INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+def load_dataset_info(output_dir: str) -> Optional[Dict]:
+    """Return the parameters of the synthetic dataset in output_dir, or None if there is none."""
+    try:
+        with open(os.path.join(output_dir, INFO_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,476 @@
+"""
+Headless command line interface for the YOLO8 annotation tool.
+
+Runs the dataset operations without PyQt6, e.g.:
+
+    python cli.py convert ./raw --width 640 --height 640
+    python cli.py export-coco ./dataset --class 0:person
+    python cli.py split ./dataset --train 0.6 --val 0.2 --test 0.2
+    python cli.py split ./dataset --mode hardlink --class 0:person
+    python cli.py --trace trace.json export-coco ./dataset
+"""
+import argparse
+import os
+import sys
+
+# Heavy modules (numpy, PIL) are imported inside the commands so that the CLI starts instantly.
+
+# Kept in sync with core.splitter.SPLIT_MODES, which imports numpy
+SPLIT_MODES = ["move", "list", "hardlink", "symlink", "reflink"]
+# Kept in sync with core.exporters.EXPORT_FORMATS; parquet needs pyarrow
+EXPORT_FORMATS = ["coco", "voc", "csv", "parquet"]
+DEFAULT_EXPORT_FORMATS = ["coco", "voc", "csv"]
+# Kept in sync with core.dedup.DEFAULT_MAX_DISTANCE
+DEFAULT_DEDUP_DISTANCE = 4
+
+
+def parse_class_mapping(values):
+    """Parse repeated 'ID:NAME' arguments into a class mapping."""
+    class_mapping = {}
+    for value in values or []:
+        class_id, sep, class_name = value.partition(":")
+        if not sep or not class_id.strip().isdigit() or not class_name:
+            raise argparse.ArgumentTypeError(f"Invalid class '{value}', expected ID:NAME")
+        class_mapping[int(class_id)] = class_name
+    return class_mapping
+
+
+def positive_int(value):
+    """argparse type of counts which must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Invalid value {value}, expected a number of at least 1")
+    return number
+
+
+def open_dataset_catalog(args):
+    """Open and refresh the catalog of args.directory unless --no-catalog was given."""
+    if args.no_catalog:
+        return None
+    from core.catalog import open_catalog
+
+    return open_catalog(args.directory)
+
+
+def open_dataset_label_store(args, catalog):
+    """Sync and return the label store of args.directory if --label-store was given."""
+    if not args.label_store:
+        return None
+    from core.label_store import sync_label_store
+
+    return sync_label_store(args.directory, catalog)
+
+
+def cmd_catalog(args):
+    from core.catalog import open_catalog
+
+    catalog = open_catalog(args.directory)
+    if catalog is None:
+        return 1
+    with catalog:
+        summary = catalog.summary()
+        print(f"{summary['images']} images, {summary['labeled']} labeled, "
+              f"{summary['unreadable']} unreadable, {summary['boxes']} boxes")
+        for class_id, count in catalog.class_image_counts().items():
+            print(f"class {class_id}: {count} images")
+    return 0
+
+
+def cmd_label_store(args):
+    from core.label_store import export_label_store, sync_label_store
+
+    catalog = open_dataset_catalog(args)
+    try:
+        store = sync_label_store(args.directory, catalog)
+    finally:
+        if catalog is not None:
+            catalog.close()
+    if args.export:
+        export_label_store(store, args.export)
+    return 0
+
+
+def cmd_convert(args):
+    from core.converter import convert_all_images_in_directory
+
+    counts = convert_all_images_in_directory(args.directory, args.width, args.height,
+                                             max_workers=args.workers, force=args.force)
+    return 1 if counts["failed"] else 0
+
+
+def cmd_export_coco(args):
+    from core.coco import yolo_to_coco
+
+    class_mapping = parse_class_mapping(args.classes)
+    catalog = open_dataset_catalog(args)
+    try:
+        label_store = open_dataset_label_store(args, catalog)
+        yolo_to_coco(args.directory, class_mapping, compact=args.compact, catalog=catalog, label_store=label_store)
+    finally:
+        if catalog is not None:
+            catalog.close()
+    return 0
+
+
+def cmd_export(args):
+    from core.exporters import create_sinks, export_dataset
+
+    class_mapping = parse_class_mapping(args.classes)
+    formats = list(dict.fromkeys(args.formats or DEFAULT_EXPORT_FORMATS))
+    options = {"coco": {"compact": args.compact}, "voc": {"force": args.force, "max_workers": args.workers}}
+    catalog = open_dataset_catalog(args)
+    try:
+        label_store = open_dataset_label_store(args, catalog)
+        sinks = create_sinks(formats, args.directory, class_mapping, options=options)
+        export_dataset(args.directory, sinks, catalog=catalog, label_store=label_store)
+    except ImportError as e:
+        print(f"Export failed: {e}")
+        return 1
+    finally:
+        if catalog is not None:
+            catalog.close()
+    return 0
+
+
+def cmd_import_coco(args):
+    from core.importers import import_coco
+
+    try:
+        import_coco(args.annotations, args.directory, parse_class_mapping(args.classes), overwrite=args.overwrite,
+                    skip_crowd=not args.keep_crowd)
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}")
+        return 1
+    return 0
+
+
+def cmd_import_voc(args):
+    from core.importers import import_voc
+
+    _, counts = import_voc(args.directory, args.images, parse_class_mapping(args.classes), overwrite=args.overwrite,
+                           max_workers=args.workers)
+    return 1 if counts["failed"] else 0
+
+
+def cmd_export_voc(args):
+    from core.voc import yolo_to_voc
+
+    class_mapping = parse_class_mapping(args.classes)
+    catalog = open_dataset_catalog(args)
+    try:
+        counts = yolo_to_voc(args.directory, class_mapping, catalog=catalog,
+                             label_store=open_dataset_label_store(args, catalog), force=args.force,
+                             max_workers=args.workers)
+    finally:
+        if catalog is not None:
+            catalog.close()
+    return 1 if counts["failed"] else 0
+
+
+def cmd_dedup(args):
+    from core.dedup import find_duplicate_groups
+    from core.splitter import find_labeled_images
+
+    catalog = open_dataset_catalog(args)
+    try:
+        if args.all_images:
+            if catalog is not None:
+                image_paths = catalog.image_paths(args.directory)
+            else:
+                from core.yolo_labels import IMAGE_EXTENSIONS, is_split_output
+
+                image_paths = []
+                for root, dirs, names in os.walk(args.directory):
+                    dirs[:] = [d for d in dirs if not is_split_output(os.path.join(root, d))]
+                    image_paths += [os.path.join(root, name) for name in sorted(names)
+                                    if os.path.splitext(name)[1] in IMAGE_EXTENSIONS]
+        else:
+            image_paths = [image for image, _ in find_labeled_images(args.directory, catalog)]
+        groups = find_duplicate_groups(image_paths, args.distance, catalog, max_workers=args.workers)
+    finally:
+        if catalog is not None:
+            catalog.close()
+    for group in groups:
+        print()
+        for image_path in group:
+            print(image_path)
+    return 0
+
+
+def cmd_split(args):
+    from core.splitter import organize_files, write_split
+
+    ratio_sum = args.train + args.val + args.test
+    if round(ratio_sum, 6) != 1:
+        print(f"{ratio_sum} is not equal to 1.0")
+        return 2
+    class_mapping = parse_class_mapping(args.classes) or None
+    catalog = open_dataset_catalog(args)
+    try:
+        if args.mode == "move":
+            splits = organize_files(args.directory, args.train, args.val, args.test, catalog=catalog,
+                                    stratify=args.stratify, dedup_distance=args.dedup)
+        else:
+            splits = write_split(args.directory, args.train, args.val, args.test, args.mode,
+                                 output_dir=args.output, class_mapping=class_mapping,
+                                 max_workers=args.workers, catalog=catalog, stratify=args.stratify,
+                                 incremental=not args.reassign, dedup_distance=args.dedup)
+    except OSError as e:
+        print(f"Split failed: {e}")
+        return 1
+    finally:
+        if catalog is not None:
+            catalog.close()
+    for split, files in splits.items():
+        print(f"{split}: {len(files)} files")
+    return 0
+
+
+def cmd_augment(args):
+    from core.augment import AugmentOptions, augment_dataset
+
+    output_size = (args.width, args.height) if args.width and args.height else None
+    options = AugmentOptions(flip_probability=args.flip, crop_probability=args.crop,
+                             max_rotation=args.rotation, color_jitter=args.jitter, output_size=output_size)
+    catalog = open_dataset_catalog(args)
+    try:
+        counts = augment_dataset(args.directory, args.variants, args.seed, options, output_dir=args.output,
+                                 max_workers=args.workers, catalog=catalog)
+    finally:
+        if catalog is not None:
+            catalog.close()
+    return 1 if counts["failed"] else 0
+
+
+def cmd_preannotate(args):
+    from core.preannotate import preannotate_folder
+
+    catalog = open_dataset_catalog(args)
+    try:
+        counts = preannotate_folder(args.directory, args.model, input_size=args.size, batch_size=args.batch,
+                                    conf_threshold=args.conf, iou_threshold=args.iou, overwrite=args.overwrite,
+                                    max_workers=args.workers, catalog=catalog)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Pre-annotation failed: {e}")
+        return 1
+    finally:
+        if catalog is not None:
+            catalog.close()
+    return 1 if counts["failed"] else 0
+
+
+def cmd_validate(args):
+    from core.validation import find_missing_annotations, find_unreadable_images
+
+    catalog = open_dataset_catalog(args)
+    try:
+        unreadable_images = find_unreadable_images(args.directory, catalog)
+        txt_files, missing_files = find_missing_annotations(args.directory, catalog)
+    finally:
+        if catalog is not None:
+            catalog.close()
+    if unreadable_images:
+        print("The following .png files cannot be read:")
+        print("\n".join(unreadable_images))
+        return 1
+    if not txt_files:
+        print("Missing Annotation .txt files")
+        return 1
+    if missing_files:
+        print("The following .png files do not have corresponding annotation .txt files:")
+        print("\n".join(missing_files))
+        return 1
+    print("All annotation .txt files exist for corresponding .png files.")
+    return 0
+
+
+def cmd_overlaps(args):
+    from core.validation import find_overlapping_boxes
+
+    catalog = open_dataset_catalog(args)
+    try:
+        overlaps = find_overlapping_boxes(args.directory, args.iou, recursive=args.recursive,
+                                          max_workers=args.workers, catalog=catalog,
+                                          label_store=open_dataset_label_store(args, catalog))
+    finally:
+        if catalog is not None:
+            catalog.close()
+    if overlaps:
+        print("The following files have overlapping annotations:")
+        for txt_file, pairs in overlaps.items():
+            for i, j, iou in pairs:
+                print(f"{txt_file}: box {i} and box {j} (IoU {iou:.3f})")
+        return 1
+    print("No overlapping annotations found.")
+    return 0
+
+
+def build_parser():
+    """Create the argument parser with one sub command per dataset operation."""
+    parser = argparse.ArgumentParser(prog="cli.py", description="YOLO8 annotation tool (headless)")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="Write a Chrome trace (chrome://tracing, ui.perfetto.dev) and print a timing summary")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert and resize all images in a folder to PNG")
+    convert.add_argument("directory")
+    convert.add_argument("--width", type=int, default=640)
+    convert.add_argument("--height", type=int, default=640)
+    convert.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    convert.add_argument("--force", action="store_true", help="Convert files even if they are up to date")
+    convert.set_defaults(func=cmd_convert)
+
+    for name, func, help_text in [
+        ("export-coco", cmd_export_coco, "Export YOLO labels to a COCO JSON file"),
+        ("export-voc", cmd_export_voc, "Export YOLO labels to VOC XML files"),
+    ]:
+        export = subparsers.add_parser(name, help=help_text)
+        export.add_argument("directory")
+        export.add_argument("--class", dest="classes", action="append", metavar="ID:NAME",
+                            help="Class id and name, may be repeated (e.g. 0:person)")
+        export.add_argument("--no-catalog", action="store_true", help="Scan the files instead of using the catalog")
+        export.add_argument("--label-store", action="store_true", help="Read the boxes from the synced label store")
+        export.set_defaults(func=func)
+        if name == "export-coco":
+            export.add_argument("--compact", action="store_true", help="Write the JSON without indentation")
+        else:
+            export.add_argument("--force", action="store_true", help="Rewrite XML files which are up to date")
+            export.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+
+    export = subparsers.add_parser("export", help="Export YOLO labels to several formats in a single pass")
+    export.add_argument("directory")
+    export.add_argument("--format", dest="formats", action="append", choices=EXPORT_FORMATS,
+                        help="Output format, may be repeated (default: coco, voc and csv)")
+    export.add_argument("--class", dest="classes", action="append", metavar="ID:NAME",
+                        help="Class id and name, may be repeated (e.g. 0:person)")
+    export.add_argument("--no-catalog", action="store_true", help="Scan the files instead of using the catalog")
+    export.add_argument("--label-store", action="store_true", help="Read the boxes from the synced label store")
+    export.add_argument("--compact", action="store_true", help="Write the COCO JSON without indentation")
+    export.add_argument("--force", action="store_true", help="Rewrite VOC XML files which are up to date")
+    export.add_argument("--workers", type=int, default=None, help="VOC worker processes (default: all CPUs)")
+    export.set_defaults(func=cmd_export)
+
+    import_coco = subparsers.add_parser("import-coco", help="Write the boxes of a COCO JSON file as YOLO labels")
+    import_coco.add_argument("annotations", help="COCO JSON file, read incrementally")
+    import_coco.add_argument("directory", help="Folder the image file names are relative to, receives the labels")
+    import_coco.add_argument("--class", dest="classes", action="append", metavar="ID:NAME",
+                             help="Class id of a category name, may be repeated (default: all categories from 0)")
+    import_coco.add_argument("--overwrite", action="store_true", help="Also replace existing label files")
+    import_coco.add_argument("--keep-crowd", action="store_true", help="Also import iscrowd annotations")
+    import_coco.set_defaults(func=cmd_import_coco)
+
+    import_voc = subparsers.add_parser("import-voc", help="Write the boxes of VOC XML files as YOLO labels")
+    import_voc.add_argument("directory", help="Folder containing the .xml files")
+    import_voc.add_argument("--images", default=None,
+                            help="Folder of the images, receives the labels (default: next to each .xml file)")
+    import_voc.add_argument("--class", dest="classes", action="append", metavar="ID:NAME",
+                            help="Class id of an object name, may be repeated (default: names from 0 as first seen)")
+    import_voc.add_argument("--overwrite", action="store_true", help="Also replace existing label files")
+    import_voc.add_argument("--workers", type=int, default=None, help="Parsing processes (default: all CPUs)")
+    import_voc.set_defaults(func=cmd_import_voc)
+
+    dedup = subparsers.add_parser("dedup", help="List groups of duplicate and near-duplicate images")
+    dedup.add_argument("directory")
+    dedup.add_argument("--distance", type=int, default=DEFAULT_DEDUP_DISTANCE,
+                       help=f"Differing perceptual hash bits of near-duplicates (default: {DEFAULT_DEDUP_DISTANCE})")
+    dedup.add_argument("--all-images", action="store_true",
+                       help="Compare every image below the folder, not only the labeled ones in it")
+    dedup.add_argument("--workers", type=int, default=None, help="Hashing processes (default: all CPUs)")
+    dedup.add_argument("--no-catalog", action="store_true", help="Scan the files instead of using the catalog")
+    dedup.set_defaults(func=cmd_dedup)
+
+    split = subparsers.add_parser("split", help="Split a dataset into train, val and test folders")
+    split.add_argument("directory")
+    split.add_argument("--train", type=float, default=0.6)
+    split.add_argument("--val", type=float, default=0.2)
+    split.add_argument("--test", type=float, default=0.2)
+    split.add_argument("--mode", choices=SPLIT_MODES, default="move",
+                       help="move the files (default), only write list files, or link them into the split folders")
+    split.add_argument("--output", default=None, help="Output folder of the list files (default: <folder>/test_dataset)")
+    split.add_argument("--class", dest="classes", action="append", metavar="ID:NAME",
+                       help="Class id and name for dataset.yaml, may be repeated")
+    split.add_argument("--workers", type=int, default=None, help="Linking threads")
+    split.add_argument("--stratify", action="store_true", help="Keep the class balance of every split")
+    split.add_argument("--reassign", action="store_true",
+                       help="Place every image again instead of keeping the splits of the previous run")
+    split.add_argument("--dedup", type=int, nargs="?", const=DEFAULT_DEDUP_DISTANCE, default=None, metavar="BITS",
+                       help="Keep near-duplicate images in one split; BITS is the perceptual hash distance "
+                            f"(default: {DEFAULT_DEDUP_DISTANCE})")
+    split.add_argument("--no-catalog", action="store_true", help="Scan the files instead of using the catalog")
+    split.set_defaults(func=cmd_split)
+
+    augment = subparsers.add_parser("augment", help="Write augmented copies of the labeled images with their labels")
+    augment.add_argument("directory")
+    augment.add_argument("--variants", type=positive_int, default=10, help="Augmented copies per image (default: 10)")
+    augment.add_argument("--seed", type=int, default=0, help="Seed, the same seed gives the same output")
+    augment.add_argument("--flip", type=float, default=0.5, help="Probability of a horizontal flip")
+    augment.add_argument("--crop", type=float, default=0.5, help="Probability of a random crop")
+    augment.add_argument("--rotation", type=float, default=10.0, help="Maximum rotation in degrees")
+    augment.add_argument("--jitter", type=float, default=0.3, help="Brightness, contrast and color jitter")
+    augment.add_argument("--width", type=int, default=None, help="Resize the output to this width")
+    augment.add_argument("--height", type=int, default=None, help="Resize the output to this height")
+    augment.add_argument("--output", default=None, help="Output folder (default: <folder>/augmented)")
+    augment.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    augment.add_argument("--no-catalog", action="store_true", help="Scan the files instead of using the catalog")
+    augment.set_defaults(func=cmd_augment)
+
+    preannotate = subparsers.add_parser("preannotate", help="Write the detections of an ONNX model as YOLO labels")
+    preannotate.add_argument("directory")
+    preannotate.add_argument("model", help="ONNX detection model, e.g. exported with 'yolo export format=onnx'")
+    preannotate.add_argument("--size", type=int, default=None, help="Model input size (default: from the model or 640)")
+    preannotate.add_argument("--batch", type=int, default=8, help="Images per inference batch (default: 8)")
+    preannotate.add_argument("--conf", type=float, default=0.25, help="Confidence threshold (default: 0.25)")
+    preannotate.add_argument("--iou", type=float, default=0.45, help="NMS IoU threshold (default: 0.45)")
+    preannotate.add_argument("--overwrite", action="store_true", help="Also replace existing label files")
+    preannotate.add_argument("--workers", type=int, default=None, help="Decoding processes (default: all CPUs)")
+    preannotate.add_argument("--no-catalog", action="store_true", help="Scan the files instead of using the catalog")
+    preannotate.set_defaults(func=cmd_preannotate)
+
+    validate = subparsers.add_parser("validate", help="Check that every .png image has a .txt annotation")
+    validate.add_argument("directory")
+    validate.add_argument("--no-catalog", action="store_true", help="Scan the files instead of using the catalog")
+    validate.set_defaults(func=cmd_validate)
+
+    overlaps = subparsers.add_parser("overlaps", help="List annotation files with overlapping boxes")
+    overlaps.add_argument("directory")
+    overlaps.add_argument("--iou", type=float, default=0.5, help="IoU threshold (default: 0.5)")
+    overlaps.add_argument("--recursive", action="store_true", help="Also scan the sub directories")
+    overlaps.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    overlaps.add_argument("--no-catalog", action="store_true", help="Scan the files instead of using the catalog")
+    overlaps.add_argument("--label-store", action="store_true", help="Read the boxes from the synced label store")
+    overlaps.set_defaults(func=cmd_overlaps)
+
+    catalog = subparsers.add_parser("catalog", help="Refresh the dataset catalog and print a summary")
+    catalog.add_argument("directory")
+    catalog.set_defaults(func=cmd_catalog)
+
+    label_store = subparsers.add_parser("label-store", help="Sync the packed label store with the label files")
+    label_store.add_argument("directory")
+    label_store.add_argument("--export", default=None, metavar="FOLDER",
+                             help="Write the stored labels back as .txt files into FOLDER")
+    label_store.add_argument("--no-catalog", action="store_true", help="Scan the files instead of using the catalog")
+    label_store.set_defaults(func=cmd_label_store)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.trace:
+        from core import tracing
+
+        tracing.enable()
+    try:
+        return args.func(args)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    finally:
+        if args.trace:
+            count = tracing.export_chrome_trace(args.trace)
+            print(tracing.format_summary())
+            print(f"{count} trace events written to {args.trace}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
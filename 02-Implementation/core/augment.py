@@ -0,0 +1,237 @@
+import hashlib
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from core.splitter import find_labeled_images
+from core.yolo_labels import format_yolo_labels, read_yolo_labels, write_text_atomic, xywhn_to_xyxy, xyxy_to_xywhn
+
+OUTPUT_DIRECTORY = 'augmented'
+PROGRESS_INTERVAL = 100  # Number of source images between two progress messages
+
+
+class AugmentOptions(NamedTuple):
+    """Random augmentation parameters, every variant draws its own values from these ranges."""
+    flip_probability: float = 0.5
+    crop_probability: float = 0.5
+    min_crop_scale: float = 0.6  # Smallest crop side as a fraction of the image side
+    max_rotation: float = 10.0  # Degrees, drawn uniformly from [-max_rotation, max_rotation]
+    color_jitter: float = 0.3  # Brightness, contrast and color factors are drawn from 1 +- color_jitter
+    output_size: Optional[Tuple[int, int]] = None  # (width, height), defaults to the source size
+    min_visibility: float = 0.3  # Boxes keeping less of their area after cropping are dropped
+
+
+def flip_boxes(boxes: np.ndarray, width: float) -> np.ndarray:
+    """Mirror (N, 4) absolute xyxy boxes horizontally in an image of the given width."""
+    flipped = boxes.copy()
+    flipped[:, 0] = width - boxes[:, 2]
+    flipped[:, 2] = width - boxes[:, 0]
+    return flipped
+
+
+def crop_boxes(boxes: np.ndarray, crop: Tuple[float, float, float, float],
+               min_visibility: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Move (N, 4) absolute xyxy boxes into a crop window and clip them to it.
+
+    Args:
+        boxes: Boxes in the coordinates of the uncropped image.
+        crop: Crop window (left, top, right, bottom).
+        min_visibility: Minimum fraction of its area a box must keep to be retained.
+
+    Returns:
+        A tuple (boxes, keep) with the clipped boxes in crop coordinates and the boolean mask of
+        the retained input boxes.
+    """
+    left, top, right, bottom = crop
+    clipped = boxes - np.array([left, top, left, top], dtype=boxes.dtype)
+    clipped[:, [0, 2]] = np.clip(clipped[:, [0, 2]], 0, right - left)
+    clipped[:, [1, 3]] = np.clip(clipped[:, [1, 3]], 0, bottom - top)
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    clipped_area = (clipped[:, 2] - clipped[:, 0]) * (clipped[:, 3] - clipped[:, 1])
+    keep = (clipped_area > 0) & (clipped_area >= min_visibility * np.maximum(area, 1e-12))
+    return clipped[keep], keep
+
+
+def rotate_boxes(boxes: np.ndarray, angle: float, width: float, height: float) -> np.ndarray:
+    """
+    Rotate (N, 4) absolute xyxy boxes like PIL's Image.rotate(angle) around the image center.
+
+    Each box is replaced by the axis aligned bounds of its rotated corners, clipped to the image.
+    """
+    radians = np.deg2rad(angle)
+    cos, sin = np.cos(radians), np.sin(radians)
+    cx, cy = width / 2, height / 2
+    # Corners as (N, 4) x and y arrays: top-left, top-right, bottom-right, bottom-left
+    xs = boxes[:, [0, 2, 2, 0]] - cx
+    ys = boxes[:, [1, 1, 3, 3]] - cy
+    # Counter-clockwise on screen, where the y axis points down
+    rotated_x = cx + xs * cos + ys * sin
+    rotated_y = cy - xs * sin + ys * cos
+    rotated = np.stack([rotated_x.min(axis=1), rotated_y.min(axis=1),
+                        rotated_x.max(axis=1), rotated_y.max(axis=1)], axis=1)
+    rotated[:, [0, 2]] = np.clip(rotated[:, [0, 2]], 0, width)
+    rotated[:, [1, 3]] = np.clip(rotated[:, [1, 3]], 0, height)
+    return rotated
+
+
+def resize_boxes(boxes: np.ndarray, scale_x: float, scale_y: float) -> np.ndarray:
+    """Scale (N, 4) absolute xyxy boxes."""
+    return boxes * np.array([scale_x, scale_y, scale_x, scale_y], dtype=boxes.dtype)
+
+
+def augment_sample(image, class_ids: np.ndarray, boxes: np.ndarray, rng: np.random.Generator,
+                   options: AugmentOptions = AugmentOptions()):
+    """
+    Apply one random flip, crop, rotation, color jitter and resize to an image and its boxes.
+
+    Args:
+        image: PIL image, left unchanged.
+        class_ids: Array of shape (N,) with the class id of every box.
+        boxes: Array of shape (N, 4) with normalized xywh boxes.
+        rng: Random generator deciding every parameter.
+        options: Parameter ranges.
+
+    Returns:
+        A tuple (image, class_ids, boxes) with the augmented image and its normalized xywh boxes.
+    """
+    from PIL import Image, ImageEnhance
+
+    width, height = image.size
+    xyxy = xywhn_to_xyxy(boxes, width, height)
+    class_ids = np.asarray(class_ids)
+
+    if rng.random() < options.flip_probability:
+        image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        xyxy = flip_boxes(xyxy, width)
+
+    if rng.random() < options.crop_probability:
+        crop_width = int(width * rng.uniform(options.min_crop_scale, 1.0))
+        crop_height = int(height * rng.uniform(options.min_crop_scale, 1.0))
+        left = int(rng.integers(0, width - crop_width + 1))
+        top = int(rng.integers(0, height - crop_height + 1))
+        crop = (left, top, left + crop_width, top + crop_height)
+        image = image.crop(crop)
+        xyxy, keep = crop_boxes(xyxy, crop, options.min_visibility)
+        class_ids = class_ids[keep]
+        width, height = crop_width, crop_height
+
+    if options.max_rotation:
+        angle = float(rng.uniform(-options.max_rotation, options.max_rotation))
+        image = image.rotate(angle, resample=Image.Resampling.BILINEAR)
+        xyxy = rotate_boxes(xyxy, angle, width, height)
+
+    if options.color_jitter:
+        low, high = 1.0 - options.color_jitter, 1.0 + options.color_jitter
+        image = ImageEnhance.Brightness(image).enhance(rng.uniform(low, high))
+        image = ImageEnhance.Contrast(image).enhance(rng.uniform(low, high))
+        if image.mode in ("RGB", "RGBA"):
+            image = ImageEnhance.Color(image).enhance(rng.uniform(low, high))
+
+    if options.output_size is not None and tuple(options.output_size) != (width, height):
+        out_width, out_height = options.output_size
+        image = image.resize((out_width, out_height), Image.Resampling.BILINEAR)
+        xyxy = resize_boxes(xyxy, out_width / width, out_height / height)
+        width, height = out_width, out_height
+
+    # Drop boxes which collapsed to a line
+    valid = (xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])
+    return image, class_ids[valid], xyxy_to_xywhn(xyxy[valid], width, height)
+
+
+def sample_seed(seed: int, stem: str) -> int:
+    """Per image seed, independent of the processing order and the number of workers."""
+    return int.from_bytes(hashlib.sha1(f"{seed}:{stem}".encode("utf-8")).digest()[:8], "big")
+
+
+def _augment_task(image_path: str, label_path: str, output_dir: str, variants: int, seed: int,
+                  options: AugmentOptions) -> Tuple[int, List[str]]:
+    """Write the augmented variants of one image and return (written, messages) (runs in a worker)."""
+    from PIL import Image
+
+    messages = []
+    try:
+        class_ids, boxes = read_yolo_labels(label_path, messages.append)
+        with Image.open(image_path) as img:
+            img.load()
+            image = img if img.mode in ("1", "L", "P", "RGB", "RGBA") else img.convert("RGB")
+            if image.mode in ("1", "P"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+            stem = os.path.splitext(os.path.basename(image_path))[0]
+            rng = np.random.default_rng(sample_seed(seed, stem))
+            for variant in range(variants):
+                augmented, new_ids, new_boxes = augment_sample(image, class_ids, boxes, rng, options)
+                name = f"{stem}_aug{variant}"
+                # Both files are renamed into place, an interrupted run never leaves a truncated one
+                augmented_path = os.path.join(output_dir, name + ".png")
+                augmented.save(augmented_path + ".part", "PNG")
+                os.replace(augmented_path + ".part", augmented_path)
+                write_text_atomic(os.path.join(output_dir, name + ".txt"), format_yolo_labels(new_ids, new_boxes))
+    except Exception as e:
+        return 0, messages + [f"Failed to augment {image_path}: {e}"]
+    return variants, messages
+
+
+def augment_dataset(source_dir: str, variants: int = 10, seed: int = 0,
+                    options: AugmentOptions = AugmentOptions(), output_dir: Optional[str] = None,
+                    log: Callable[[str], None] = print, max_workers: Optional[int] = None,
+                    catalog=None) -> Dict[str, int]:
+    """
+    Write augmented copies of every labeled image in source_dir together with their YOLO labels.
+
+    Images are processed in a process pool. The random parameters of an image only depend on
+    seed and the image name, so a run can be repeated with identical results.
+
+    Args:
+        source_dir: The directory containing the images and label files.
+        variants: Number of augmented copies per image.
+        seed: Seed of the random parameters.
+        options: Augmentation parameter ranges.
+        output_dir: Output folder, defaults to source_dir/augmented.
+        log: Callable receiving progress and error messages.
+        max_workers: Number of worker processes, defaults to the number of CPUs.
+        catalog: Optional DatasetCatalog containing source_dir, queried for the labeled images.
+
+    Returns:
+        Counts of 'images' augmented, 'written' variants and 'failed' images.
+
+    Raises:
+        ValueError: If variants is less than 1.
+    """
+    if variants < 1:
+        raise ValueError(f"Invalid number of variants {variants}, expected at least 1")
+    output_dir = output_dir or os.path.join(source_dir, OUTPUT_DIRECTORY)
+    os.makedirs(output_dir, exist_ok=True)
+    pairs = find_labeled_images(source_dir, catalog)
+    log(f"Augmenting {len(pairs)} images with {variants} variants each into {output_dir}")
+
+    counts = {"images": 0, "written": 0, "failed": 0}
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_workers * 4
+    pending = set()
+
+    def collect(done_futures):
+        for future in done_futures:
+            pending.discard(future)
+            written, messages = future.result()
+            for message in messages:
+                log(message)
+            counts["images" if written else "failed"] += 1
+            counts["written"] += written
+            processed = counts["images"] + counts["failed"]
+            if processed % PROGRESS_INTERVAL == 0:
+                log(f"Augmented {processed} of {len(pairs)} images")
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for image_path, label_path in pairs:
+            pending.add(executor.submit(_augment_task, image_path, label_path, output_dir, variants, seed, options))
+            # Bound the number of queued tasks so that huge folders do not fill the memory
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(list(pending))
+
+    log(f"Augmentation complete. {counts['written']} images written, {counts['failed']} failed.")
+    return counts
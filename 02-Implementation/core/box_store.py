@@ -0,0 +1,265 @@
+"""
+Array-backed storage of the boxes of one image, with an undo log.
+
+Boxes are addressed by stable integer ids and stored as rows of NumPy arrays (class, x1, y1,
+x2, y2). Every edit is recorded as a fixed size command in a structured array; undo and redo
+move a cursor through it and apply one command, at a cost independent of the number of boxes.
+
+    store = BoxStore()
+    box_id = store.add(0, 10, 20, 110, 80)
+    store.move(box_id, 5, 0)
+    store.undo()
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+ADD, DELETE, MOVE, RESIZE, CLASS = range(1, 6)  # Command codes of the log
+UNASSIGNED_CLASS = -1  # Class of boxes which take the class chosen when they are saved
+INITIAL_CAPACITY = 64
+
+LOG_DTYPE = np.dtype([
+    ("op", np.uint8),
+    ("id", np.int64),
+    ("class_before", np.int32), ("class_after", np.int32),
+    ("box_before", np.float64, 4), ("box_after", np.float64, 4),
+])
+
+
+class BoxStore:
+    """
+    The boxes of one image keyed by stable ids, with a command log covering add, delete, move,
+    resize and class change.
+
+    Rows keep the order in which the boxes were added. A deleted row stays in place, marked as
+    dead, so undoing the deletion revives it where it was. The alive rows are also linked to
+    their neighbours, which keeps the last box at hand; since undo and redo run in reverse
+    order, a revived row finds its old neighbours alive again and relinks between them.
+    Edits, undo and redo cost amortized O(1).
+    """
+
+    def __init__(self):
+        self._ids = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self._classes = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self._boxes = np.zeros((INITIAL_CAPACITY, 4), dtype=np.float64)
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._prev = np.zeros(INITIAL_CAPACITY, dtype=np.int64)  # Previous alive row, -1 for none
+        self._next = np.zeros(INITIAL_CAPACITY, dtype=np.int64)  # Next alive row, -1 for none
+        self._rows = 0  # Used rows
+        self._dead = 0  # Dead rows below self._rows
+        self._last = -1  # Last alive row
+        self._index: Dict[int, int] = {}  # id -> row, also of dead rows which may be revived
+        self._next_id = 0
+        self._log = np.zeros(INITIAL_CAPACITY, dtype=LOG_DTYPE)
+        self._log_size = 0  # Recorded commands, those from self._cursor on can be redone
+        self._cursor = 0
+        self.version = 0  # Incremented by every change, e.g. to cache a rendering of the boxes
+
+    def __len__(self) -> int:
+        return self._rows - self._dead
+
+    def __contains__(self, box_id: int) -> bool:
+        row = self._index.get(box_id)
+        return row is not None and bool(self._alive[row])
+
+    # Reading
+
+    def ids(self) -> np.ndarray:
+        """Return the ids of the boxes in insertion order."""
+        return self._ids[:self._rows][self._alive[:self._rows]]
+
+    def classes(self) -> np.ndarray:
+        """Return the class ids of the boxes in insertion order."""
+        return self._classes[:self._rows][self._alive[:self._rows]]
+
+    def boxes(self) -> np.ndarray:
+        """Return the (N, 4) x1, y1, x2, y2 boxes in insertion order."""
+        return self._boxes[:self._rows][self._alive[:self._rows]]
+
+    def get(self, box_id: int) -> Tuple[int, Tuple[float, float, float, float]]:
+        """Return (class_id, (x1, y1, x2, y2)) of a box; raises KeyError for unknown ids."""
+        row = self._row(box_id)
+        return int(self._classes[row]), tuple(self._boxes[row].tolist())
+
+    def last_id(self) -> Optional[int]:
+        """Return the id of the last box in insertion order, None if there is none."""
+        return int(self._ids[self._last]) if self._last >= 0 else None
+
+    def _row(self, box_id: int) -> int:
+        row = self._index.get(box_id)
+        if row is None or not self._alive[row]:
+            raise KeyError(f"No box with id {box_id}")
+        return row
+
+    # Storage
+
+    def _grow(self, rows: int):
+        capacity = len(self._ids)
+        if rows <= capacity:
+            return
+        capacity = max(rows, capacity * 2)
+        self._ids = np.resize(self._ids, capacity)
+        self._classes = np.resize(self._classes, capacity)
+        self._boxes = np.resize(self._boxes, (capacity, 4))
+        self._prev = np.resize(self._prev, capacity)
+        self._next = np.resize(self._next, capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._rows] = self._alive[:self._rows]
+        self._alive = alive
+
+    def _insert(self, box_id: int, class_id: int, box) -> int:
+        """Make box_id alive with the given values, reviving its old row if it still exists."""
+        row = self._index.get(box_id)
+        if row is None:
+            # New ids are the largest so far: appending keeps the order
+            self._grow(self._rows + 1)
+            row = self._rows
+            self._rows += 1
+            self._ids[row] = box_id
+            self._index[box_id] = row
+            self._prev[row], self._next[row] = self._last, -1
+        else:
+            self._dead -= 1
+        previous, following = self._prev[row], self._next[row]
+        if previous >= 0:
+            self._next[previous] = row
+        if following >= 0:
+            self._prev[following] = row
+        else:
+            self._last = row
+        self._classes[row] = class_id
+        self._boxes[row] = box
+        self._alive[row] = True
+        self.version += 1
+        return row
+
+    def _remove(self, box_id: int):
+        row = self._row(box_id)
+        self._alive[row] = False
+        self._dead += 1
+        # The row keeps its links for a revival
+        previous, following = self._prev[row], self._next[row]
+        if previous >= 0:
+            self._next[previous] = following
+        if following >= 0:
+            self._prev[following] = previous
+        else:
+            self._last = previous
+        self.version += 1
+
+    def _set(self, box_id: int, class_id: Optional[int] = None, box=None):
+        row = self._row(box_id)
+        if class_id is not None:
+            self._classes[row] = class_id
+        if box is not None:
+            self._boxes[row] = box
+        self.version += 1
+
+    # Command log
+
+    def _record(self, op: int, box_id: int, class_before: int, class_after: int, box_before, box_after):
+        # A new command discards the commands which could have been redone
+        if self._cursor == len(self._log):
+            self._log = np.resize(self._log, len(self._log) * 2)
+        self._log[self._cursor] = (op, box_id, class_before, class_after, box_before, box_after)
+        self._cursor += 1
+        self._log_size = self._cursor
+
+    def add(self, class_id: int, x1: float, y1: float, x2: float, y2: float) -> int:
+        """Add a box and return its id."""
+        box_id = self._next_id
+        self._next_id += 1
+        box = (x1, y1, x2, y2)
+        self._insert(box_id, class_id, box)
+        self._record(ADD, box_id, class_id, class_id, box, box)
+        return box_id
+
+    def extend(self, class_ids, boxes, record: bool = False) -> np.ndarray:
+        """
+        Add many boxes, e.g. those of a label file, and return their ids.
+
+        Args:
+            class_ids: Array of shape (N,) with the class ids.
+            boxes: Array of shape (N, 4) with x1, y1, x2, y2.
+            record: Log every box as an add command. By default the boxes become part of the
+                state the undo log starts from, and the log is cleared.
+        """
+        class_ids = np.asarray(class_ids, dtype=np.int32).reshape(-1)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if record:
+            return np.array([self.add(int(c), *box) for c, box in zip(class_ids.tolist(), boxes.tolist())],
+                            dtype=np.int64)
+        self._cursor = self._log_size = 0
+        count = len(class_ids)
+        ids = np.arange(self._next_id, self._next_id + count, dtype=np.int64)
+        self._next_id += count
+        self._grow(self._rows + count)
+        rows = slice(self._rows, self._rows + count)
+        self._ids[rows], self._classes[rows], self._boxes[rows], self._alive[rows] = ids, class_ids, boxes, True
+        self._index.update(zip(ids.tolist(), range(self._rows, self._rows + count)))
+        if count:
+            self._prev[rows] = np.arange(self._rows - 1, self._rows + count - 1)
+            self._prev[self._rows] = self._last
+            self._next[rows] = np.arange(self._rows + 1, self._rows + count + 1)
+            self._next[self._rows + count - 1] = -1
+            if self._last >= 0:
+                self._next[self._last] = self._rows
+            self._last = self._rows + count - 1
+        self._rows += count
+        self.version += 1
+        return ids
+
+    def delete(self, box_id: int):
+        class_id, box = self.get(box_id)
+        self._remove(box_id)
+        self._record(DELETE, box_id, class_id, class_id, box, box)
+
+    def move(self, box_id: int, dx: float, dy: float):
+        class_id, box = self.get(box_id)
+        moved = (box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy)
+        self._set(box_id, box=moved)
+        self._record(MOVE, box_id, class_id, class_id, box, moved)
+
+    def resize(self, box_id: int, x1: float, y1: float, x2: float, y2: float):
+        class_id, box = self.get(box_id)
+        self._set(box_id, box=(x1, y1, x2, y2))
+        self._record(RESIZE, box_id, class_id, class_id, box, (x1, y1, x2, y2))
+
+    def set_class(self, box_id: int, class_id: int):
+        old_class, box = self.get(box_id)
+        self._set(box_id, class_id=class_id)
+        self._record(CLASS, box_id, old_class, class_id, box, box)
+
+    def can_undo(self) -> bool:
+        return self._cursor > 0
+
+    def can_redo(self) -> bool:
+        return self._cursor < self._log_size
+
+    def undo(self) -> bool:
+        """Revert the last command; returns False if there is none."""
+        if not self.can_undo():
+            return False
+        self._cursor -= 1
+        op, box_id, class_before, _, box_before, _ = self._log[self._cursor].item()
+        if op == ADD:
+            self._remove(box_id)
+        elif op == DELETE:
+            self._insert(box_id, class_before, box_before)
+        else:
+            self._set(box_id, class_before, box_before)
+        return True
+
+    def redo(self) -> bool:
+        """Apply the last undone command again; returns False if there is none."""
+        if not self.can_redo():
+            return False
+        op, box_id, _, class_after, _, box_after = self._log[self._cursor].item()
+        self._cursor += 1
+        if op == ADD:
+            self._insert(box_id, class_after, box_after)
+        elif op == DELETE:
+            self._remove(box_id)
+        else:
+            self._set(box_id, class_after, box_after)
+        return True
@@ -0,0 +1,346 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from core import tracing
+from core.image_size import probe_image_size
+from core.yolo_labels import IMAGE_EXTENSIONS, is_split_output, read_yolo_labels
+
+CATALOG_FILE = ".yolo8_catalog.sqlite"
+SCHEMA_VERSION = 1
+REFRESH_BATCH_SIZE = 1000  # Changed images inspected (and written) per batch
+REFRESH_THREADS = 8  # Threads reading image headers and label files during a refresh
+HASH_MASK = (1 << 64) - 1  # Perceptual hashes are unsigned 64-bit, SQLite integers are signed
+
+
+class CatalogEntry(NamedTuple):
+    """One image of the dataset as recorded in the catalog."""
+    image_path: str
+    label_path: Optional[str]  # None if the image has no label file
+    width: Optional[int]  # None if the image header cannot be read
+    height: Optional[int]
+    box_count: int
+    classes: Tuple[int, ...]
+
+
+def _inspect(root: str, row: tuple) -> tuple:
+    """Read the image size and label summary of one changed catalog row (runs in a worker thread)."""
+    path, directory, file_size, mtime_ns, label_path, label_mtime_ns, image_changed, label_changed, \
+        width, height, box_count, classes = row
+    if image_changed:
+        try:
+            width, height = probe_image_size(os.path.join(root, path))
+        except Exception:
+            width = height = None
+    if label_changed:
+        box_count, classes = 0, ""
+        if label_path is not None:
+            try:
+                class_ids, _ = read_yolo_labels(os.path.join(root, label_path))
+                box_count = len(class_ids)
+                classes = " ".join(str(class_id) for class_id in sorted(set(class_ids.tolist())))
+            except (OSError, UnicodeDecodeError):
+                pass
+    return path, directory, file_size, mtime_ns, width, height, label_path, label_mtime_ns, box_count, classes
+
+
+class DatasetCatalog:
+    """
+    Persistent index of the images and labels of a dataset, stored in SQLite next to the dataset.
+
+    Every image is recorded with its size and mtime, its dimensions and the mtime, box count and
+    class set of its label file. refresh() only reads the headers and labels whose mtime changed,
+    so reopening a large dataset costs one directory walk instead of a full rescan.
+    """
+
+    def __init__(self, root: str, catalog_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.catalog_path = catalog_path or os.path.join(self.root, CATALOG_FILE)
+        self._connection = sqlite3.connect(self.catalog_path, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        if self._connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._connection.execute("DROP TABLE IF EXISTS images")
+            self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            "path TEXT PRIMARY KEY, directory TEXT NOT NULL, file_size INTEGER, mtime_ns INTEGER, "
+            "width INTEGER, height INTEGER, label_path TEXT, label_mtime_ns INTEGER, "
+            "box_count INTEGER NOT NULL, classes TEXT NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS images_directory ON images (directory)")
+        # Perceptual hashes of core.dedup, valid while the image keeps the recorded size and mtime
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS image_hashes ("
+            "path TEXT PRIMARY KEY, file_size INTEGER, mtime_ns INTEGER, hash INTEGER NOT NULL)"
+        )
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def _scan(self) -> Iterator[tuple]:
+        """Walk the dataset and yield (path, directory, file_size, mtime_ns, label_path, label_mtime_ns)."""
+        label_listings = {}
+
+        def list_labels(label_dir):
+            # Each label folder is listed once, shared by all images looking for labels in it
+            if label_dir not in label_listings:
+                labels = {}
+                try:
+                    with os.scandir(label_dir) as entries:
+                        for entry in entries:
+                            if entry.name.endswith(".txt"):
+                                try:
+                                    labels[entry.name] = entry.stat().st_mtime_ns
+                                except OSError:
+                                    continue
+                except OSError:
+                    pass
+                label_listings.clear()
+                label_listings[label_dir] = labels
+            return label_listings[label_dir]
+
+        image_extensions = tuple(IMAGE_EXTENSIONS)
+        pending_dirs = [self.root]
+        while pending_dirs:
+            directory = pending_dirs.pop()
+            sub_dirs, images = [], []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not is_split_output(entry.path):
+                                    sub_dirs.append(entry.path)
+                            elif entry.name.lower().endswith(image_extensions):
+                                stat = entry.stat()
+                                images.append((entry.name, stat.st_size, stat.st_mtime_ns))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            pending_dirs.extend(sorted(sub_dirs, reverse=True))
+            if not images:
+                continue
+
+            # Paths are built by concatenation, os.path.join is noticeable at 500k images
+            dir_prefix = self._relative_prefix(directory)
+            # Labels of a split dataset live in the 'labels' folder next to the 'images' folder
+            if os.path.basename(directory) == 'images':
+                label_dir = os.path.join(os.path.dirname(directory), 'labels')
+            else:
+                label_dir = directory
+            label_prefix = self._relative_prefix(label_dir)
+            labels = list_labels(label_dir)
+            for name, file_size, mtime_ns in images:
+                label_name = name[:name.rfind(".")] + ".txt"
+                label_mtime_ns = labels.get(label_name)
+                label_path = None if label_mtime_ns is None else label_prefix + label_name
+                yield dir_prefix + name, dir_prefix[:-1], file_size, mtime_ns, label_path, label_mtime_ns
+
+    def _relative_prefix(self, directory: str) -> str:
+        """Return directory relative to the root with a trailing separator, or '' for the root itself."""
+        relative_dir = os.path.relpath(directory, self.root)
+        return "" if relative_dir == "." else relative_dir + os.sep
+
+    @tracing.traced("catalog_refresh")
+    def refresh(self, log: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+        """
+        Bring the catalog up to date with the files on disk.
+
+        Only images whose size or mtime changed, and labels whose mtime changed, are read again.
+
+        Args:
+            log: Optional callable receiving a summary message.
+
+        Returns:
+            Counts of 'added', 'updated', 'removed' and 'unchanged' images.
+        """
+        connection = self._connection
+        connection.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS scan (path TEXT PRIMARY KEY, directory TEXT, file_size INTEGER, "
+            "mtime_ns INTEGER, label_path TEXT, label_mtime_ns INTEGER)"
+        )
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS updates AS SELECT * FROM images WHERE 0")
+        connection.execute("DELETE FROM temp.scan")
+        connection.execute("DELETE FROM temp.updates")
+        connection.executemany("INSERT OR REPLACE INTO temp.scan VALUES (?, ?, ?, ?, ?, ?)", self._scan())
+        scanned = connection.execute("SELECT COUNT(*) FROM temp.scan").fetchone()[0]
+
+        cursor = connection.execute(
+            "SELECT s.path, s.directory, s.file_size, s.mtime_ns, s.label_path, s.label_mtime_ns, "
+            "i.path IS NULL OR i.file_size != s.file_size OR i.mtime_ns != s.mtime_ns, "
+            "i.path IS NULL OR i.label_path IS NOT s.label_path OR i.label_mtime_ns IS NOT s.label_mtime_ns, "
+            "i.width, i.height, i.box_count, i.classes, i.path IS NULL "
+            "FROM temp.scan s LEFT JOIN images i ON i.path = s.path "
+            "WHERE i.path IS NULL OR i.file_size != s.file_size OR i.mtime_ns != s.mtime_ns "
+            "OR i.label_path IS NOT s.label_path OR i.label_mtime_ns IS NOT s.label_mtime_ns"
+        )
+        added = updated = 0
+        with ThreadPoolExecutor(max_workers=REFRESH_THREADS) as executor:
+            while True:
+                rows = cursor.fetchmany(REFRESH_BATCH_SIZE)
+                if not rows:
+                    break
+                new_rows = sum(row[-1] for row in rows)
+                added += new_rows
+                updated += len(rows) - new_rows
+                results = executor.map(lambda row: _inspect(self.root, row[:-1]), rows)
+                connection.executemany("INSERT INTO temp.updates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", results)
+
+        removed = connection.execute("DELETE FROM images WHERE path NOT IN (SELECT path FROM temp.scan)").rowcount
+        connection.execute("DELETE FROM image_hashes WHERE path NOT IN (SELECT path FROM temp.scan)")
+        connection.execute("INSERT OR REPLACE INTO images SELECT * FROM temp.updates")
+        connection.execute("DELETE FROM temp.scan")
+        connection.execute("DELETE FROM temp.updates")
+        connection.commit()
+
+        counts = {"added": added, "updated": updated, "removed": removed, "unchanged": scanned - added - updated}
+        if log is not None:
+            log(f"Catalog {self.catalog_path}: {counts['added']} added, {counts['updated']} updated, "
+                f"{counts['removed']} removed, {counts['unchanged']} unchanged")
+        return counts
+
+    def _where(self, directory: Optional[str], recursive: bool, labeled: Optional[bool]) -> Tuple[str, list]:
+        conditions, params = [], []
+        if directory is not None:
+            relative_dir = os.path.relpath(os.path.abspath(directory), self.root)
+            relative_dir = "" if relative_dir == "." else relative_dir
+            if not recursive:
+                conditions.append("directory = ?")
+                params.append(relative_dir)
+            elif relative_dir:
+                # Plain prefix comparison, so '%' and '_' in folder names need no escaping
+                prefix = relative_dir + os.sep
+                conditions.append("(directory = ? OR substr(directory, 1, ?) = ?)")
+                params.extend([relative_dir, len(prefix), prefix])
+        if labeled is not None:
+            conditions.append("label_path IS NOT NULL" if labeled else "label_path IS NULL")
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def entries(self, directory: Optional[str] = None, recursive: bool = True,
+                labeled: Optional[bool] = None) -> Iterator[CatalogEntry]:
+        """
+        Yield the catalog entries in path order.
+
+        Args:
+            directory: Only return images in this directory, defaults to the whole dataset.
+            recursive: Include the sub directories of directory.
+            labeled: Only return images with (True) or without (False) a label file.
+        """
+        where, params = self._where(directory, recursive, labeled)
+        cursor = self._connection.execute(
+            "SELECT path, label_path, width, height, box_count, classes FROM images" + where + " ORDER BY path",
+            params,
+        )
+        for path, label_path, width, height, box_count, classes in cursor:
+            yield CatalogEntry(
+                os.path.join(self.root, path),
+                None if label_path is None else os.path.join(self.root, label_path),
+                width, height, box_count,
+                tuple(int(class_id) for class_id in classes.split()),
+            )
+
+    def image_paths(self, directory: Optional[str] = None, recursive: bool = True) -> List[str]:
+        """Return the absolute image paths in path order."""
+        where, params = self._where(directory, recursive, None)
+        cursor = self._connection.execute("SELECT path FROM images" + where + " ORDER BY path", params)
+        return [os.path.join(self.root, path) for path, in cursor]
+
+    def labeled_images(self, directory: Optional[str] = None,
+                       log: Callable[[str], None] = print) -> Iterator[Tuple[str, str, int, int]]:
+        """
+        Yield (label_path, image_path, width, height) for every labeled image, like
+        core.yolo_labels.iter_labeled_images but without touching the file system.
+        """
+        for label_path, image_path, width, height, _, _ in self.labeled_image_stats(directory, log):
+            yield label_path, image_path, width, height
+
+    def labeled_image_stats(self, directory: Optional[str] = None, log: Callable[[str], None] = print
+                            ) -> Iterator[Tuple[str, str, int, int, int, int]]:
+        """Like labeled_images, with the recorded label and image mtime_ns appended to every tuple."""
+        where, params = self._where(None, True, True)
+        if directory is not None:
+            # Filter on the label folder, the images of a split dataset live in a sibling folder
+            relative_dir = os.path.relpath(os.path.abspath(directory), self.root)
+            if relative_dir != ".":
+                prefix = relative_dir + os.sep
+                where += " AND substr(label_path, 1, ?) = ?"
+                params.extend([len(prefix), prefix])
+        cursor = self._connection.execute(
+            "SELECT path, label_path, width, height, label_mtime_ns, mtime_ns FROM images" + where
+            + " ORDER BY label_path", params
+        )
+        for path, label_path, width, height, label_mtime_ns, mtime_ns in cursor:
+            image_path = os.path.join(self.root, path)
+            if width is None:
+                log(f"Failed to get image size for {image_path}")
+                continue
+            yield os.path.join(self.root, label_path), image_path, width, height, label_mtime_ns, mtime_ns
+
+    def label_mtimes(self) -> Dict[str, int]:
+        """Return the recorded mtime_ns of every label file by its absolute path."""
+        cursor = self._connection.execute("SELECT label_path, label_mtime_ns FROM images WHERE label_path IS NOT NULL")
+        return {os.path.join(self.root, label_path): mtime_ns for label_path, mtime_ns in cursor}
+
+    def image_hashes(self) -> Dict[str, int]:
+        """Return the perceptual hash of every image by its absolute path, if it is still current."""
+        cursor = self._connection.execute(
+            "SELECT i.path, h.hash FROM images i JOIN image_hashes h ON h.path = i.path "
+            "AND h.file_size = i.file_size AND h.mtime_ns = i.mtime_ns"
+        )
+        return {os.path.join(self.root, path): image_hash & HASH_MASK for path, image_hash in cursor}
+
+    def store_hashes(self, hashes: Iterable[Tuple[str, int]]):
+        """Record (absolute image path, hash) pairs for the current version of the images; others are ignored."""
+        prefix = os.path.join(self.root, "")
+        rows = []
+        for image_path, image_hash in hashes:
+            if image_path.startswith(prefix):
+                signed_hash = image_hash - (1 << 64) if image_hash > HASH_MASK >> 1 else image_hash
+                rows.append((signed_hash, image_path[len(prefix):]))
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO image_hashes SELECT path, file_size, mtime_ns, ? FROM images WHERE path = ?", rows)
+        self._connection.commit()
+
+    def summary(self) -> Dict[str, int]:
+        """Return the number of images, labeled images, unreadable images and boxes."""
+        images, labeled, unreadable, boxes = self._connection.execute(
+            "SELECT COUNT(*), COUNT(label_path), COUNT(*) - COUNT(width), COALESCE(SUM(box_count), 0) FROM images"
+        ).fetchone()
+        return {"images": images, "labeled": labeled, "unreadable": unreadable, "boxes": boxes}
+
+    def class_image_counts(self) -> Dict[int, int]:
+        """Return the number of images containing each class id."""
+        counts = {}
+        for classes, count in self._connection.execute(
+                "SELECT classes, COUNT(*) FROM images WHERE classes != '' GROUP BY classes"):
+            for class_id in classes.split():
+                counts[int(class_id)] = counts.get(int(class_id), 0) + count
+        return dict(sorted(counts.items()))
+
+
+def open_catalog(root: str, refresh: bool = True,
+                 log: Callable[[str], None] = print) -> Optional[DatasetCatalog]:
+    """
+    Open (and by default refresh) the catalog of the dataset in root.
+
+    Returns:
+        The catalog, or None if it cannot be created, e.g. because root is read-only. Callers
+        then fall back to scanning the file system.
+    """
+    try:
+        catalog = DatasetCatalog(root)
+        if refresh:
+            catalog.refresh(log)
+        return catalog
+    except (OSError, sqlite3.Error) as e:
+        log(f"Dataset catalog unavailable for {root}: {e}")
+        return None
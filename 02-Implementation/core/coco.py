@@ -0,0 +1,173 @@
+import json
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from core import tracing
+from core.label_store import iter_image_labels
+from core.yolo_labels import normalize_class_mapping
+
+
+class CocoStreamWriter:
+    """
+    Write a COCO JSON file incrementally with constant memory.
+
+    Images are written straight into the output file while annotations are spooled to a
+    temporary file and appended once all images are written, so neither list is ever held in
+    memory. The output is first written to a temporary name and renamed on close.
+
+    Usage:
+        with CocoStreamWriter(path, categories) as writer:
+            image_id = writer.add_image("1.png", 640, 480)
+            writer.add_annotation(image_id, 0, [10, 20, 30, 40])
+    """
+
+    def __init__(self, output_path: str, categories: List[dict], indent: Optional[int] = 4):
+        self.output_path = output_path
+        self.categories = categories
+        self.indent = indent
+        self.image_count = 0
+        self.annotation_count = 0
+        self._temp_path = output_path + ".part"
+        self._out = open(self._temp_path, "w", encoding="utf-8")
+        self._annotations = tempfile.TemporaryFile("w+", encoding="utf-8",
+                                                   dir=os.path.dirname(os.path.abspath(output_path)))
+        self._out.write("{" + self._key("images"))
+
+    def _newline(self, level: int) -> str:
+        return "" if self.indent is None else "\n" + " " * (self.indent * level)
+
+    def _key(self, name: str) -> str:
+        return self._newline(1) + json.dumps(name) + (":" if self.indent is None else ": ") + "["
+
+    def _encode(self, item: dict) -> str:
+        if self.indent is None:
+            return json.dumps(item, separators=(",", ":"))
+        return json.dumps(item, indent=self.indent).replace("\n", self._newline(2))
+
+    def _write_item(self, stream, item: dict, first: bool):
+        stream.write(("" if first else ",") + self._newline(2) + self._encode(item))
+
+    def add_image(self, file_name: str, width: int, height: int) -> int:
+        """Write an image entry and return its id."""
+        self.image_count += 1
+        self._write_item(self._out, {
+            "id": self.image_count,
+            "file_name": file_name,
+            "width": width,
+            "height": height
+        }, self.image_count == 1)
+        return self.image_count
+
+    def add_annotation(self, image_id: int, category_id: int, bbox: List[float], area: Optional[float] = None) -> int:
+        """Spool an annotation entry and return its id."""
+        self.annotation_count += 1
+        self._write_item(self._annotations, {
+            "id": self.annotation_count,
+            "image_id": image_id,
+            "category_id": category_id,
+            "bbox": bbox,
+            "area": bbox[2] * bbox[3] if area is None else area,
+            "iscrowd": 0
+        }, self.annotation_count == 1)
+        return self.annotation_count
+
+    def add_yolo_image(self, file_name: str, width: int, height: int, class_ids: np.ndarray,
+                       boxes: np.ndarray) -> int:
+        """Write an image with its normalized xywh YOLO boxes as clamped COCO annotations and return its id."""
+        image_id = self.add_image(file_name, width, height)
+        if not len(class_ids):
+            return image_id
+
+        # Convert YOLO normalized coordinates to absolute COCO bbox format and clamp them
+        boxes = np.asarray(boxes, dtype=np.float64)
+        x_min = np.maximum(0, (boxes[:, 0] - boxes[:, 2] / 2) * width)
+        y_min = np.maximum(0, (boxes[:, 1] - boxes[:, 3] / 2) * height)
+        box_width = np.minimum(width - x_min, boxes[:, 2] * width)
+        box_height = np.minimum(height - y_min, boxes[:, 3] * height)
+
+        for class_id, x, y, w, h in zip(np.asarray(class_ids).tolist(), x_min.tolist(), y_min.tolist(),
+                                        box_width.tolist(), box_height.tolist()):
+            self.add_annotation(image_id, class_id, [x, y, w, h], w * h)
+        return image_id
+
+    def _close_list(self, count: int) -> str:
+        return (self._newline(1) if count else "") + "]"
+
+    def close(self):
+        """Finish the JSON document and move it to output_path."""
+        if self._out is None:
+            return
+        self._out.write(self._close_list(self.image_count) + "," + self._key("annotations"))
+        self._annotations.seek(0)
+        shutil.copyfileobj(self._annotations, self._out)
+        self._annotations.close()
+        self._out.write(self._close_list(self.annotation_count) + "," + self._key("categories"))
+        for index, category in enumerate(self.categories):
+            self._write_item(self._out, category, index == 0)
+        self._out.write(self._close_list(len(self.categories)) + self._newline(0) + "}")
+        self._out.close()
+        self._out = None
+        os.replace(self._temp_path, self.output_path)
+
+    def abort(self):
+        """Discard the partially written file."""
+        if self._out is None:
+            return
+        self._annotations.close()
+        self._out.close()
+        self._out = None
+        os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+@tracing.traced("yolo_to_coco")
+def yolo_to_coco(yolo_dir: str, class_mapping: Dict, log: Callable[[str], None] = print,
+                 output_json: str = "coco_annotations.json", compact: bool = False, catalog=None,
+                 label_store=None) -> str:
+    """
+    Convert every YOLO label file below yolo_dir into a single COCO JSON file.
+
+    The file is streamed while the label files are walked, so memory use does not grow with
+    the size of the dataset.
+
+    Args:
+        yolo_dir: Directory containing the YOLO annotation (.txt) files.
+        class_mapping: Mapping of class id to class name.
+        log: Callable receiving progress and error messages.
+        output_json: Name of the JSON file written into yolo_dir.
+        compact: Write the JSON without indentation and whitespace.
+        catalog: Optional DatasetCatalog of the dataset, used instead of walking yolo_dir and
+            reading the image headers.
+        label_store: Optional synced LabelStore of the dataset, used instead of reading the label files.
+
+    Returns:
+        Path of the written COCO JSON file.
+    """
+    # Prepare categories for COCO format
+    categories = [
+        {"id": class_id, "name": class_name}
+        for class_id, class_name in normalize_class_mapping(class_mapping).items()
+    ]
+
+    output_path = os.path.join(yolo_dir, output_json)
+    with CocoStreamWriter(output_path, categories, indent=None if compact else 4) as writer:
+        for _, image_file, width, height, class_ids, boxes in iter_image_labels(yolo_dir, log, catalog,
+                                                                                label_store):
+            with tracing.span("coco_image", file=image_file):
+                writer.add_yolo_image(os.path.basename(image_file), width, height, class_ids, boxes)
+
+    tracing.counter("coco", images=writer.image_count, annotations=writer.annotation_count)
+    log(f"COCO JSON file created at {output_path}")
+    return output_path
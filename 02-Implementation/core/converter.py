@@ -0,0 +1,261 @@
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from core import tracing
+
+OUTPUT_DIRECTORY = 'converted_png'
+MANIFEST_FILE = 'manifest.jsonl'
+PROGRESS_INTERVAL = 500  # Number of processed files between two progress messages
+
+
+def convert_image_to_png(input_path: str, output_path: str, size: Optional[Tuple[int, int]] = None) -> None:
+    """Save a single image in PNG format, resized with LANCZOS resampling when size is given."""
+    from PIL import Image
+
+    with Image.open(input_path) as img:
+        if size is not None:
+            img = img.resize(size, Image.Resampling.LANCZOS)
+        img.save(output_path, "PNG")
+
+
+class ConversionManifest:
+    """
+    Append-only record of converted files stored in the output directory.
+
+    Every finished conversion is appended as one JSON line holding the source size, mtime and
+    hash together with the target size, so an interrupted run loses at most the line being written.
+    Files which are not images are recorded with their size and mtime only, marked as skipped.
+    """
+
+    def __init__(self, output_directory: str):
+        self.path = os.path.join(output_directory, MANIFEST_FILE)
+        self.entries: Dict[str, dict] = {}
+        self._file = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Partially written line from an interrupted run
+                self.entries[entry["source"]] = entry
+
+    def is_up_to_date(self, relative_source: str, stat: os.stat_result, size: Tuple[int, int],
+                      output_path: str) -> bool:
+        """Return True if relative_source was already converted from an unchanged file to size."""
+        entry = self.entries.get(relative_source)
+        return (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry.get("target") == list(size)
+            and os.path.exists(output_path)
+        )
+
+    def is_known_non_image(self, relative_source: str, stat: os.stat_result) -> bool:
+        """Return True if relative_source was found not to be an image and did not change since."""
+        entry = self.entries.get(relative_source)
+        return (
+            entry is not None
+            and entry.get("skipped", False)
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        )
+
+    def lookup_hash(self, relative_source: str, size: Tuple[int, int]) -> Optional[str]:
+        """Return the recorded source hash if relative_source was converted to size before."""
+        entry = self.entries.get(relative_source)
+        if entry is not None and entry.get("target") == list(size):
+            return entry["sha1"]
+        return None
+
+    def record(self, entry: dict):
+        """Append a finished conversion and flush it to disk."""
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self.entries[entry["source"]] = entry
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def compact(self):
+        """Rewrite the manifest with one line per source file."""
+        self.close()
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(temp_path, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _convert_task(file_path: str, output_file_path: str, size: Tuple[int, int],
+                  known_hash: Optional[str]) -> Tuple[str, str]:
+    """
+    Convert one file inside a worker process.
+
+    Returns:
+        A tuple (status, value) where status is 'converted' or 'unchanged' with the source hash
+        as value, 'skipped' with an empty value for non-image files and with the error message for
+        unreadable files, or 'failed' with the error message, e.g. for a truncated image or a
+        failed write.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        return "skipped", str(e)
+    sha1 = hashlib.sha1(data).hexdigest()
+    if sha1 == known_hash and os.path.exists(output_file_path):
+        return "unchanged", sha1  # Only the mtime changed, the pixels are the same
+
+    try:
+        img = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        return "skipped", ""
+    # Decoding and writing errors, e.g. a truncated image or a full disk, are failures
+    temp_path = output_file_path + ".part"
+    try:
+        with img:
+            resized_image = img.resize(size, Image.Resampling.LANCZOS)
+        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+        # Write to a temporary file first so that a crash never leaves a truncated PNG behind
+        resized_image.save(temp_path, "PNG")
+        os.replace(temp_path, output_file_path)
+        return "converted", sha1
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return "failed", str(e)
+
+
+def iter_source_files(directory_path: str) -> Iterator[str]:
+    """Yield all files below directory_path except the ones in the output directory and split outputs."""
+    from core.yolo_labels import is_split_output
+
+    for root, dirs, files in os.walk(directory_path):
+        # Skip the output directory to avoid infinite loops
+        if os.path.normpath(root) == os.path.normpath(directory_path):
+            dirs[:] = [d for d in dirs if d != OUTPUT_DIRECTORY]
+        dirs[:] = [d for d in dirs if not is_split_output(os.path.join(root, d))]
+        dirs.sort()
+        for file in sorted(files):
+            yield os.path.join(root, file)
+
+
+@tracing.traced("convert_images")
+def convert_all_images_in_directory(directory_path: str, width: int, height: int,
+                                    log: Callable[[str], None] = print, max_workers: Optional[int] = None,
+                                    force: bool = False) -> Dict[str, int]:
+    """
+    Convert and resize all valid image files in the specified directory to PNG format.
+
+    The work is spread over a process pool. Files which were already converted to the same size
+    and did not change since (according to the manifest in the output directory) are skipped, so
+    an interrupted run can simply be started again.
+
+    Args:
+        directory_path: Path to the directory containing image files.
+        width: Width of the converted images.
+        height: Height of the converted images.
+        log: Callable receiving progress and error messages.
+        max_workers: Number of worker processes, defaults to the number of CPUs.
+        force: Convert every file even if the manifest says it is up to date.
+
+    Returns:
+        Number of files per result ('converted', 'unchanged', 'up_to_date', 'skipped', 'failed').
+    """
+    log("Convert and resize all images in the specified directory to PNG format.")
+    size = (width, height)
+    # Ensure the output directory exists
+    output_directory = os.path.join(directory_path, OUTPUT_DIRECTORY)
+    os.makedirs(output_directory, exist_ok=True)
+    manifest = ConversionManifest(output_directory)
+
+    log("Starting conversion and resizing of images...")
+    counts = {"converted": 0, "unchanged": 0, "up_to_date": 0, "skipped": 0, "failed": 0}
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_workers * 4
+    pending = {}
+
+    def collect(done_futures):
+        for future in done_futures:
+            relative_source, file_path, stat = pending.pop(future)
+            status, value = tracing.worker_result(future.result(), "convert_file", file=relative_source)
+            counts[status] += 1
+            if status in ("converted", "unchanged"):
+                manifest.record({
+                    "source": relative_source,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "sha1": value,
+                    "target": list(size),
+                })
+            elif status == "skipped" and not value:
+                # Not looked at again by later runs while it keeps its size and mtime
+                manifest.record({
+                    "source": relative_source,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "skipped": True,
+                })
+                log(f"Skipping non-image file: {file_path}")
+            elif status == "skipped":
+                log(f"Skipping unreadable file: {file_path}: {value}")
+            else:
+                log(f"Failed to process {file_path}: {value}")
+            processed = sum(counts.values())
+            if processed % PROGRESS_INTERVAL == 0:
+                log(f"Processed {processed} files ({counts['converted']} converted)")
+                tracing.counter("convert", **counts)
+
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for file_path in iter_source_files(directory_path):
+                relative_source = os.path.relpath(file_path, directory_path)
+                output_file_path = os.path.join(output_directory, os.path.splitext(relative_source)[0] + ".png")
+                try:
+                    stat = os.stat(file_path)
+                except OSError as e:
+                    # A broken symlink or a file removed since the directory was listed
+                    log(f"Failed to process {file_path}: {e}")
+                    counts["failed"] += 1
+                    continue
+                if not force and manifest.is_up_to_date(relative_source, stat, size, output_file_path):
+                    counts["up_to_date"] += 1
+                    continue
+                if not force and manifest.is_known_non_image(relative_source, stat):
+                    counts["skipped"] += 1
+                    continue
+
+                known_hash = None if force else manifest.lookup_hash(relative_source, size)
+                future = executor.submit(tracing.timed_call, _convert_task, file_path, output_file_path, size,
+                                         known_hash)
+                pending[future] = (relative_source, file_path, stat)
+                # Bound the number of queued tasks so that huge folders do not fill the memory
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(list(pending))
+        manifest.compact()
+    finally:
+        manifest.close()
+
+    log(f"Conversion and resizing complete. {counts['converted']} converted, "
+        f"{counts['up_to_date'] + counts['unchanged']} up to date, {counts['skipped']} skipped, "
+        f"{counts['failed']} failed. All PNG images are saved in: {output_directory}")
+    tracing.counter("convert", **counts)
+    return counts
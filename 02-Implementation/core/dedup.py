@@ -0,0 +1,224 @@
+"""
+Near-duplicate detection with perceptual hashes.
+
+Every image is reduced to a 64-bit difference hash (dHash): the signs of the horizontal
+gradients of a 9x8 grayscale thumbnail. Re-encoded, resized or slightly shifted copies and
+consecutive burst frames differ in a few bits only. Hashes are computed in a process pool and
+cached in the dataset catalog; near-duplicates are found with a multi-index Hamming search,
+which only compares hashes sharing an exact chunk instead of all pairs.
+
+    groups = find_duplicate_groups(image_paths, max_distance=4, catalog=catalog)
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core import tracing
+
+HASH_BITS = 64
+# Differing hash bits up to which two images count as near-duplicates. The search compares
+# hashes sharing one of max_distance + 1 chunks, so its cost grows steeply with the distance.
+DEFAULT_MAX_DISTANCE = 4
+BATCH_SIZE = 64  # Images hashed per worker task
+PROGRESS_INTERVAL = 10000  # Number of hashed images between two progress messages
+
+_POPCOUNT8 = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def difference_hash(image_path: str) -> int:
+    """Return the 64-bit difference hash of an image."""
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        # Lets JPEG decode at a reduced scale, a no-op for other formats
+        img.draft("L", (64, 64))
+        pixels = np.asarray(img.convert("L").resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _hash_batch(image_paths: List[str]) -> List[Tuple[str, Optional[int], Optional[str]]]:
+    """Hash a batch of images (runs in a worker process); returns (path, hash, error) per image."""
+    results = []
+    for image_path in image_paths:
+        try:
+            results.append((image_path, difference_hash(image_path), None))
+        except Exception as e:
+            results.append((image_path, None, f"Failed to hash {image_path}: {e}"))
+    return results
+
+
+@tracing.traced("compute_hashes")
+def compute_hashes(image_paths: List[str], log: Callable[[str], None] = print,
+                   max_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Return the difference hash of every readable image, computed in a process pool.
+
+    Args:
+        image_paths: Images to hash.
+        log: Callable receiving progress and error messages.
+        max_workers: Number of worker processes, defaults to the number of CPUs.
+    """
+    hashes = {}
+
+    def collect(results):
+        for image_path, image_hash, error in results:
+            if error is not None:
+                log(error)
+                continue
+            hashes[image_path] = image_hash
+            if len(hashes) % PROGRESS_INTERVAL == 0:
+                log(f"Hashed {len(hashes)} of {len(image_paths)} images")
+
+    batches = [image_paths[start:start + BATCH_SIZE] for start in range(0, len(image_paths), BATCH_SIZE)]
+    if len(batches) <= 1:
+        for batch in batches:
+            collect(_hash_batch(batch))
+        return hashes
+
+    max_workers = max_workers or os.cpu_count() or 1
+    pending = set()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for batch in batches:
+            pending.add(executor.submit(tracing.timed_call, _hash_batch, batch))
+            if len(pending) >= max_workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(tracing.worker_result(future.result(), "hash_batch", images=BATCH_SIZE))
+        for future in pending:
+            collect(tracing.worker_result(future.result(), "hash_batch", images=BATCH_SIZE))
+    return hashes
+
+
+def image_hashes(image_paths: Iterable[str], catalog=None, log: Callable[[str], None] = print,
+                 max_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Return the difference hash of every readable image, reusing the hashes cached in the catalog.
+
+    Hashes of images the catalog does not hold yet, or whose file changed, are computed and
+    stored in it. Images outside the catalog are hashed every time.
+    """
+    image_paths = [os.path.abspath(path) for path in image_paths]
+    cached = catalog.image_hashes() if catalog is not None else {}
+    hashes = {path: cached[path] for path in image_paths if path in cached}
+    missing = [path for path in image_paths if path not in hashes]
+    if missing:
+        log(f"Hashing {len(missing)} images, {len(hashes)} cached")
+        computed = compute_hashes(missing, log, max_workers)
+        if catalog is not None:
+            catalog.store_hashes(computed.items())
+        hashes.update(computed)
+    return hashes
+
+
+def hamming_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Return the number of differing bits of two uint64 arrays, element-wise."""
+    difference = np.ascontiguousarray(np.bitwise_xor(a, b), dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0
+        return np.bitwise_count(difference)
+    return _POPCOUNT8[difference.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def near_duplicate_pairs(hashes: np.ndarray, max_distance: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return index arrays (i, j) of the pairs of hashes at most max_distance bits apart.
+
+    Multi-index search: the hashes are cut into max_distance + 1 chunks, and two hashes within
+    max_distance bits agree exactly on at least one of them. Per chunk the hashes are sorted by
+    that chunk and only the runs of equal chunks are compared, pair by pair. A pair may be
+    reported once per chunk it agrees on.
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    count = len(hashes)
+    chunks = max(1, min(max_distance + 1, HASH_BITS))
+    found_i, found_j = [], []
+    for chunk in range(chunks):
+        low, high = chunk * HASH_BITS // chunks, (chunk + 1) * HASH_BITS // chunks
+        keys = (hashes >> np.uint64(low)) & np.uint64((1 << (high - low)) - 1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        sizes = np.diff(np.r_[starts, count])
+        # Exclusive end of the run each sorted position belongs to
+        run_end = np.repeat(starts + sizes, sizes)
+        candidates = np.flatnonzero(run_end - np.arange(count) > 1)
+        offset = 1
+        # Compare every position with the one offset places later in its run, for growing offsets
+        while len(candidates):
+            first, second = order[candidates], order[candidates + offset]
+            close = hamming_distances(hashes[first], hashes[second]) <= max_distance
+            found_i.append(first[close])
+            found_j.append(second[close])
+            offset += 1
+            candidates = candidates[run_end[candidates] - candidates > offset]
+    if not found_i:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(found_i), np.concatenate(found_j)
+
+
+def connected_components(count: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Return a component label per node of the graph with the edges (i, j)."""
+    labels = np.arange(count)
+    while True:
+        lowest = np.minimum(labels[i], labels[j])
+        updated = labels.copy()
+        np.minimum.at(updated, i, lowest)
+        np.minimum.at(updated, j, lowest)
+        # Labels are node ids no larger than the node itself, so following them converges
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+@tracing.traced("group_hashes")
+def group_hashes(hashes: Dict[str, int], max_distance: int = DEFAULT_MAX_DISTANCE) -> List[List[str]]:
+    """
+    Group images whose hashes are at most max_distance bits apart, transitively.
+
+    Returns:
+        The groups of two or more images, each sorted, ordered by their first path.
+    """
+    paths = sorted(hashes)
+    if not paths:
+        return []
+    values = np.array([hashes[path] for path in paths], dtype=np.uint64)
+    # Identical hashes are compared once
+    unique, inverse = np.unique(values, return_inverse=True)
+    i, j = near_duplicate_pairs(unique, max_distance)
+    labels = connected_components(len(unique), i, j)[inverse.ravel()]
+
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    ends = np.r_[starts[1:], len(paths)]
+    groups = [[paths[index] for index in order[start:end]] for start, end in zip(starts, ends) if end - start > 1]
+    return sorted(groups)
+
+
+def find_duplicate_groups(image_paths: Iterable[str], max_distance: int = DEFAULT_MAX_DISTANCE, catalog=None,
+                          log: Callable[[str], None] = print, max_workers: Optional[int] = None) -> List[List[str]]:
+    """
+    Find the groups of duplicate and near-duplicate images.
+
+    Args:
+        image_paths: Images to compare.
+        max_distance: Differing hash bits up to which two images are near-duplicates, 0 for
+            exact hash matches only.
+        catalog: Optional DatasetCatalog caching the hashes.
+        log: Callable receiving progress and error messages.
+        max_workers: Number of hashing processes, defaults to the number of CPUs.
+
+    Returns:
+        The groups of two or more absolute image paths, see group_hashes.
+    """
+    groups = group_hashes(image_hashes(image_paths, catalog, log, max_workers), max_distance)
+    log(f"Found {len(groups)} groups of near-duplicates with {sum(len(group) for group in groups)} images")
+    return groups
+
+
+def group_representatives(groups: List[List[str]]) -> Dict[str, str]:
+    """Map every member of a group to the first path of its group."""
+    return {member: group[0] for group in groups for member in group}
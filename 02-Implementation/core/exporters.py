@@ -0,0 +1,324 @@
+"""
+Single-pass export of a YOLO dataset into several formats.
+
+export_dataset() walks the dataset once, reading every label file and image header a single
+time, and hands each labeled image to a list of sinks, one per output format. A new format is a
+new ExportSink subclass registered in EXPORT_FORMATS; it does not add another scan.
+
+    sinks = create_sinks(["coco", "voc", "csv"], yolo_dir, {0: "person"})
+    export_dataset(yolo_dir, sinks)
+"""
+import csv
+import os
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from core import tracing
+from core.coco import CocoStreamWriter
+from core.voc import (VocBatchWriter, discard_export_state, export_state_matches, iter_export_candidates,
+                      save_export_state, voc_is_current, voc_path)
+from core.yolo_labels import get_image_size, normalize_class_mapping, read_yolo_labels, xywhn_to_xyxy
+
+TABLE_COLUMNS = ["image", "width", "height", "class_id", "class_name", "xmin", "ymin", "xmax", "ymax"]
+PARQUET_ROW_GROUP_SIZE = 100_000  # Boxes buffered before a row group is written
+
+
+def pixel_boxes(boxes: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Return normalized xywh boxes as xyxy pixel boxes clamped to the image."""
+    xyxy = xywhn_to_xyxy(np.asarray(boxes).reshape(-1, 4), width, height)
+    xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, width)
+    xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, height)
+    return xyxy
+
+
+class ExportSink:
+    """
+    One output format of export_dataset.
+
+    accepts() is asked first for every labeled image of the traversal, add() then receives the
+    accepted ones with their labels, or fail() the accepted ones which could not be read.
+    close() finishes the output and returns a message for the log, abort() discards it after a
+    failure.
+    """
+
+    def __init__(self, yolo_dir: str, class_mapping: Dict, log: Callable[[str], None] = print):
+        self.yolo_dir = os.path.abspath(yolo_dir)
+        self.class_mapping = normalize_class_mapping(class_mapping)
+        self.log = log
+        self._prefix = os.path.join(self.yolo_dir, "")
+
+    def relative_path(self, path: str) -> str:
+        """Return path relative to yolo_dir; plain string slicing for the paths of the traversal."""
+        if path.startswith(self._prefix):
+            return path[len(self._prefix):]
+        return os.path.relpath(os.path.abspath(path), self.yolo_dir)
+
+    def accepts(self, label_path: str, image_path: str, label_mtime_ns: int, image_mtime_ns: int) -> bool:
+        """Return False if the output of this image is up to date; it is not read for this sink then."""
+        return True
+
+    def add(self, label_path: str, image_path: str, width: int, height: int, class_ids: np.ndarray,
+            boxes: np.ndarray):
+        raise NotImplementedError
+
+    def fail(self, label_path: str):
+        pass
+
+    def close(self) -> str:
+        raise NotImplementedError
+
+    def abort(self):
+        pass
+
+
+class CocoSink(ExportSink):
+    """A single COCO JSON file, streamed like core.coco.yolo_to_coco."""
+
+    def __init__(self, yolo_dir: str, class_mapping: Dict, log: Callable[[str], None] = print,
+                 output_json: str = "coco_annotations.json", compact: bool = False):
+        super().__init__(yolo_dir, class_mapping, log)
+        categories = [{"id": class_id, "name": name} for class_id, name in self.class_mapping.items()]
+        self.writer = CocoStreamWriter(os.path.join(yolo_dir, output_json), categories,
+                                       indent=None if compact else 4)
+
+    def add(self, label_path, image_path, width, height, class_ids, boxes):
+        self.writer.add_yolo_image(os.path.basename(image_path), width, height, class_ids, boxes)
+
+    def close(self) -> str:
+        self.writer.close()
+        return f"COCO JSON file created at {self.writer.output_path}"
+
+    def abort(self):
+        self.writer.abort()
+
+
+class VocSink(ExportSink):
+    """VOC XML files next to the label files, only rewriting stale ones like core.voc.yolo_to_voc."""
+
+    def __init__(self, yolo_dir: str, class_mapping: Dict, log: Callable[[str], None] = print,
+                 force: bool = False, max_workers: Optional[int] = None):
+        super().__init__(yolo_dir, class_mapping, log)
+        # Class names are part of every file
+        self.force = force
+        if not export_state_matches(yolo_dir, self.class_mapping):
+            self.force = True
+            discard_export_state(yolo_dir)
+        self.writer = VocBatchWriter(self.class_mapping, log, max_workers)
+
+    def accepts(self, label_path, image_path, label_mtime_ns, image_mtime_ns):
+        if not self.force and voc_is_current(voc_path(label_path), label_mtime_ns, image_mtime_ns):
+            self.writer.skip()
+            return False
+        return True
+
+    def add(self, label_path, image_path, width, height, class_ids, boxes):
+        self.writer.add((label_path, image_path, width, height, (class_ids, boxes)))
+
+    def fail(self, label_path):
+        self.writer.fail(label_path)
+
+    def close(self) -> str:
+        counts = self.writer.close()
+        # Files which failed were removed, see core.voc.yolo_to_voc
+        save_export_state(self.yolo_dir, self.class_mapping)
+        return (f"VOC XML files: {counts['written']} written, {counts['up_to_date']} up to date, "
+                f"{counts['failed']} failed")
+
+    def abort(self):
+        self.writer.abort()
+
+
+class CsvSink(ExportSink):
+    """
+    A CSV table with one row per box (TABLE_COLUMNS) in pixel coordinates.
+
+    Images are referenced relative to yolo_dir; images without boxes have no row.
+    """
+
+    def __init__(self, yolo_dir: str, class_mapping: Dict, log: Callable[[str], None] = print,
+                 output_csv: str = "annotations.csv"):
+        super().__init__(yolo_dir, class_mapping, log)
+        self.output_path = os.path.join(yolo_dir, output_csv)
+        self._temp_path = self.output_path + ".part"
+        self._file = open(self._temp_path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(TABLE_COLUMNS)
+        self.rows = 0
+
+    def add(self, label_path, image_path, width, height, class_ids, boxes):
+        if not len(class_ids):
+            return
+        image = self.relative_path(image_path)
+        for class_id, (x1, y1, x2, y2) in zip(np.asarray(class_ids).tolist(),
+                                              pixel_boxes(boxes, width, height).tolist()):
+            self._writer.writerow([image, width, height, class_id, self.class_mapping.get(class_id, "unknown"),
+                                   round(x1, 2), round(y1, 2), round(x2, 2), round(y2, 2)])
+        self.rows += len(class_ids)
+
+    def close(self) -> str:
+        self._file.close()
+        os.replace(self._temp_path, self.output_path)
+        return f"CSV file with {self.rows} boxes created at {self.output_path}"
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._temp_path)
+
+
+class ParquetSink(ExportSink):
+    """The CSV table (TABLE_COLUMNS) as a Parquet file, written in row groups. Requires pyarrow."""
+
+    def __init__(self, yolo_dir: str, class_mapping: Dict, log: Callable[[str], None] = print,
+                 output_parquet: str = "annotations.parquet"):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+
+        super().__init__(yolo_dir, class_mapping, log)
+        self._pa = pyarrow
+        self.schema = pyarrow.schema([
+            ("image", pyarrow.string()), ("width", pyarrow.int32()), ("height", pyarrow.int32()),
+            ("class_id", pyarrow.int32()), ("class_name", pyarrow.string()),
+            ("xmin", pyarrow.float32()), ("ymin", pyarrow.float32()),
+            ("xmax", pyarrow.float32()), ("ymax", pyarrow.float32()),
+        ])
+        self.output_path = os.path.join(yolo_dir, output_parquet)
+        self._temp_path = self.output_path + ".part"
+        self._writer = pyarrow.parquet.ParquetWriter(self._temp_path, self.schema)
+        self._images, self._sizes, self._class_ids, self._boxes = [], [], [], []
+        self._buffered = 0
+        self.rows = 0
+
+    def add(self, label_path, image_path, width, height, class_ids, boxes):
+        count = len(class_ids)
+        if not count:
+            return
+        self._images.append((self.relative_path(image_path), count))
+        self._sizes.append(np.full((count, 2), (width, height), dtype=np.int32))
+        self._class_ids.append(np.asarray(class_ids, dtype=np.int32))
+        self._boxes.append(pixel_boxes(boxes, width, height).astype(np.float32))
+        self._buffered += count
+        if self._buffered >= PARQUET_ROW_GROUP_SIZE:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        if not self._buffered:
+            return
+        sizes = np.concatenate(self._sizes)
+        class_ids = np.concatenate(self._class_ids)
+        boxes = np.concatenate(self._boxes)
+        names = [self.class_mapping.get(class_id, "unknown") for class_id in class_ids.tolist()]
+        images = [image for image, count in self._images for _ in range(count)]
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(images), sizes[:, 0], sizes[:, 1], class_ids, self._pa.array(names),
+             boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]],
+            schema=self.schema,
+        ))
+        self.rows += self._buffered
+        self._images, self._sizes, self._class_ids, self._boxes = [], [], [], []
+        self._buffered = 0
+
+    def close(self) -> str:
+        self._write_row_group()
+        self._writer.close()
+        os.replace(self._temp_path, self.output_path)
+        return f"Parquet file with {self.rows} boxes created at {self.output_path}"
+
+    def abort(self):
+        self._writer.close()
+        os.remove(self._temp_path)
+
+
+# Format name -> sink class, constructed as sink(yolo_dir, class_mapping, log, **format specific options)
+EXPORT_FORMATS: Dict[str, type] = {
+    "coco": CocoSink,
+    "voc": VocSink,
+    "csv": CsvSink,
+    "parquet": ParquetSink,
+}
+
+
+def create_sinks(formats: List[str], yolo_dir: str, class_mapping: Dict, log: Callable[[str], None] = print,
+                 options: Optional[Dict[str, dict]] = None) -> List[ExportSink]:
+    """
+    Create the sinks of the given formats.
+
+    Args:
+        formats: Names from EXPORT_FORMATS.
+        yolo_dir: Directory containing the YOLO annotation (.txt) files, receiving the output.
+        class_mapping: Mapping of class id to class name.
+        log: Callable receiving progress and error messages.
+        options: Optional keyword arguments per format name, e.g. {"coco": {"compact": True}}.
+
+    Raises:
+        ImportError: If a format needs a package which is not installed. The sinks created
+            before are aborted.
+    """
+    options = options or {}
+    sinks = []
+    try:
+        for name in formats:
+            sinks.append(EXPORT_FORMATS[name](yolo_dir, class_mapping, log, **options.get(name, {})))
+    except BaseException:
+        for sink in sinks:
+            sink.abort()
+        raise
+    return sinks
+
+
+@tracing.traced("export_dataset")
+def export_dataset(yolo_dir: str, sinks: List[ExportSink], log: Callable[[str], None] = print, catalog=None,
+                   label_store=None) -> int:
+    """
+    Feed every labeled image below yolo_dir to all sinks in a single traversal.
+
+    The image header and the label file are only read if a sink accepts the image, so an
+    incremental VOC export on its own skips up to date images without reading them. An image
+    whose header or label file cannot be read is logged and skipped by every sink.
+
+    Args:
+        yolo_dir: Directory containing the YOLO annotation (.txt) files.
+        sinks: Output formats, see create_sinks. They are closed, or aborted on failure.
+        log: Callable receiving progress and error messages.
+        catalog: Optional DatasetCatalog of the dataset, used instead of walking yolo_dir and
+            reading the image headers.
+        label_store: Optional synced LabelStore of the dataset, used instead of reading the label files.
+
+    Returns:
+        Number of labeled images handed to the sinks.
+    """
+    images = failed = 0
+    unfinished = list(sinks)
+    try:
+        for (label_path, image_path, width, height, labels), label_mtime_ns, image_mtime_ns in \
+                iter_export_candidates(yolo_dir, log, catalog, label_store):
+            with tracing.span("export_image", file=label_path):
+                accepted = [sink for sink in sinks if sink.accepts(label_path, image_path, label_mtime_ns,
+                                                                   image_mtime_ns)]
+                if not accepted:
+                    continue
+                try:
+                    if width is None:
+                        width, height = get_image_size(image_path)
+                    class_ids, boxes = labels if labels is not None else read_yolo_labels(label_path, log)
+                except (OSError, ValueError) as e:
+                    log(f"Failed to export {label_path}: {e}")
+                    for sink in accepted:
+                        sink.fail(label_path)
+                    failed += 1
+                    continue
+                for sink in accepted:
+                    sink.add(label_path, image_path, width, height, class_ids, boxes)
+                images += 1
+        while unfinished:
+            log(unfinished[0].close())
+            unfinished.pop(0)
+    except BaseException:
+        for sink in unfinished:
+            sink.abort()
+        raise
+    log(f"Exported {images} labeled images in {len(sinks)} formats, {failed} failed")
+    return images
@@ -0,0 +1,171 @@
+import atexit
+import os
+import sqlite3
+import struct
+import threading
+from typing import Optional, Tuple
+
+# Location of the persistent size cache, can be overridden with the YOLO8_CACHE_DIR environment variable
+CACHE_DIR = os.environ.get("YOLO8_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "yolo8_annotation_tool"))
+CACHE_FILE = "image_sizes.sqlite"
+COMMIT_INTERVAL = 1000  # Number of new entries between two commits
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers carrying the image dimensions (DHT, JPG and DAC are excluded)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _probe_png(f, head: bytes) -> Optional[Tuple[int, int]]:
+    if head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+    return None
+
+
+def _probe_jpeg(f, head: bytes) -> Optional[Tuple[int, int]]:
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # Markers without payload
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+        if marker == 0xD9:
+            return None
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _probe_webp(f, head: bytes) -> Optional[Tuple[int, int]]:
+    chunk = head[12:16]
+    if chunk == b"VP8 " and len(head) >= 30:
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(head) >= 25:
+        b0, b1, b2, b3 = head[21:25]
+        return 1 + (((b1 & 0x3F) << 8) | b0), 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+    if chunk == b"VP8X" and len(head) >= 30:
+        return 1 + int.from_bytes(head[24:27], "little"), 1 + int.from_bytes(head[27:30], "little")
+    return None
+
+
+def probe_image_size(image_path: str) -> Tuple[int, int]:
+    """
+    Read (width, height) from the PNG, JPEG or WebP header without decoding any pixel data.
+
+    Other formats, or headers which cannot be parsed, fall back to PIL.
+    """
+    with open(image_path, "rb") as f:
+        head = f.read(32)
+        size = None
+        if head.startswith(PNG_SIGNATURE):
+            size = _probe_png(f, head)
+        elif head.startswith(b"\xff\xd8"):
+            size = _probe_jpeg(f, head)
+        elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            size = _probe_webp(f, head)
+    if size is not None and size[0] > 0 and size[1] > 0:
+        return int(size[0]), int(size[1])
+
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        return img.size  # (width, height)
+
+
+class ImageSizeCache:
+    """
+    Persistent (width, height) cache stored in SQLite.
+
+    Entries are keyed by the absolute image path and are only valid while the file size and
+    mtime match, so a changed image is probed again.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None):
+        if cache_path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            cache_path = os.path.join(CACHE_DIR, CACHE_FILE)
+        self.cache_path = cache_path
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._connection = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS image_sizes ("
+            "path TEXT PRIMARY KEY, file_size INTEGER, mtime_ns INTEGER, width INTEGER, height INTEGER)"
+        )
+        self._connection.commit()
+
+    def get(self, image_path: str) -> Tuple[int, int]:
+        """Return (width, height) of image_path, probing the header only on a cache miss."""
+        path = os.path.abspath(image_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT file_size, mtime_ns, width, height FROM image_sizes WHERE path = ?", (path,)
+            ).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2], row[3]
+
+        width, height = probe_image_size(path)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO image_sizes VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, width, height),
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_INTERVAL:
+                self._connection.commit()
+                self._pending = 0
+        return width, height
+
+    def flush(self):
+        """Commit the entries added since the last commit."""
+        with self._lock:
+            if self._pending:
+                self._connection.commit()
+                self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+_default_cache = None
+
+
+def get_default_cache() -> Optional[ImageSizeCache]:
+    """Return the process wide size cache, or None if the cache directory is not writable."""
+    global _default_cache
+    # SQLite connections must not be shared with forked worker processes
+    if _default_cache is None or _default_cache.pid != os.getpid():
+        try:
+            _default_cache = ImageSizeCache()
+        except (OSError, sqlite3.Error):
+            return None
+        atexit.register(_default_cache.close)
+    return _default_cache
+
+
+def cached_image_size(image_path: str) -> Tuple[int, int]:
+    """Return (width, height) of image_path using the persistent cache when available."""
+    cache = get_default_cache()
+    if cache is None:
+        return probe_image_size(image_path)
+    try:
+        return cache.get(image_path)
+    except sqlite3.Error:
+        return probe_image_size(image_path)
@@ -0,0 +1,454 @@
+"""
+Import of COCO JSON and VOC XML annotations as YOLO label files.
+
+The COCO document is parsed incrementally: the items of its top-level arrays are decoded one
+at a time and spilled into a temporary SQLite database, so annotation files far larger than the
+memory are converted with a constant footprint. VOC files are parsed with iterparse in a
+process pool.
+
+    import_coco("instances_train.json", "./images")
+    import_voc("./Annotations", image_dir="./JPEGImages")
+"""
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from core import tracing
+from core.yolo_labels import format_yolo_labels, get_image_size, normalize_class_mapping, write_text_atomic, xyxy_to_xywhn
+
+CHUNK_SIZE = 1 << 20  # Characters read from the JSON file at a time
+INSERT_BATCH_SIZE = 10000  # Rows buffered before they are inserted into the spill database
+BATCH_SIZE = 64  # VOC files per worker task
+PROGRESS_INTERVAL = 10000  # Number of images between two progress messages
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Longest token prefix the decoder rejects although it may continue in the next chunk ("-Infinit")
+_PARTIAL_TOKEN_LENGTH = 8
+
+
+class _JsonStream:
+    """Reads the JSON values of a text file one at a time, buffering only the current value."""
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._consumed = 0  # Characters dropped from the front of the buffer
+        self._eof = False
+
+    def _read(self, size: int = 0) -> bool:
+        """Append the next chunk to the unconsumed part of the buffer; False at the end of the file."""
+        if self._eof:
+            return False
+        chunk = self._file.read(max(size, self._chunk_size))
+        if not chunk:
+            self._eof = True
+            return False
+        self._consumed += self._pos
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it, '' at the end of the file."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON: expected '{char}' at character {self._consumed + self._pos}")
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode and consume the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                # Only a string or token cut off by the end of the buffer can be completed by more input
+                cut_off = (e.msg.startswith("Unterminated string")
+                           or len(self._buffer) - e.pos <= _PARTIAL_TOKEN_LENGTH)
+                # Read as much again as is buffered, so a large value is decoded a logarithmic number of times
+                if not cut_off or not self._read(len(self._buffer) - self._pos):
+                    raise ValueError(f"Invalid JSON at character {self._consumed + e.pos}: {e.msg}")
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._read():
+                continue
+            self._pos = end
+            return value
+
+
+def iter_json_array_items(f, keys: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (key, item) for every item of the top-level arrays named in keys of a JSON object.
+
+    Only one item is held in memory at a time; the values of other keys are read and discarded.
+
+    Args:
+        f: Text file positioned at the start of the JSON document.
+        keys: Names of the top-level arrays to yield.
+
+    Raises:
+        ValueError: If the document is not valid JSON or not an object.
+    """
+    keys = set(keys)
+    stream = _JsonStream(f)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if stream.peek() == "[":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.expect("]")
+            else:
+                while True:
+                    item = stream.value()
+                    if key in keys:
+                        yield key, item
+                    if stream.peek() != ",":
+                        stream.expect("]")
+                        break
+                    stream.expect(",")
+        else:
+            stream.value()
+        if stream.peek() != ",":
+            stream.expect("}")
+            return
+        stream.expect(",")
+
+
+def coco_class_ids(categories: List[dict], class_mapping: Optional[Dict]) -> Tuple[Dict[int, int], Dict[int, str]]:
+    """
+    Map COCO category ids to YOLO class ids.
+
+    Returns:
+        A tuple (class_ids, class_mapping) of category id -> class id and class id -> name.
+        Categories are matched by name when a class mapping is given, categories it does not
+        name are left out. Otherwise the categories are numbered from 0 in the order of their ids.
+    """
+    categories = sorted(categories, key=lambda category: category["id"])
+    if class_mapping:
+        class_mapping = normalize_class_mapping(class_mapping)
+        by_name = {name: class_id for class_id, name in class_mapping.items()}
+        class_ids = {category["id"]: by_name[category["name"]] for category in categories
+                     if category.get("name") in by_name}
+        return class_ids, class_mapping
+    class_ids = {category["id"]: index for index, category in enumerate(categories)}
+    return class_ids, {index: category.get("name", str(category["id"])) for index, category in enumerate(categories)}
+
+
+def _to_yolo(xyxy: np.ndarray, width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Clip xyxy pixel boxes to the image and return (visible mask, normalized xywh boxes)."""
+    xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+    xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, width)
+    xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, height)
+    visible = (xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])
+    return visible, xyxy_to_xywhn(xyxy[visible], width, height)
+
+
+def _spill_coco(annotation_file: str, connection: sqlite3.Connection, log: Callable[[str], None]) -> List[dict]:
+    """Stream the images and annotations of a COCO file into the spill database and return the categories."""
+    connection.execute("CREATE TABLE images (id INTEGER PRIMARY KEY, file_name TEXT, width INTEGER, height INTEGER)")
+    connection.execute("CREATE TABLE annotations (image_id INTEGER, category_id INTEGER, x REAL, y REAL, w REAL, "
+                       "h REAL, crowd INTEGER)")
+    categories = []
+    images, annotations = [], []
+    counts = {"images": 0, "annotations": 0}
+
+    def flush():
+        connection.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?)", images)
+        connection.executemany("INSERT INTO annotations VALUES (?, ?, ?, ?, ?, ?, ?)", annotations)
+        images.clear()
+        annotations.clear()
+
+    with open(annotation_file, "r", encoding="utf-8") as f:
+        for key, item in iter_json_array_items(f, ("images", "annotations", "categories")):
+            if key == "annotations":
+                bbox = item.get("bbox")
+                if not bbox or len(bbox) != 4:
+                    continue
+                annotations.append((item["image_id"], item["category_id"], *bbox, int(item.get("iscrowd", 0))))
+                counts["annotations"] += 1
+            elif key == "images":
+                images.append((item["id"], item["file_name"], item.get("width") or 0, item.get("height") or 0))
+                counts["images"] += 1
+            else:
+                categories.append(item)
+            if len(images) + len(annotations) >= INSERT_BATCH_SIZE:
+                flush()
+    flush()
+    connection.execute("CREATE INDEX annotations_image ON annotations (image_id)")
+    connection.commit()
+    log(f"Read {counts['images']} images, {counts['annotations']} annotations and {len(categories)} categories")
+    return categories
+
+
+@tracing.traced("import_coco")
+def import_coco(annotation_file: str, image_dir: str, class_mapping: Optional[Dict] = None,
+                overwrite: bool = False, skip_crowd: bool = True,
+                log: Callable[[str], None] = print) -> Tuple[Dict[int, str], Dict[str, int]]:
+    """
+    Write the boxes of a COCO JSON file as YOLO label files next to the images.
+
+    The file is never loaded as a whole: images and annotations are streamed into a temporary
+    SQLite database and read back grouped by image.
+
+    Args:
+        annotation_file: COCO JSON file.
+        image_dir: Folder the image 'file_name' entries are relative to; receives the .txt files.
+        class_mapping: Optional mapping of class id to category name. Categories without a class
+            are skipped. Defaults to numbering all categories from 0 in the order of their ids.
+        overwrite: Also replace existing label files; by default labeled images are skipped.
+        skip_crowd: Leave out 'iscrowd' annotations, which mark groups of objects.
+        log: Callable receiving progress and error messages.
+
+    Returns:
+        A tuple (class_mapping, counts) with the class names of the written ids and the counts of
+        'images' written, 'boxes' written, 'skipped' boxes, 'existing' label files kept and
+        'missing' images.
+
+    Raises:
+        ValueError: If the file is not valid COCO JSON.
+    """
+    counts = {"images": 0, "boxes": 0, "skipped": 0, "existing": 0, "missing": 0}
+    with tempfile.TemporaryDirectory(prefix="yolo8_coco_") as temp_dir:
+        connection = sqlite3.connect(os.path.join(temp_dir, "spill.sqlite"))
+        try:
+            connection.execute("PRAGMA journal_mode=OFF")
+            connection.execute("PRAGMA synchronous=OFF")
+            try:
+                categories = _spill_coco(annotation_file, connection, log)
+                class_ids, class_mapping = coco_class_ids(categories, class_mapping)
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Invalid COCO file {annotation_file}: missing or invalid {e}")
+            for class_id, name in class_mapping.items():
+                log(f"Class {class_id}: {name}")
+
+            # Merge the images with their annotations, both ordered by image id
+            annotation_rows = connection.execute(
+                "SELECT image_id, category_id, x, y, w, h, crowd FROM annotations ORDER BY image_id")
+            pending = next(annotation_rows, None)
+            for image_id, file_name, width, height in connection.execute(
+                    "SELECT id, file_name, width, height FROM images ORDER BY id"):
+                rows = []
+                while pending is not None and pending[0] <= image_id:
+                    if pending[0] == image_id:
+                        rows.append(pending)
+                    else:  # Annotation of an image which is not listed
+                        counts["skipped"] += 1
+                    pending = next(annotation_rows, None)
+                _write_coco_image(image_dir, file_name, width, height, rows, class_ids, overwrite, skip_crowd,
+                                  counts, log)
+                if (counts["images"] + counts["existing"] + counts["missing"]) % PROGRESS_INTERVAL == 0:
+                    tracing.counter("import_coco", images=counts["images"])
+                    log(f"Imported {counts['images']} images")
+            while pending is not None:
+                counts["skipped"] += 1
+                pending = next(annotation_rows, None)
+        finally:
+            connection.close()
+
+    log(f"COCO import complete. {counts['boxes']} boxes in {counts['images']} images, {counts['skipped']} boxes "
+        f"skipped, {counts['existing']} existing label files kept, {counts['missing']} images missing.")
+    return class_mapping, counts
+
+
+def _write_coco_image(image_dir: str, file_name: str, width: int, height: int, rows: List[tuple],
+                      class_ids: Dict[int, int], overwrite: bool, skip_crowd: bool, counts: Dict[str, int],
+                      log: Callable[[str], None]):
+    image_path = os.path.join(image_dir, file_name)
+    label_path = os.path.splitext(image_path)[0] + ".txt"
+    if not overwrite and os.path.exists(label_path):
+        counts["existing"] += 1
+        return
+    if not os.path.exists(image_path):
+        counts["missing"] += 1
+        return
+    try:
+        if not width or not height:
+            width, height = get_image_size(image_path)
+        kept = [row for row in rows if row[1] in class_ids and not (skip_crowd and row[6])]
+        xywh = np.array([row[2:6] for row in kept], dtype=np.float64).reshape(-1, 4)
+        xyxy = np.hstack([xywh[:, :2], xywh[:, :2] + xywh[:, 2:]])
+        visible, boxes = _to_yolo(xyxy, width, height)
+        ids = np.array([class_ids[row[1]] for row in kept], dtype=np.int64)[visible]
+        write_text_atomic(label_path, format_yolo_labels(ids, boxes))
+    except (OSError, ValueError) as e:
+        log(f"Failed to write labels for {image_path}: {e}")
+        counts["missing"] += 1
+        return
+    counts["images"] += 1
+    counts["boxes"] += len(ids)
+    counts["skipped"] += len(rows) - len(ids)
+
+
+def parse_voc_xml(xml_path: str) -> Tuple[Optional[str], int, int, List[str], np.ndarray]:
+    """
+    Read one VOC XML file with iterparse.
+
+    Returns:
+        A tuple (filename, width, height, names, boxes) with the image file name (None if the
+        file names none), the image size (0 if unknown), the object names and their xyxy pixel
+        boxes as an (N, 4) array.
+    """
+    filename, width, height = None, 0, 0
+    names, boxes = [], []
+    for _, element in ET.iterparse(xml_path):
+        if element.tag == "object":
+            name = element.findtext("name")
+            bndbox = element.find("bndbox")
+            if name and bndbox is not None:
+                names.append(name.strip())
+                boxes.append([float(bndbox.findtext(key)) for key in ("xmin", "ymin", "xmax", "ymax")])
+            element.clear()
+        elif element.tag == "filename":
+            filename = (element.text or "").strip() or None
+        elif element.tag == "size":
+            width = int(float(element.findtext("width") or 0))
+            height = int(float(element.findtext("height") or 0))
+    return filename, width, height, names, np.array(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def _parse_voc_batch(xml_paths: List[str], image_dir: Optional[str], overwrite: bool) -> List[tuple]:
+    """
+    Parse VOC files and return (xml_path, status, result) per file (runs in a worker process).
+
+    status is 'ok' with (label_path, names, visible mask, normalized boxes), 'existing' or
+    'missing' with None, or 'failed' with a message.
+    """
+    results = []
+    for xml_path in xml_paths:
+        try:
+            filename, width, height, names, xyxy = parse_voc_xml(xml_path)
+            if filename is None:
+                raise ValueError("no filename")
+            image_path = os.path.join(image_dir or os.path.dirname(xml_path), filename)
+            label_path = os.path.splitext(image_path)[0] + ".txt"
+            if not overwrite and os.path.exists(label_path):
+                results.append((xml_path, "existing", None))
+                continue
+            if not os.path.exists(image_path):
+                results.append((xml_path, "missing", None))
+                continue
+            if not width or not height:
+                width, height = get_image_size(image_path)
+            visible, boxes = _to_yolo(xyxy, width, height)
+            results.append((xml_path, "ok", (label_path, names, visible, boxes)))
+        except (OSError, ET.ParseError, TypeError, ValueError) as e:
+            results.append((xml_path, "failed", f"Failed to read {xml_path}: {e}"))
+    return results
+
+
+def find_voc_files(xml_dir: str) -> List[str]:
+    """Return the .xml files below xml_dir in a stable order."""
+    xml_paths = []
+    for root, dirs, files in os.walk(xml_dir):
+        dirs.sort()
+        xml_paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".xml"))
+    return xml_paths
+
+
+@tracing.traced("import_voc")
+def import_voc(xml_dir: str, image_dir: Optional[str] = None, class_mapping: Optional[Dict] = None,
+               overwrite: bool = False, log: Callable[[str], None] = print,
+               max_workers: Optional[int] = None) -> Tuple[Dict[int, str], Dict[str, int]]:
+    """
+    Write the boxes of the VOC XML files below xml_dir as YOLO label files next to the images.
+
+    The files are parsed in a process pool; the labels are written here in file order, so class
+    ids assigned on the fly do not depend on the scheduling. Box coordinates are read as pixel
+    edges, the convention of core.voc.build_voc_xml.
+
+    Args:
+        xml_dir: Folder containing the .xml files, searched recursively.
+        image_dir: Folder of the images named by the <filename> elements, defaults to the folder of
+            each XML file. Receives the .txt files.
+        class_mapping: Optional mapping of class id to object name. Objects without a class are
+            skipped. Defaults to numbering the names from 0 in the order they are first seen.
+        overwrite: Also replace existing label files; by default labeled images are skipped.
+        log: Callable receiving progress and error messages.
+        max_workers: Number of parsing processes, defaults to the number of CPUs.
+
+    Returns:
+        A tuple (class_mapping, counts) with the class names of the written ids and the counts of
+        'images' written, 'boxes' written, 'skipped' boxes, 'existing' label files kept,
+        'missing' images and 'failed' files.
+    """
+    xml_paths = find_voc_files(xml_dir)
+    fixed_classes = bool(class_mapping)
+    class_mapping = normalize_class_mapping(class_mapping or {})
+    class_ids = {name: class_id for class_id, name in class_mapping.items()}
+    counts = {"images": 0, "boxes": 0, "skipped": 0, "existing": 0, "missing": 0, "failed": 0}
+    log(f"Importing {len(xml_paths)} VOC files")
+
+    def write(results):
+        for xml_path, status, result in results:
+            if status != "ok":
+                counts[status] += 1
+                if result is not None:
+                    log(result)
+                continue
+            label_path, names, visible, boxes = result
+            if not fixed_classes:
+                for name in names:
+                    if name not in class_ids:
+                        class_ids[name] = len(class_mapping)
+                        class_mapping[class_ids[name]] = name
+            known = np.array([name in class_ids for name in names], dtype=bool)
+            keep = known[visible]
+            ids = np.array([class_ids[name] for name, v in zip(names, visible) if v and name in class_ids],
+                           dtype=np.int64)
+            try:
+                write_text_atomic(label_path, format_yolo_labels(ids, boxes[keep]))
+            except OSError as e:
+                log(f"Failed to write labels for {xml_path}: {e}")
+                counts["failed"] += 1
+                continue
+            counts["images"] += 1
+            counts["boxes"] += len(ids)
+            counts["skipped"] += len(names) - len(ids)
+            if counts["images"] % PROGRESS_INTERVAL == 0:
+                tracing.counter("import_voc", images=counts["images"])
+                log(f"Imported {counts['images']} of {len(xml_paths)} files")
+
+    batches = [xml_paths[start:start + BATCH_SIZE] for start in range(0, len(xml_paths), BATCH_SIZE)]
+    if len(batches) <= 1:
+        for batch in batches:
+            write(_parse_voc_batch(batch, image_dir, overwrite))
+    else:
+        max_workers = max_workers or os.cpu_count() or 1
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for batch in batches:
+                pending.append(executor.submit(tracing.timed_call, _parse_voc_batch, batch, image_dir, overwrite))
+                # Results are written in submission order; bound the parsed files waiting for the oldest batch
+                if len(pending) >= max_workers * 4:
+                    write(tracing.worker_result(pending.popleft().result(), "voc_parse", files=BATCH_SIZE))
+            while pending:
+                write(tracing.worker_result(pending.popleft().result(), "voc_parse", files=BATCH_SIZE))
+
+    for class_id, name in class_mapping.items():
+        log(f"Class {class_id}: {name}")
+    log(f"VOC import complete. {counts['boxes']} boxes in {counts['images']} images, {counts['skipped']} boxes "
+        f"skipped, {counts['existing']} existing label files kept, {counts['missing']} images missing, "
+        f"{counts['failed']} files failed.")
+    return class_mapping, counts
@@ -0,0 +1,156 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Images with more boxes than this use the sweep-and-prune path instead of the full IoU matrix
+DENSE_BOX_LIMIT = 1024
+# Number of candidate pairs evaluated at once by the sweep-and-prune path
+PAIR_CHUNK_SIZE = 1 << 20
+
+EMPTY_PAIRS = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+
+
+def box_area(boxes: np.ndarray) -> np.ndarray:
+    """Return the area of (x_min, y_min, x_max, y_max) boxes, zero for degenerate boxes."""
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def iou_matrix(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    Compute the IoU of every box in boxes1 with every box in boxes2.
+
+    Args:
+        boxes1: Array of shape (N, 4) with x_min, y_min, x_max, y_max.
+        boxes2: Array of shape (M, 4) with x_min, y_min, x_max, y_max.
+
+    Returns:
+        Array of shape (N, M) with IoU values between 0 and 1.
+    """
+    boxes1 = np.asarray(boxes1, dtype=np.float64).reshape(-1, 4)
+    boxes2 = np.asarray(boxes2, dtype=np.float64).reshape(-1, 4)
+    top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottom_right = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    wh = np.clip(bottom_right - top_left, 0, None)
+    intersection = wh[..., 0] * wh[..., 1]
+    union = box_area(boxes1)[:, None] + box_area(boxes2)[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def paired_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """Compute the IoU of boxes1[k] with boxes2[k] for every k."""
+    top_left = np.maximum(boxes1[:, :2], boxes2[:, :2])
+    bottom_right = np.minimum(boxes1[:, 2:], boxes2[:, 2:])
+    wh = np.clip(bottom_right - top_left, 0, None)
+    intersection = wh[:, 0] * wh[:, 1]
+    union = box_area(boxes1) + box_area(boxes2) - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def _dense_pairs(boxes: np.ndarray, iou_threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    iou = iou_matrix(boxes, boxes)
+    i, j = np.nonzero(np.triu(iou > iou_threshold, k=1))
+    return i, j, iou[i, j]
+
+
+def _sweep_and_prune_pairs(boxes: np.ndarray, iou_threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Sort by x_min; box k can only intersect the boxes which start before x_max of box k
+    order = np.argsort(boxes[:, 0], kind="stable")
+    sorted_boxes = boxes[order]
+    ends = np.searchsorted(sorted_boxes[:, 0], sorted_boxes[:, 2], side="left")
+    starts = np.arange(1, len(boxes) + 1)
+    counts = np.clip(ends - starts, 0, None)
+
+    found_i, found_j, found_iou = [], [], []
+    first = 0
+    while first < len(boxes):
+        # Group consecutive boxes until the group produces about PAIR_CHUNK_SIZE candidate pairs
+        cumulative = np.cumsum(counts[first:])
+        last = first + max(1, int(np.searchsorted(cumulative, PAIR_CHUNK_SIZE, side="right")))
+        group_counts = counts[first:last]
+        total = int(group_counts.sum())
+        if total:
+            left = np.repeat(np.arange(first, last), group_counts)
+            # Offset of every candidate inside its run, added to the first candidate of the run
+            offsets = np.arange(total) - np.repeat(np.cumsum(group_counts) - group_counts, group_counts)
+            right = np.repeat(starts[first:last], group_counts) + offsets
+            iou = paired_iou(sorted_boxes[left], sorted_boxes[right])
+            keep = iou > iou_threshold
+            found_i.append(order[left[keep]])
+            found_j.append(order[right[keep]])
+            found_iou.append(iou[keep])
+        first = last
+
+    if not found_i:
+        return EMPTY_PAIRS
+    i = np.concatenate(found_i)
+    j = np.concatenate(found_j)
+    # Report each pair with the lower index first, like the dense path
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    return i, j, np.concatenate(found_iou)
+
+
+def overlapping_pairs(boxes: np.ndarray, iou_threshold: float = 0.5) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find all pairs of boxes whose IoU is above iou_threshold.
+
+    Moderate box counts use the full IoU matrix, dense images sort the boxes along x and only
+    compare boxes whose x ranges intersect (sweep and prune).
+
+    Args:
+        boxes: Array of shape (N, 4) with x_min, y_min, x_max, y_max.
+        iou_threshold: Threshold for IoU to consider bounding boxes as overlapping.
+
+    Returns:
+        A tuple (i, j, iou) of arrays with i < j for every overlapping pair, sorted by (i, j).
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) < 2:
+        return EMPTY_PAIRS
+    if len(boxes) <= DENSE_BOX_LIMIT:
+        return _dense_pairs(boxes, iou_threshold)
+
+    i, j, iou = _sweep_and_prune_pairs(boxes, iou_threshold)
+    order = np.lexsort((j, i))
+    return i[order], j[order], iou[order]
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.45,
+                        class_ids: Optional[np.ndarray] = None, max_detections: int = 300) -> np.ndarray:
+    """
+    Greedy non-maximum suppression.
+
+    Boxes are visited by decreasing score; every kept box suppresses all remaining boxes whose
+    IoU with it is above iou_threshold in one vectorized step, so the loop runs once per kept
+    box instead of once per pair.
+
+    Args:
+        boxes: Array of shape (N, 4) with x_min, y_min, x_max, y_max.
+        scores: Array of shape (N,) with the confidence of every box.
+        iou_threshold: Boxes overlapping a kept box by more than this IoU are dropped.
+        class_ids: Optional array of shape (N,); boxes of different classes never suppress each other.
+        max_detections: Maximum number of boxes kept.
+
+    Returns:
+        Indices of the kept boxes by decreasing score.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if not len(boxes):
+        return np.zeros(0, dtype=np.int64)
+    if class_ids is not None:
+        # Move every class into its own region of the plane so that boxes of different classes are disjoint
+        extent = boxes.max() - boxes.min() + 1
+        boxes = boxes + (np.asarray(class_ids, dtype=np.float64) * extent)[:, None]
+    areas = box_area(boxes)
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    keep = []
+    while order.size and len(keep) < max_detections:
+        best, order = order[0], order[1:]
+        keep.append(best)
+        top_left = np.maximum(boxes[best, :2], boxes[order, :2])
+        bottom_right = np.minimum(boxes[best, 2:], boxes[order, 2:])
+        wh = np.clip(bottom_right - top_left, 0, None)
+        intersection = wh[:, 0] * wh[:, 1]
+        union = areas[best] + areas[order] - intersection
+        iou = np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+        order = order[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
@@ -0,0 +1,282 @@
+import json
+import os
+import shutil
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core import tracing
+from core.yolo_labels import format_yolo_labels, iter_labeled_images, read_yolo_labels, write_text_atomic
+
+LABEL_STORE_DIRECTORY = ".yolo8_labels"
+CURRENT_FILE = "current.json"  # Names the generation folder holding the arrays
+INDEX_FILE = "index.json"
+STORE_VERSION = 1
+
+
+class LabelStore:
+    """
+    Packed, memory-mapped copy of every YOLO label file of a dataset.
+
+    The boxes of all label files are stored back to back in one (N, 4) float32 array with a
+    matching (N,) int32 class array. offsets[i]:offsets[i + 1] selects the boxes of the i-th
+    label file, so reading the whole dataset is a sequential read of two arrays instead of one
+    open() and parse per file. Label files are recorded in label path order together with their
+    image, image size and label mtime.
+    """
+
+    def __init__(self, root: str, directory: str):
+        self.root = os.path.abspath(root)
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.label_paths: List[str] = index["labels"]  # Relative to root
+        self.image_paths: List[str] = index["images"]
+        self.class_ids = np.load(os.path.join(directory, "classes.npy"), mmap_mode="r")
+        self.boxes = np.load(os.path.join(directory, "boxes.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"))
+        # Columns: width, height, label mtime_ns
+        self.image_info = np.load(os.path.join(directory, "images.npy"))
+        self._positions = None
+        self._prefix = os.path.join(self.root, "")
+
+    def relative_path(self, path: str) -> str:
+        """Return path relative to the dataset root; plain string slicing for absolute paths below it."""
+        if path.startswith(self._prefix):
+            return path[len(self._prefix):]
+        return os.path.relpath(os.path.abspath(path), self.root)
+
+    def __len__(self) -> int:
+        return len(self.label_paths)
+
+    @property
+    def box_count(self) -> int:
+        return int(self.offsets[-1])
+
+    def labels(self, index: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return read-only (class_ids, boxes) views of the index-th label file."""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.class_ids[start:end], self.boxes[start:end]
+
+    def find(self, label_path: str) -> Optional[int]:
+        """Return the index of a label file, or None if it is not in the store."""
+        if self._positions is None:
+            self._positions = {path: i for i, path in enumerate(self.label_paths)}
+        return self._positions.get(self.relative_path(label_path))
+
+    def indices(self, directory: Optional[str], recursive: bool) -> Sequence[int]:
+        """Return the indices of the label files in directory in path order."""
+        if directory is None:
+            return range(len(self))
+        relative_dir = os.path.relpath(os.path.abspath(directory), self.root)
+        if relative_dir == ".":
+            if recursive:
+                return range(len(self))
+            prefix = ""
+        else:
+            prefix = relative_dir + os.sep
+        indices = [i for i, path in enumerate(self.label_paths) if path.startswith(prefix)]
+        if not recursive:
+            indices = [i for i in indices if os.sep not in self.label_paths[i][len(prefix):]]
+        return indices
+
+    def iter_labels(self, directory: Optional[str] = None, recursive: bool = True
+                    ) -> Iterator[Tuple[str, str, int, int, np.ndarray, np.ndarray]]:
+        """
+        Yield (label_path, image_path, width, height, class_ids, boxes) for every label file.
+
+        Args:
+            directory: Only return the label files below this directory, defaults to the whole dataset.
+            recursive: Include the sub directories of directory.
+        """
+        for i in self.indices(directory, recursive):
+            class_ids, boxes = self.labels(i)
+            width, height = self.image_info[i, :2].tolist()
+            yield (self._prefix + self.label_paths[i], self._prefix + self.image_paths[i], width, height,
+                   class_ids, boxes)
+
+
+def _store_directory(root: str) -> str:
+    return os.path.join(os.path.abspath(root), LABEL_STORE_DIRECTORY)
+
+
+def open_label_store(root: str) -> Optional[LabelStore]:
+    """Open the label store of the dataset in root as last synced, or return None if there is none."""
+    store_dir = _store_directory(root)
+    try:
+        with open(os.path.join(store_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            current = json.load(f)
+        if current.get("version") != STORE_VERSION:
+            return None
+        return LabelStore(root, os.path.join(store_dir, current["generation"]))
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_generation(store_dir: str, label_paths: List[str], image_paths: List[str], image_info: np.ndarray,
+                      offsets: np.ndarray, class_ids: np.ndarray, boxes: np.ndarray) -> str:
+    """Write a new generation folder and point current.json at it; returns the generation name."""
+    generations = [int(name[1:]) for name in os.listdir(store_dir) if name[:1] == "g" and name[1:].isdigit()]
+    generation = f"g{max(generations, default=0) + 1}"
+    directory = os.path.join(store_dir, generation)
+    os.makedirs(directory)
+    np.save(os.path.join(directory, "classes.npy"), class_ids)
+    np.save(os.path.join(directory, "boxes.npy"), boxes)
+    np.save(os.path.join(directory, "offsets.npy"), offsets)
+    np.save(os.path.join(directory, "images.npy"), image_info)
+    with open(os.path.join(directory, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump({"labels": label_paths, "images": image_paths}, f)
+
+    # Readers see either the previous or the new generation, never a partly written one
+    temp_path = os.path.join(store_dir, CURRENT_FILE + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": STORE_VERSION, "generation": generation}, f)
+    os.replace(temp_path, os.path.join(store_dir, CURRENT_FILE))
+    # Open memory maps of older generations stay valid after the files are removed
+    for name in os.listdir(store_dir):
+        if name != generation and name[:1] == "g" and name[1:].isdigit():
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+    return generation
+
+
+@tracing.traced("sync_label_store")
+def sync_label_store(root: str, catalog=None, log: Callable[[str], None] = print) -> LabelStore:
+    """
+    Bring the label store of the dataset in root up to date with its label files.
+
+    Only label files whose mtime changed since the last sync are read again, the boxes of all
+    other files are copied over from the previous store in contiguous runs. Nothing is written
+    if no label file was added, changed or removed.
+
+    Args:
+        root: Dataset folder; the store is kept in root/.yolo8_labels.
+        catalog: Optional DatasetCatalog containing root, queried for the labeled images and the
+            label mtimes instead of walking root.
+        log: Callable receiving progress and error messages.
+
+    Returns:
+        The synced store.
+    """
+    root = os.path.abspath(root)
+    prefix = os.path.join(root, "")
+    store_dir = _store_directory(root)
+    previous = open_label_store(root)
+    if catalog is not None:
+        labeled_images = catalog.labeled_images(root, log)
+        label_mtimes = catalog.label_mtimes()
+    else:
+        labeled_images = iter_labeled_images(root, log)
+        label_mtimes = None
+
+    label_paths, image_paths, info = [], [], []
+    offsets = [0]
+    # Box sources in order: (start, end) ranges of the previous store or freshly read arrays
+    chunks = []
+    read = failed = 0
+    for label_path, image_path, width, height in labeled_images:
+        mtime_ns = label_mtimes.get(label_path) if label_mtimes is not None else None
+        try:
+            if mtime_ns is None:
+                mtime_ns = os.stat(label_path).st_mtime_ns
+        except OSError as e:
+            # Unreadable files are left out of this generation and tried again by the next sync
+            log(f"Failed to read {label_path}: {e}")
+            failed += 1
+            continue
+        # Both come from a walk of root or the catalog of root, so they start with prefix
+        relative_label = label_path[len(prefix):] if label_path.startswith(prefix) else os.path.relpath(label_path, root)
+        relative_image = image_path[len(prefix):] if image_path.startswith(prefix) else os.path.relpath(image_path, root)
+        index = previous.find(label_path) if previous is not None else None
+        if index is not None and previous.image_info[index, 2] == mtime_ns:
+            start, end = int(previous.offsets[index]), int(previous.offsets[index + 1])
+            if chunks and isinstance(chunks[-1][0], int) and chunks[-1][1] == start:
+                chunks[-1] = (chunks[-1][0], end)
+            elif end > start:
+                chunks.append((start, end))
+            count = end - start
+        else:
+            try:
+                class_ids, boxes = read_yolo_labels(label_path, log)
+            except (OSError, ValueError) as e:
+                log(f"Failed to read {label_path}: {e}")
+                failed += 1
+                continue
+            if len(class_ids):
+                chunks.append((class_ids, boxes))
+            count = len(class_ids)
+            read += 1
+        label_paths.append(relative_label)
+        image_paths.append(relative_image)
+        info.append((width, height, mtime_ns))
+        offsets.append(offsets[-1] + count)
+
+    image_info = np.array(info, dtype=np.int64).reshape(-1, 3)
+    if (previous is not None and not read and previous.label_paths == label_paths
+            and previous.image_paths == image_paths and np.array_equal(previous.image_info, image_info)):
+        log(f"Label store {store_dir}: {len(previous)} label files, {previous.box_count} boxes, up to date, "
+            f"{failed} failed")
+        return previous
+
+    class_parts, box_parts = [], []
+    for first, second in chunks:
+        if isinstance(first, int):
+            class_parts.append(previous.class_ids[first:second])
+            box_parts.append(previous.boxes[first:second])
+        else:
+            class_parts.append(first)
+            box_parts.append(second)
+    class_ids = np.concatenate(class_parts).astype(np.int32) if class_parts else np.zeros(0, dtype=np.int32)
+    boxes = np.concatenate(box_parts).astype(np.float32) if box_parts else np.zeros((0, 4), dtype=np.float32)
+
+    os.makedirs(store_dir, exist_ok=True)
+    generation = _write_generation(store_dir, label_paths, image_paths, image_info,
+                                   np.array(offsets, dtype=np.int64), class_ids, boxes)
+    log(f"Label store {store_dir}: {len(label_paths)} label files, {len(class_ids)} boxes, {read} read, "
+        f"{failed} failed")
+    return LabelStore(root, os.path.join(store_dir, generation))
+
+
+def export_label_store(store: LabelStore, output_dir: Optional[str] = None,
+                       log: Callable[[str], None] = print) -> int:
+    """
+    Write the label files of a store back as YOLO .txt files.
+
+    Args:
+        store: The label store.
+        output_dir: Folder receiving the label files under their path relative to the dataset
+            root; defaults to the dataset itself, which restores the original files.
+        log: Callable receiving progress messages.
+
+    Returns:
+        Number of label files written.
+    """
+    output_dir = os.path.abspath(output_dir or store.root)
+    for i, label_path in enumerate(store.label_paths):
+        class_ids, boxes = store.labels(i)
+        target = os.path.join(output_dir, label_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # An interrupted export leaves every file complete, with its old or its new labels
+        write_text_atomic(target, format_yolo_labels(class_ids, boxes))
+    log(f"Exported {len(store)} label files to {output_dir}")
+    return len(store)
+
+
+def iter_image_labels(directory: str, log: Callable[[str], None] = print, catalog=None, label_store=None
+                      ) -> Iterator[Tuple[str, str, int, int, np.ndarray, np.ndarray]]:
+    """
+    Yield (label_path, image_path, width, height, class_ids, boxes) for every labeled image in
+    directory, from the label store if one is given, otherwise from the catalog or a directory walk
+    followed by reading every label file.
+    """
+    if label_store is not None:
+        yield from label_store.iter_labels(directory)
+        return
+    if catalog is not None:
+        labeled_images = catalog.labeled_images(directory, log)
+    else:
+        labeled_images = iter_labeled_images(directory, log)
+    for label_path, image_path, width, height in labeled_images:
+        with tracing.span("read_labels", file=label_path):
+            class_ids, boxes = read_yolo_labels(label_path, log)
+        yield label_path, image_path, width, height, class_ids, boxes
+
@@ -0,0 +1,240 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.iou import non_max_suppression
+from core.yolo_labels import IMAGE_EXTENSIONS, format_yolo_labels, write_text_atomic
+
+DEFAULT_INPUT_SIZE = 640  # Used when the model input has no fixed size
+DEFAULT_BATCH_SIZE = 8
+PAD_VALUE = 114  # Gray border of letterboxed images, as in the YOLOv8 training pipeline
+MAX_CANDIDATES = 30000  # Boxes above the confidence threshold passed to NMS per image
+PROGRESS_INTERVAL = 100  # Number of images between two progress messages
+
+
+def letterbox(image, size: int) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Scale an RGB PIL image to fit into a size x size square and pad it with gray.
+
+    Returns:
+        A tuple (pixels, scale, (left, top)) with the uint8 pixels in (3, size, size) layout, the
+        scale applied to the image and the padding added on the left and top.
+    """
+    from PIL import Image
+
+    width, height = image.size
+    scale = min(size / width, size / height)
+    new_width, new_height = max(1, round(width * scale)), max(1, round(height * scale))
+    if (new_width, new_height) != (width, height):
+        image = image.resize((new_width, new_height), Image.Resampling.BILINEAR)
+    left, top = (size - new_width) // 2, (size - new_height) // 2
+    pixels = np.full((size, size, 3), PAD_VALUE, dtype=np.uint8)
+    pixels[top:top + new_height, left:left + new_width] = np.asarray(image)
+    return pixels.transpose(2, 0, 1), scale, (left, top)
+
+
+def _prepare_task(image_path: str, size: int):
+    """Decode and letterbox one image (runs in a worker process)."""
+    from PIL import Image
+
+    try:
+        with Image.open(image_path) as img:
+            image_size = img.size
+            pixels, scale, padding = letterbox(img.convert("RGB"), size)
+    except Exception as e:
+        return image_path, None, f"Failed to read {image_path}: {e}"
+    return image_path, (pixels, image_size, scale, padding), None
+
+
+def decode_predictions(output: np.ndarray, conf_threshold: float = 0.25, iou_threshold: float = 0.45,
+                       max_detections: int = 300) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Turn the raw output of a YOLOv8 detection model into final detections.
+
+    Args:
+        output: Array of shape (B, 4 + classes, anchors) as exported by YOLOv8, holding the box
+            center, width and height in input pixels followed by the class scores.
+        conf_threshold: Minimum class score of a detection.
+        iou_threshold: IoU threshold of the per class NMS.
+        max_detections: Maximum number of detections per image.
+
+    Returns:
+        One (class_ids, scores, boxes) tuple per image with the boxes as xyxy input pixels.
+    """
+    output = np.asarray(output, dtype=np.float32)
+    results = []
+    for prediction in output:
+        class_scores = prediction[4:]
+        class_ids = class_scores.argmax(axis=0)
+        scores = class_scores[class_ids, np.arange(class_scores.shape[1])]
+        candidates = np.nonzero(scores > conf_threshold)[0]
+        if len(candidates) > MAX_CANDIDATES:
+            candidates = candidates[np.argsort(-scores[candidates])[:MAX_CANDIDATES]]
+        cx, cy, w, h = prediction[:4, candidates]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        keep = non_max_suppression(boxes, scores[candidates], iou_threshold, class_ids[candidates], max_detections)
+        results.append((class_ids[candidates][keep], scores[candidates][keep], boxes[keep]))
+    return results
+
+
+def to_yolo_boxes(boxes: np.ndarray, image_size: Tuple[int, int], scale: float,
+                  padding: Tuple[int, int]) -> np.ndarray:
+    """Map xyxy boxes in letterboxed input pixels to normalized xywh boxes of the original image."""
+    width, height = image_size
+    xyxy = (np.asarray(boxes, dtype=np.float64) - np.array([*padding, *padding])) / scale
+    xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, width)
+    xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, height)
+    return np.stack([
+        (xyxy[:, 0] + xyxy[:, 2]) / 2 / width,
+        (xyxy[:, 1] + xyxy[:, 3]) / 2 / height,
+        (xyxy[:, 2] - xyxy[:, 0]) / width,
+        (xyxy[:, 3] - xyxy[:, 1]) / height,
+    ], axis=1).reshape(-1, 4)
+
+
+class Detector:
+    """
+    ONNX detection model run on the CPU with onnxruntime.
+
+    The model takes a float32 (B, 3, H, W) RGB batch scaled to [0, 1] and returns the YOLOv8
+    detection output described in decode_predictions.
+    """
+
+    def __init__(self, model_path: str, input_size: Optional[int] = None, threads: Optional[int] = None):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("Pre-annotation requires onnxruntime (pip install onnxruntime)")
+
+        if not os.path.isfile(model_path):
+            raise FileNotFoundError(f"Model not found: {model_path}")
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        # Dimensions exported as dynamic are names instead of numbers
+        fixed_size = height if isinstance(height, int) and height == width else None
+        self.input_size = input_size or fixed_size or DEFAULT_INPUT_SIZE
+        if fixed_size is not None and self.input_size != fixed_size:
+            raise ValueError(f"The model expects {fixed_size}x{fixed_size} input")
+        self.max_batch_size = batch if isinstance(batch, int) else None
+
+    def predict(self, pixels: np.ndarray) -> np.ndarray:
+        """Run the model on a uint8 (B, 3, H, W) batch and return its raw output."""
+        batch = pixels.astype(np.float32) / 255.0
+        if self.max_batch_size is None:
+            return self.session.run(None, {self.input_name: batch})[0]
+        # Models exported with a fixed batch size are fed in chunks of that size, the last one padded
+        outputs = []
+        for start in range(0, len(batch), self.max_batch_size):
+            chunk = batch[start:start + self.max_batch_size]
+            count = len(chunk)
+            if count < self.max_batch_size:
+                chunk = np.concatenate([chunk, np.zeros((self.max_batch_size - count,) + chunk.shape[1:], np.float32)])
+            outputs.append(self.session.run(None, {self.input_name: chunk})[0][:count])
+        return np.concatenate(outputs)
+
+
+def find_unlabeled_images(source_dir: str, overwrite: bool = False, catalog=None) -> List[Tuple[str, str]]:
+    """Return (image_path, label_path) for the images of source_dir, by default only those without labels."""
+    if catalog is not None:
+        return [(entry.image_path, os.path.splitext(entry.image_path)[0] + ".txt")
+                for entry in catalog.entries(source_dir, recursive=False, labeled=None if overwrite else False)]
+    names = set(os.listdir(source_dir))
+    pairs = []
+    for name in sorted(names):
+        stem, ext = os.path.splitext(name)
+        if ext in IMAGE_EXTENSIONS and (overwrite or stem + ".txt" not in names):
+            pairs.append((os.path.join(source_dir, name), os.path.join(source_dir, stem + ".txt")))
+    return pairs
+
+
+def preannotate_folder(source_dir: str, model_path: str, input_size: Optional[int] = None,
+                       batch_size: int = DEFAULT_BATCH_SIZE, conf_threshold: float = 0.25,
+                       iou_threshold: float = 0.45, overwrite: bool = False,
+                       log: Callable[[str], None] = print, max_workers: Optional[int] = None,
+                       catalog=None) -> Dict[str, int]:
+    """
+    Write the detections of an ONNX model as YOLO label files next to the images of a folder.
+
+    Images are decoded and letterboxed in a process pool while the model runs batches in this
+    process. The label files are proposals to be corrected in the annotation tool.
+
+    Args:
+        source_dir: Folder containing the .png images.
+        model_path: Path to the ONNX model (e.g. exported with 'yolo export format=onnx').
+        input_size: Model input side, defaults to the fixed size of the model or 640.
+        batch_size: Images per inference call.
+        conf_threshold: Minimum class score of a detection.
+        iou_threshold: IoU threshold of the per class NMS.
+        overwrite: Also replace existing label files; by default labeled images are skipped.
+        log: Callable receiving progress and error messages.
+        max_workers: Number of decoding processes, defaults to the number of CPUs.
+        catalog: Optional DatasetCatalog containing source_dir, queried for the images.
+
+    Returns:
+        Counts of 'images' labeled, 'boxes' written and 'failed' images.
+    """
+    detector = Detector(model_path, input_size)
+    pairs = find_unlabeled_images(source_dir, overwrite, catalog)
+    label_paths = dict(pairs)
+    log(f"Pre-annotating {len(pairs)} images with {os.path.basename(model_path)}")
+
+    counts = {"images": 0, "boxes": 0, "failed": 0}
+    batch = []
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max(max_workers * 4, batch_size * 2)
+    pending = set()
+
+    def run_batch():
+        output = detector.predict(np.stack([item[1][0] for item in batch]))
+        detections = decode_predictions(output, conf_threshold, iou_threshold)
+        for (image_path, (_, image_size, scale, padding)), (class_ids, _, boxes) in zip(batch, detections):
+            boxes = to_yolo_boxes(boxes, image_size, scale, padding)
+            # Boxes which lie in the letterbox padding collapse when clipped to the image
+            visible = (boxes[:, 2] > 0) & (boxes[:, 3] > 0)
+            class_ids, boxes = class_ids[visible], boxes[visible]
+            try:
+                write_text_atomic(label_paths[image_path], format_yolo_labels(class_ids, boxes))
+            except OSError as e:
+                log(f"Failed to write labels for {image_path}: {e}")
+                counts["failed"] += 1
+                continue
+            counts["images"] += 1
+            counts["boxes"] += len(class_ids)
+            if counts["images"] % PROGRESS_INTERVAL == 0:
+                log(f"Pre-annotated {counts['images']} of {len(pairs)} images")
+        batch.clear()
+
+    def collect(done_futures):
+        for future in done_futures:
+            pending.discard(future)
+            image_path, prepared, error = future.result()
+            if error is not None:
+                log(error)
+                counts["failed"] += 1
+                continue
+            batch.append((image_path, prepared))
+            if len(batch) >= batch_size:
+                run_batch()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for image_path, _ in pairs:
+            pending.add(executor.submit(_prepare_task, image_path, detector.input_size))
+            # Bound the number of decoded images waiting for inference
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    if batch:
+        run_batch()
+
+    log(f"Pre-annotation complete. {counts['boxes']} boxes in {counts['images']} images, {counts['failed']} failed.")
+    return counts
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from core.image_size import CACHE_DIR
+
+PYRAMID_DIRECTORY = "pyramids"
+PYRAMID_MIN_PIXELS = 50_000_000  # Images with more pixels are shown through a tile pyramid
+TILE_SIZE = 512
+META_FILE = "pyramid.json"
+
+
+def pyramid_directory(image_path: str, cache_root: Optional[str] = None) -> str:
+    """Return the cache folder of the pyramid of image_path, which changes when the file changes."""
+    stat = os.stat(image_path)
+    key = f"{os.path.abspath(image_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    return os.path.join(cache_root or os.path.join(CACHE_DIR, PYRAMID_DIRECTORY), digest)
+
+
+class ImagePyramid:
+    """
+    Read-only view of a tile pyramid stored on disk.
+
+    Level 0 is the full resolution image and every further level halves both sides, until the
+    whole image fits into one tile. Each level is a memory-mapped .npy array of shape
+    (tile_rows, tile_cols, tile_size, tile_size, channels), so a tile is one contiguous block
+    and only the tiles that are read are paged in.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.channels = meta["channels"]
+        self.tile_size = meta["tile_size"]
+        self.level_sizes: List[Tuple[int, int]] = [tuple(size) for size in meta["level_sizes"]]
+        self.levels = [np.load(os.path.join(directory, f"level{level}.npy"), mmap_mode="r")
+                       for level in range(len(self.level_sizes))]
+
+    def level_for_scale(self, scale: float) -> int:
+        """Return the coarsest level which still has at least one level pixel per display pixel."""
+        level = 0
+        while level + 1 < len(self.levels) and 2 ** (level + 1) * scale <= 1.0:
+            level += 1
+        return level
+
+    def tile_grid(self, level: int) -> Tuple[int, int]:
+        """Return (columns, rows) of tiles of a level."""
+        rows, cols = self.levels[level].shape[:2]
+        return cols, rows
+
+    def read_tile(self, level: int, col: int, row: int) -> np.ndarray:
+        """Return a (tile_size, tile_size, channels) copy of one tile; tiles on the border are padded."""
+        return np.array(self.levels[level][row, col])
+
+
+def _downsample(strip: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Halve a (2T, W, C) strip holding height valid rows and width valid columns by 2x2 averaging."""
+    # Repeat the last valid row and column so the border pixels are not blended with the padding
+    if height % 2:
+        strip[height] = strip[height - 1]
+    if width % 2:
+        strip[:, width] = strip[:, width - 1]
+    rows, cols, channels = strip.shape
+    blocks = strip.reshape(rows // 2, 2, cols // 2, 2, channels).astype(np.uint16)
+    return ((blocks.sum(axis=(1, 3)) + 2) // 4).astype(np.uint8)
+
+
+def _open_level(path: str, width: int, height: int, channels: int, tile_size: int) -> np.ndarray:
+    rows, cols = -(-height // tile_size), -(-width // tile_size)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8,
+                                     shape=(rows, cols, tile_size, tile_size, channels))
+
+
+def _store_strip(level: np.ndarray, row: int, strip: np.ndarray):
+    """Cut a (T, cols * T, C) strip into the tiles of one tile row."""
+    tile_size, channels = level.shape[2], level.shape[4]
+    cols = level.shape[1]
+    level[row] = strip.reshape(tile_size, cols, tile_size, channels).transpose(1, 0, 2, 3)
+
+
+def build_pyramid(image_path: str, directory: str, tile_size: int = TILE_SIZE,
+                  log: Optional[Callable[[str], None]] = None) -> ImagePyramid:
+    """
+    Generate the tile pyramid of an image into directory.
+
+    The source image is decoded once; level 0 is written strip by strip and every further level
+    is computed from two tile rows of the previous one, so only the decode itself needs memory
+    in proportion to the image size.
+    """
+    from PIL import Image
+
+    temp_directory = f"{directory}.tmp{os.getpid()}"
+    shutil.rmtree(temp_directory, ignore_errors=True)
+    os.makedirs(temp_directory)
+    try:
+        max_pixels = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None  # Gigapixel images are expected here
+        try:
+            with Image.open(image_path) as img:
+                if img.mode in ("L", "RGB", "RGBA"):
+                    mode = img.mode
+                else:
+                    mode = "RGBA" if img.mode in ("LA", "PA") or "transparency" in img.info else "RGB"
+                channels = len(mode)
+                width, height = img.size
+                level = _open_level(os.path.join(temp_directory, "level0.npy"), width, height, channels, tile_size)
+                cols = level.shape[1]
+                for row in range(level.shape[0]):
+                    top = row * tile_size
+                    region = img.crop((0, top, width, min(height, top + tile_size)))
+                    if region.mode != mode:
+                        region = region.convert(mode)
+                    strip = np.zeros((tile_size, cols * tile_size, channels), dtype=np.uint8)
+                    strip[:region.height, :width] = np.asarray(region).reshape(region.height, width, channels)
+                    _store_strip(level, row, strip)
+        finally:
+            Image.MAX_IMAGE_PIXELS = max_pixels
+        level.flush()
+
+        level_sizes = [(width, height)]
+        while max(level_sizes[-1]) > tile_size:
+            previous = level
+            previous_width, previous_height = level_sizes[-1]
+            size = (-(-previous_width // 2), -(-previous_height // 2))
+            level = _open_level(os.path.join(temp_directory, f"level{len(level_sizes)}.npy"),
+                                size[0], size[1], channels, tile_size)
+            previous_rows, previous_cols = previous.shape[:2]
+            for row in range(level.shape[0]):
+                # Two tile rows of the previous level make one tile row of this level
+                strip = np.zeros((2 * tile_size, previous_cols * tile_size + tile_size, channels), dtype=np.uint8)
+                for offset in range(2):
+                    source_row = 2 * row + offset
+                    if source_row < previous_rows:
+                        tiles = np.asarray(previous[source_row])
+                        strip[offset * tile_size:(offset + 1) * tile_size, :previous_cols * tile_size] = \
+                            tiles.transpose(1, 0, 2, 3).reshape(tile_size, previous_cols * tile_size, channels)
+                valid_height = min(2 * tile_size, previous_height - 2 * row * tile_size)
+                halved = _downsample(strip, previous_width, valid_height)
+                _store_strip(level, row, halved[:, :level.shape[1] * tile_size])
+            level.flush()
+            level_sizes.append(size)
+            if log is not None:
+                log(f"Pyramid level {len(level_sizes) - 1}: {size[0]}x{size[1]}")
+        del level
+
+        with open(os.path.join(temp_directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"source": os.path.abspath(image_path), "width": width, "height": height,
+                       "channels": channels, "tile_size": tile_size, "level_sizes": level_sizes}, f)
+        try:
+            os.rename(temp_directory, directory)
+        except OSError:
+            # Built concurrently by another process, use that one
+            shutil.rmtree(temp_directory, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(temp_directory, ignore_errors=True)
+        raise
+    return ImagePyramid(directory)
+
+
+def open_pyramid(image_path: str, cache_root: Optional[str] = None,
+                 log: Optional[Callable[[str], None]] = None) -> ImagePyramid:
+    """Return the pyramid of image_path from the disk cache, building it on the first call."""
+    directory = pyramid_directory(image_path, cache_root)
+    if os.path.exists(os.path.join(directory, META_FILE)):
+        return ImagePyramid(directory)
+    if log is not None:
+        log(f"Building tile pyramid for {image_path}")
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    return build_pyramid(image_path, directory, log=log)
+
+
+def needs_pyramid(width: int, height: int) -> bool:
+    return width * height >= PYRAMID_MIN_PIXELS
@@ -0,0 +1,451 @@
+import hashlib
+import os
+import shutil
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core import tracing
+from core.dedup import find_duplicate_groups, group_representatives
+from core.yolo_labels import MATERIALIZED_MANIFEST, read_yolo_labels
+
+DATASET_SPLITS = ['train', 'val', 'test']
+BASE_DATASET = "test_dataset"
+DATASET_YAML = "dataset.yaml"
+# 'move' is the original layout change; the other modes leave the source files in place
+SPLIT_MODES = ['move', 'list', 'hardlink', 'symlink', 'reflink']
+LINK_BATCH_SIZE = 256  # Files linked per worker task
+FICLONE = 0x40049409  # Linux ioctl cloning a file's extents (btrfs, XFS, ...)
+
+
+def file_stem(name: str) -> str:
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def hash_fraction(name: str) -> float:
+    """Map the stem of a file name to a stable pseudo random number in [0, 1)."""
+    digest = hashlib.sha1(file_stem(name).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def split_label_files(all_ann_txt: Iterable[str], train_ratio: float, val_ratio: float,
+                      existing: Optional[Dict[str, str]] = None,
+                      strata: Optional[Dict[str, str]] = None,
+                      groups: Optional[Dict[str, str]] = None) -> Dict[str, List[str]]:
+    """
+    Split the annotation files into train, val and test lists from a hash of their stem.
+
+    The split of a file only depends on its stem (or the stem representing its group) and the
+    ratios, so re-splitting a grown dataset keeps every known file in its split and training
+    runs stay comparable.
+
+    Args:
+        all_ann_txt: Annotation (.txt) file names, or any file names with the sample's stem.
+        train_ratio: Proportion of data to use for training.
+        val_ratio: Proportion of data to use for validation.
+        existing: Mapping of stem to the split chosen by an earlier run. These files keep their
+            split and only the remaining files are placed.
+        strata: Mapping of file name to a stratum key, e.g. its rarest class. Files are then
+            placed in hash order into the split furthest below its share of the stratum, so
+            every split receives its share of every stratum.
+        groups: Mapping of file name to the file name representing its group of near-duplicates,
+            see duplicate_groups. A group is placed as a whole, joining the split of a member
+            placed by an earlier run, so duplicates never end up in two splits.
+
+    Returns:
+        Mapping of split name to the sorted annotation files in that split.
+    """
+    ratios = {'train': train_ratio, 'val': val_ratio, 'test': max(0.0, 1.0 - train_ratio - val_ratio)}
+    existing = existing or {}
+    groups = groups or {}
+    splits = {split: [] for split in DATASET_SPLITS}
+    group_splits = {}
+    new_files = []
+    for name in all_ann_txt:
+        split = existing.get(file_stem(name))
+        if split in splits:
+            splits[split].append(name)
+            group_splits.setdefault(groups.get(name, name), split)
+        else:
+            new_files.append(name)
+
+    # New files are placed in units: a group of near-duplicates, or a single file
+    units = {}
+    for name in new_files:
+        key = groups.get(name, name)
+        if key in group_splits:
+            splits[group_splits[key]].append(name)
+        else:
+            units.setdefault(key, []).append(name)
+
+    if strata is None:
+        for key, names in units.items():
+            fraction = hash_fraction(key)
+            if fraction < train_ratio:
+                splits['train'].extend(names)
+            elif fraction < train_ratio + val_ratio:
+                splits['val'].extend(names)
+            else:
+                splits['test'].extend(names)
+    else:
+        counts = {}
+        for split, names in splits.items():
+            for name in names:
+                counts.setdefault(strata.get(name), dict.fromkeys(DATASET_SPLITS, 0))[split] += 1
+        fractions = {key: hash_fraction(key) for key in units}
+        for key in sorted(units, key=fractions.__getitem__):
+            stratum_counts = counts.setdefault(strata.get(key), dict.fromkeys(DATASET_SPLITS, 0))
+            total = sum(stratum_counts.values()) + len(units[key])
+            split = max(DATASET_SPLITS, key=lambda s: ratios[s] * total - stratum_counts[s])
+            for name in units[key]:
+                counts.setdefault(strata.get(name), dict.fromkeys(DATASET_SPLITS, 0))[split] += 1
+                splits[split].append(name)
+
+    return {split: sorted(names) for split, names in splits.items()}
+
+
+def label_classes(label_paths: Iterable[str], catalog=None) -> Dict[str, Tuple[int, ...]]:
+    """Return the sorted class ids of every label file, from the catalog when one is given."""
+    label_paths = list(label_paths)
+    if catalog is not None:
+        known = {entry.label_path: entry.classes for entry in catalog.entries(labeled=True)}
+        missing = [path for path in label_paths if path not in known]
+    else:
+        known, missing = {}, label_paths
+    for path in missing:
+        try:
+            class_ids, _ = read_yolo_labels(path)
+            known[path] = tuple(sorted(set(class_ids.tolist())))
+        except (OSError, UnicodeDecodeError):
+            known[path] = ()
+    return {path: known[path] for path in label_paths}
+
+
+def rarest_class_strata(classes: Dict[str, Tuple[int, ...]]) -> Dict[str, str]:
+    """
+    Map every sample to its rarest class, the stratum used for a class balanced split.
+
+    Samples without boxes share the 'background' stratum.
+    """
+    image_counts = {}
+    for class_ids in classes.values():
+        for class_id in class_ids:
+            image_counts[class_id] = image_counts.get(class_id, 0) + 1
+    return {
+        name: str(min(class_ids, key=lambda c: (image_counts[c], c))) if class_ids else "background"
+        for name, class_ids in classes.items()
+    }
+
+
+def duplicate_groups(image_names: Dict[str, str], max_distance: int, catalog=None,
+                     log: Callable[[str], None] = print) -> Dict[str, str]:
+    """
+    Map the names of near-duplicate images to the name representing their group.
+
+    Args:
+        image_names: Mapping of image path to the name the split places, e.g. its label file.
+        max_distance: Differing perceptual hash bits up to which images are grouped, see core.dedup.
+        catalog: Optional DatasetCatalog caching the hashes.
+        log: Callable receiving progress and error messages.
+    """
+    names = {os.path.abspath(path): name for path, name in image_names.items()}
+    groups = find_duplicate_groups(names, max_distance, catalog, log)
+    return {names[path]: names[first] for path, first in group_representatives(groups).items()}
+
+
+def moved_assignments(ext_source_dir: str) -> Dict[str, str]:
+    """Return {label file path: split} of the annotation files moved by earlier runs of organize_files."""
+    assignments = {}
+    for split in DATASET_SPLITS:
+        labels_dir = os.path.join(ext_source_dir, split, 'labels')
+        if os.path.isdir(labels_dir):
+            for name in os.listdir(labels_dir):
+                if name.endswith('.txt'):
+                    assignments[os.path.join(labels_dir, name)] = split
+    return assignments
+
+
+def get_related_files(ann_txt_files: List[str], src_dir: str) -> Tuple[List[str], List[str]]:
+    """Return the .png images and .xml files which belong to the given annotation files."""
+    existing = set(os.listdir(src_dir))
+    images, xml_files = [], []
+    for txt_file in ann_txt_files:
+        base_name = os.path.splitext(txt_file)[0]
+        png_file = base_name + '.png'
+        xml_file = base_name + '.xml'
+        if png_file in existing:
+            images.append(png_file)
+        if xml_file in existing:
+            xml_files.append(xml_file)
+    return images, xml_files
+
+
+@tracing.traced("organize_files")
+def organize_files(source_dir: str, train_ratio: float, val_ratio: float, test_ratio: float,
+                   log: Callable[[str], None] = print, catalog=None,
+                   stratify: bool = False, dedup_distance: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Organize files into separate 'images' and 'labels' folders for training, validation, and testing.
+
+    Files moved by earlier runs stay where they are, so re-running after adding images only
+    places the new files. The split of a file is derived from a hash of its name.
+
+    Parameters:
+    source_dir (str): The directory containing mixed image and label files.
+    train_ratio (float): Proportion of data to use for training.
+    val_ratio (float): Proportion of data to use for validation.
+    test_ratio (float): Proportion of data to use for testing.
+    log: Callable receiving error messages.
+    catalog: Optional DatasetCatalog containing source_dir, queried for the annotated images.
+    stratify (bool): Keep the class balance of every split, see split_label_files.
+    dedup_distance (int): Keep images whose perceptual hashes differ in at most this many bits
+        in one split, see duplicate_groups. None disables the check.
+
+    Returns:
+    Mapping of split name to the annotation files moved into that split.
+    """
+    ext_source_dir = os.path.join(source_dir, BASE_DATASET)
+
+    # Ensure the target directories exist
+    for split in DATASET_SPLITS:
+        for folder in ['images', 'labels']:
+            os.makedirs(os.path.join(ext_source_dir, split, folder), exist_ok=True)
+
+    # Get list of all annotations, then place the new ones next to the earlier runs
+    if catalog is not None:
+        all_ann_txt = sorted(os.path.basename(entry.label_path)
+                             for entry in catalog.entries(source_dir, recursive=False, labeled=True))
+    else:
+        all_ann_txt = sorted(f for f in os.listdir(source_dir) if f.endswith('.txt'))
+    # Everything still in source_dir is new, the moved files only count towards the stratum shares
+    moved = moved_assignments(ext_source_dir)
+    existing = {file_stem(path): split for path, split in moved.items()}
+
+    strata = None
+    if stratify:
+        label_paths = {os.path.join(source_dir, f): f for f in all_ann_txt}
+        label_paths.update({path: path for path in moved})
+        classes = label_classes(label_paths, catalog)
+        strata = rarest_class_strata({label_paths[path]: class_ids for path, class_ids in classes.items()})
+    groups = None
+    if dedup_distance is not None:
+        image_names = {os.path.join(source_dir, file_stem(f) + '.png'): f for f in all_ann_txt}
+        image_names.update({os.path.join(ext_source_dir, split, 'images', file_stem(path) + '.png'): path
+                            for path, split in moved.items()})
+        image_names = {image: name for image, name in image_names.items() if os.path.exists(image)}
+        groups = duplicate_groups(image_names, dedup_distance, catalog, log)
+    splits = split_label_files(all_ann_txt + list(moved), train_ratio, val_ratio, existing, strata, groups)
+    new_ann_txt = set(all_ann_txt)
+    splits = {split: [f for f in names if f in new_ann_txt] for split, names in splits.items()}
+
+    # Helper function to move files
+    def move_files(file_list, src_folder, dst_folder, optional_files=False):
+        for file in file_list:
+            try:
+                shutil.move(os.path.join(src_folder, file), os.path.join(dst_folder, file))
+            except FileNotFoundError:
+                if not optional_files:
+                    log(f"File not found and skipped: {file}")
+
+    for split, ann_txt in splits.items():
+        images, xml_files = get_related_files(ann_txt, source_dir)
+        move_files(images, source_dir, os.path.join(ext_source_dir, split, 'images'))
+        move_files(xml_files, source_dir, os.path.join(ext_source_dir, split, 'labels'), optional_files=True)
+        move_files(ann_txt, source_dir, os.path.join(ext_source_dir, split, 'labels'))
+
+    return splits
+
+
+def reflink_file(source: str, destination: str):
+    """Create destination as a copy-on-write clone of source, never copying any data."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("Reflinks are not supported on this platform")
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError as e:
+            dst.close()
+            os.remove(destination)
+            raise OSError(f"Reflinks are not supported for {destination}: {e}")
+
+
+def _link_is_current(source: str, destination: str, mode: str) -> bool:
+    try:
+        if mode == 'symlink':
+            return os.readlink(destination) == os.path.abspath(source)
+        if mode == 'hardlink':
+            return not os.path.islink(destination) and os.path.samefile(source, destination)
+        # A reflink is an independent file, it is current if it is not older than its source
+        source_stat, destination_stat = os.stat(source), os.lstat(destination)
+        return (stat.S_ISREG(destination_stat.st_mode) and destination_stat.st_size == source_stat.st_size
+                and destination_stat.st_mtime_ns >= source_stat.st_mtime_ns)
+    except OSError:
+        return False
+
+
+def _link_files(pairs: List[Tuple[str, str]], mode: str) -> int:
+    """Create the missing or outdated links of pairs and return how many were created."""
+    created = 0
+    for source, destination in pairs:
+        if _link_is_current(source, destination, mode):
+            continue
+        if os.path.lexists(destination):
+            os.remove(destination)
+        if mode == 'hardlink':
+            os.link(source, destination)
+        elif mode == 'symlink':
+            os.symlink(os.path.abspath(source), destination)
+        else:
+            reflink_file(source, destination)
+        created += 1
+    return created
+
+
+def find_labeled_images(source_dir: str, catalog=None) -> List[Tuple[str, str]]:
+    """
+    Return (image_path, label_path) for every labeled .png image in source_dir.
+
+    The directory is listed once (or the catalog queried) instead of checking every file.
+    """
+    if catalog is not None:
+        return [(entry.image_path, entry.label_path)
+                for entry in catalog.entries(source_dir, recursive=False, labeled=True)]
+    names = set(os.listdir(source_dir))
+    pairs = []
+    for name in sorted(names):
+        stem, ext = os.path.splitext(name)
+        if ext == '.png' and stem + '.txt' in names:
+            pairs.append((os.path.join(source_dir, name), os.path.join(source_dir, stem + '.txt')))
+    return pairs
+
+
+def format_dataset_yaml(dataset_path: str, class_mapping: Dict[int, str]) -> str:
+    """Return an Ultralytics dataset.yaml referencing the train, val and test list files."""
+    lines = [f"path: {os.path.abspath(dataset_path)}"]
+    lines += [f"{split}: {split}.txt" for split in DATASET_SPLITS]
+    if class_mapping:
+        lines.append("names:")
+        lines += [f"  {class_id}: {name}" for class_id, name in sorted(class_mapping.items())]
+    else:
+        lines.append("names: {}")
+    return "\n".join(lines) + "\n"
+
+
+def _remove_materialized(output_dir: str, keep: set, log: Callable[[str], None]):
+    """Remove the links recorded by the previous run which are not part of keep."""
+    manifest = os.path.join(output_dir, MATERIALIZED_MANIFEST)
+    if not os.path.exists(manifest):
+        return
+    with open(manifest, "r", encoding="utf-8") as f:
+        for line in f:
+            path = os.path.join(output_dir, line.rstrip("\n"))
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log(f"Could not remove {path}: {e}")
+
+
+def listed_assignments(output_dir: str) -> Dict[str, str]:
+    """Return {stem: split} of the images listed in the list files of an earlier write_split run."""
+    assignments = {}
+    for split in DATASET_SPLITS:
+        list_file = os.path.join(output_dir, f"{split}.txt")
+        if os.path.exists(list_file):
+            with open(list_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        assignments[file_stem(line.strip())] = split
+    return assignments
+
+
+@tracing.traced("write_split")
+def write_split(source_dir: str, train_ratio: float, val_ratio: float, test_ratio: float, mode: str = 'list',
+                output_dir: Optional[str] = None, class_mapping: Optional[Dict[int, str]] = None,
+                max_workers: Optional[int] = None, log: Callable[[str], None] = print,
+                catalog=None, stratify: bool = False, incremental: bool = True,
+                dedup_distance: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Split a dataset without moving it: write Ultralytics image list files and a dataset.yaml.
+
+    With mode 'hardlink', 'symlink' or 'reflink' the images and labels are additionally linked
+    into '{split}/images' and '{split}/labels' below output_dir by a thread pool, and the list
+    files reference the links. No file data is copied in any mode, and links which are still
+    current are left alone.
+
+    Args:
+        source_dir: The directory containing mixed image and label files.
+        train_ratio: Proportion of data to use for training.
+        val_ratio: Proportion of data to use for validation.
+        test_ratio: Proportion of data to use for testing.
+        mode: 'list', 'hardlink', 'symlink' or 'reflink'.
+        output_dir: Where the list files are written, defaults to source_dir/test_dataset.
+        class_mapping: Class names for dataset.yaml, defaults to the class ids in the catalog.
+        max_workers: Number of linking threads.
+        log: Callable receiving progress and error messages.
+        catalog: Optional DatasetCatalog containing source_dir, queried for the annotated images.
+        stratify: Keep the class balance of every split, see split_label_files.
+        incremental: Keep the images listed by the previous run in their split and only place
+            the new ones. Without it every image is placed again from its hash.
+        dedup_distance: Keep images whose perceptual hashes differ in at most this many bits in
+            one split, see duplicate_groups. None disables the check.
+
+    Returns:
+        Mapping of split name to the image paths listed for that split.
+    """
+    if mode not in SPLIT_MODES or mode == 'move':
+        raise ValueError(f"Unknown split mode '{mode}', expected list, hardlink, symlink or reflink")
+    output_dir = output_dir or os.path.join(source_dir, BASE_DATASET)
+    os.makedirs(output_dir, exist_ok=True)
+
+    pairs = dict(find_labeled_images(source_dir, catalog))
+    existing = listed_assignments(output_dir) if incremental else {}
+    strata = None
+    if stratify:
+        classes = label_classes(pairs.values(), catalog)
+        strata = rarest_class_strata({image: classes[label] for image, label in pairs.items()})
+    groups = None
+    if dedup_distance is not None:
+        groups = duplicate_groups({image: image for image in pairs}, dedup_distance, catalog, log)
+    splits = split_label_files(sorted(pairs), train_ratio, val_ratio, existing, strata, groups)
+    placed = sum(1 for image in pairs if file_stem(image) not in existing)
+    log(f"Placed {placed} new images, {len(pairs) - placed} kept their split")
+    if class_mapping is None:
+        class_ids = catalog.class_image_counts() if catalog is not None else {}
+        class_mapping = {class_id: str(class_id) for class_id in class_ids}
+
+    listed = {split: list(images) for split, images in splits.items()}
+    if mode != 'list':
+        links = []
+        for split, images in splits.items():
+            for folder in ['images', 'labels']:
+                os.makedirs(os.path.join(output_dir, split, folder), exist_ok=True)
+            listed[split] = []
+            for image in images:
+                image_link = os.path.join(output_dir, split, 'images', os.path.basename(image))
+                label_link = os.path.join(output_dir, split, 'labels', os.path.basename(pairs[image]))
+                links += [(image, image_link), (pairs[image], label_link)]
+                listed[split].append(image_link)
+        _remove_materialized(output_dir, {link for _, link in links}, log)
+        # Record the links before creating them, so an interrupted run is still cleaned up
+        with open(os.path.join(output_dir, MATERIALIZED_MANIFEST), "w", encoding="utf-8") as f:
+            f.writelines(os.path.relpath(link, output_dir) + "\n" for _, link in links)
+        batches = [links[i:i + LINK_BATCH_SIZE] for i in range(0, len(links), LINK_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # sum() re-raises the first failure, e.g. reflinks on a file system without support
+            created = sum(executor.map(lambda batch: _link_files(batch, mode), batches))
+        log(f"Created {created} {mode}s in {output_dir}, {len(links) - created} were up to date")
+
+    for split, images in listed.items():
+        with open(os.path.join(output_dir, f"{split}.txt"), "w", encoding="utf-8") as f:
+            f.writelines(os.path.abspath(image) + "\n" for image in images)
+        log(f"{split}: {len(images)} images")
+    with open(os.path.join(output_dir, DATASET_YAML), "w", encoding="utf-8") as f:
+        f.write(format_dataset_yaml(output_dir, class_mapping))
+    log(f"Dataset description written to {os.path.join(output_dir, DATASET_YAML)}")
+    return listed
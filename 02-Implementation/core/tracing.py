@@ -0,0 +1,204 @@
+"""
+Lightweight tracing of the dataset operations and the GUI.
+
+Spans and counters are recorded as Chrome trace events, which can be opened in
+chrome://tracing or https://ui.perfetto.dev. Tracing is disabled by default; a disabled span
+costs one function call.
+
+    from core import tracing
+
+    tracing.enable()
+    with tracing.span("yolo_to_coco", directory=yolo_dir) as s:
+        ...
+        s.set(images=count)
+    tracing.export_chrome_trace("trace.json")
+    print(tracing.format_summary())
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+MAX_EVENTS = 1_000_000  # Later events are counted as dropped instead of recorded
+
+_enabled = False
+_events: List[Dict[str, Any]] = []
+_dropped = 0
+_lock = threading.Lock()
+
+
+def enable(enabled: bool = True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset():
+    """Discard every recorded event."""
+    global _dropped
+    with _lock:
+        _events.clear()
+        _dropped = 0
+
+
+def _now_us() -> float:
+    # perf_counter_ns is a system wide monotonic clock, comparable between worker processes
+    return time.perf_counter_ns() / 1000
+
+
+def _record(event: Dict[str, Any]):
+    global _dropped
+    with _lock:
+        if len(_events) < MAX_EVENTS:
+            _events.append(event)
+        else:
+            _dropped += 1
+
+
+def add_span(name: str, start_us: float, end_us: float, category: str = "app", pid: int = None,
+             tid: int = None, **args):
+    """Record a span measured elsewhere, e.g. in a worker process."""
+    if not _enabled:
+        return
+    _record({"name": name, "cat": category, "ph": "X", "ts": start_us, "dur": end_us - start_us,
+             "pid": os.getpid() if pid is None else pid, "tid": threading.get_ident() if tid is None else tid,
+             "args": args})
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name: str, category: str, args: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def set(self, **args):
+        """Attach values known only at the end of the span, e.g. counts."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        add_span(self.name, self.start, _now_us(), self.category, **self.args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, category: str = "app", **args):
+    """Return a context manager recording the time spent inside it as a span."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def traced(name: str = None, category: str = "app"):
+    """Decorator recording every call of a function as a span."""
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(span_name, category, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def counter(name: str, **values):
+    """Record the current value of one or more counters, shown as a graph in the trace viewer."""
+    if not _enabled:
+        return
+    _record({"name": name, "ph": "C", "ts": _now_us(), "pid": os.getpid(), "tid": threading.get_ident(),
+             "args": values})
+
+
+def timed_call(function: Callable, *args) -> Tuple[Any, Tuple[int, int, float, float]]:
+    """
+    Call function(*args) and return (result, (pid, tid, start_us, end_us)).
+
+    Submit this to a process pool instead of function to get the timing of the work done in the
+    worker; worker_result() unpacks it and records the span in the main process.
+    """
+    start = _now_us()
+    result = function(*args)
+    return result, (os.getpid(), threading.get_ident(), start, _now_us())
+
+
+def worker_result(timed_result: Tuple[Any, Tuple[int, int, float, float]], name: str,
+                  category: str = "worker", **args) -> Any:
+    """Record the span of a timed_call result and return the result of the call."""
+    result, (pid, tid, start, end) = timed_result
+    add_span(name, start, end, category, pid, tid, **args)
+    return result
+
+
+def export_chrome_trace(path: str) -> int:
+    """Write the recorded events as Chrome trace JSON and return the number of events."""
+    with _lock:
+        events = list(_events)
+        dropped = _dropped
+    metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"yolo8 {pid}"}}
+                for pid in sorted({event["pid"] for event in events})]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms",
+                   "otherData": {"dropped_events": dropped}}, f)
+    return len(events)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """Return count, total, p50, p95 and max duration in milliseconds of every span name."""
+    durations: Dict[str, List[float]] = {}
+    with _lock:
+        for event in _events:
+            if event["ph"] == "X":
+                durations.setdefault(event["name"], []).append(event["dur"] / 1000)
+    result = {}
+    for name, values in durations.items():
+        values.sort()
+        result[name] = {"count": len(values), "total_ms": sum(values), "p50_ms": _percentile(values, 0.5),
+                        "p95_ms": _percentile(values, 0.95), "max_ms": values[-1]}
+    return dict(sorted(result.items(), key=lambda item: -item[1]["total_ms"]))
+
+
+def format_summary() -> str:
+    """Return the summary as a text table ordered by total time."""
+    lines = [f"{'span':<28} {'count':>8} {'total ms':>11} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+    for name, stats in summary().items():
+        lines.append(f"{name:<28} {stats['count']:>8} {stats['total_ms']:>11.1f} {stats['p50_ms']:>9.2f} "
+                     f"{stats['p95_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+    return "\n".join(lines)
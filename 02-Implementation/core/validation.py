@@ -0,0 +1,192 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core import tracing
+from core.iou import overlapping_pairs
+from core.yolo_labels import get_image_size, iter_label_files, read_yolo_labels, xywhn_to_xyxy
+
+# Directories with fewer annotation files are scanned without starting worker processes
+PARALLEL_MIN_FILES = 256
+
+
+def find_missing_annotations(directory_path: str, catalog=None) -> Tuple[List[str], List[str]]:
+    """
+    Find .png images which do not have a matching annotation .txt file.
+
+    Args:
+        directory_path: Directory containing the images and annotation files.
+        catalog: Optional DatasetCatalog containing directory_path, queried instead of listing it.
+
+    Returns:
+        A tuple (txt_files, missing_files) with the base names of the existing annotation
+        files and the expected names of the missing annotation files.
+    """
+    if catalog is not None:
+        txt_files, missing_files = [], []
+        for entry in catalog.entries(directory_path, recursive=False):
+            stem = os.path.splitext(os.path.basename(entry.image_path))[0]
+            if entry.label_path is not None:
+                txt_files.append(stem)
+            else:
+                missing_files.append(f"{stem}.txt")
+        return sorted(txt_files), sorted(missing_files)
+
+    names = os.listdir(directory_path)
+    txt_files = {os.path.splitext(f)[0] for f in names if f.endswith('.txt')}
+    png_files = {os.path.splitext(f)[0] for f in names if f.endswith('.png')}
+    missing_files = sorted(f"{png_file}.txt" for png_file in png_files if png_file not in txt_files)
+    return sorted(txt_files), missing_files
+
+
+def find_unreadable_images(directory_path: str, catalog=None) -> List[str]:
+    """Return the .png images in directory_path whose header cannot be read, optionally querying a DatasetCatalog."""
+    if catalog is not None:
+        return [os.path.basename(entry.image_path)
+                for entry in catalog.entries(directory_path, recursive=False) if entry.width is None]
+    unreadable = []
+    for name in sorted(os.listdir(directory_path)):
+        if name.endswith('.png'):
+            try:
+                get_image_size(os.path.join(directory_path, name))
+            except ValueError:
+                unreadable.append(name)
+    return unreadable
+
+
+def compute_iou(box1: Tuple[float, float, float, float], box2: Tuple[float, float, float, float]) -> float:
+    """
+    Compute Intersection over Union (IoU) between two bounding boxes.
+
+    Args:
+        box1: Tuple (x_min, y_min, x_max, y_max) for the first box.
+        box2: Tuple (x_min, y_min, x_max, y_max) for the second box.
+
+    Returns:
+        IoU: A float value between 0 and 1 representing the IoU.
+    """
+    x_min_inter = max(box1[0], box2[0])
+    y_min_inter = max(box1[1], box2[1])
+    x_max_inter = min(box1[2], box2[2])
+    y_max_inter = min(box1[3], box2[3])
+
+    if x_min_inter >= x_max_inter or y_min_inter >= y_max_inter:
+        return 0.0
+
+    intersection = (x_max_inter - x_min_inter) * (y_max_inter - y_min_inter)
+    box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
+    box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
+
+    return intersection / (box1_area + box2_area - intersection)
+
+
+def overlaps_in_file(txt_path: str, iou_threshold: float = 0.5) -> Tuple[List[Tuple[int, int, float]], List[str]]:
+    """
+    Find the overlapping box pairs in one YOLO annotation file.
+
+    Args:
+        txt_path: Path to the annotation (.txt) file.
+        iou_threshold: Threshold for IoU to consider bounding boxes as overlapping.
+
+    Returns:
+        A tuple (pairs, messages) where pairs holds (box_index1, box_index2, iou) for every
+        overlapping pair (box indices count the valid annotation lines from 0) and messages
+        lists parse problems.
+    """
+    messages = []
+    try:
+        _, boxes = read_yolo_labels(txt_path, messages.append)
+    except Exception as e:
+        return [], [f"Error reading {txt_path}: {e}"]
+    i, j, iou = overlapping_pairs(xywhn_to_xyxy(boxes), iou_threshold)
+    return list(zip(i.tolist(), j.tolist(), iou.tolist())), messages
+
+
+def _overlaps_task(args):
+    return overlaps_in_file(*args)
+
+
+@tracing.traced("find_overlapping_boxes")
+def find_overlapping_boxes(directory_path: str, iou_threshold: float = 0.5, recursive: bool = False,
+                           max_workers: Optional[int] = None,
+                           log: Callable[[str], None] = print,
+                           catalog=None, label_store=None) -> Dict[str, List[Tuple[int, int, float]]]:
+    """
+    Detect overlapping bounding boxes in all YOLO annotation files of a directory.
+
+    Large directories are scanned in a process pool.
+
+    Args:
+        directory_path: Path to the directory containing annotation (.txt) files.
+        iou_threshold: Threshold for IoU to consider bounding boxes as overlapping.
+        recursive: Also scan the sub directories.
+        max_workers: Number of worker processes, defaults to the number of CPUs.
+        log: Callable receiving error messages.
+        catalog: Optional DatasetCatalog containing directory_path, queried for the labeled images
+            instead of listing the directory.
+        label_store: Optional synced LabelStore of the dataset. Its boxes are checked in this
+            process without reading the label files; label files without an image are not in the store.
+
+    Returns:
+        Mapping of annotation file (relative to directory_path) to its overlapping box pairs
+        (box_index1, box_index2, iou). Files without overlaps are left out.
+    """
+    if not os.path.isdir(directory_path):
+        raise FileNotFoundError(f"The directory {directory_path} does not exist.")
+
+    if label_store is not None:
+        # Convert the boxes of the whole dataset at once, then slice them per label file
+        xyxy = xywhn_to_xyxy(label_store.boxes)
+        offsets = label_store.offsets
+        overlaps = {}
+        for index in label_store.indices(directory_path, recursive):
+            if offsets[index + 1] - offsets[index] < 2:
+                continue
+            i, j, iou = overlapping_pairs(xyxy[offsets[index]:offsets[index + 1]], iou_threshold)
+            if len(i):
+                txt_path = os.path.join(label_store.root, label_store.label_paths[index])
+                overlaps[os.path.relpath(txt_path, directory_path)] = list(zip(i.tolist(), j.tolist(), iou.tolist()))
+        return overlaps
+
+    if catalog is not None:
+        txt_paths = sorted(entry.label_path for entry in catalog.entries(directory_path, recursive, labeled=True))
+    elif recursive:
+        txt_paths = list(iter_label_files(directory_path))
+    else:
+        txt_paths = [os.path.join(directory_path, f) for f in sorted(os.listdir(directory_path)) if f.endswith('.txt')]
+
+    tasks = [(txt_path, iou_threshold) for txt_path in txt_paths]
+    if len(tasks) < PARALLEL_MIN_FILES or max_workers == 1:
+        results = map(_overlaps_task, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        results = executor.map(_overlaps_task, tasks, chunksize=64)
+
+    overlaps = {}
+    try:
+        for txt_path, (pairs, messages) in zip(txt_paths, results):
+            for message in messages:
+                log(message)
+            if pairs:
+                overlaps[os.path.relpath(txt_path, directory_path)] = pairs
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return overlaps
+
+
+def find_overlapping_files(directory_path: str, iou_threshold: float = 0.5,
+                           log: Callable[[str], None] = print) -> List[str]:
+    """
+    Detect overlapping bounding boxes in annotation files in YOLO format.
+
+    Args:
+        directory_path: Path to the directory containing annotation (.txt) files.
+        iou_threshold: Threshold for IoU to consider bounding boxes as overlapping.
+        log: Callable receiving error messages.
+
+    Returns:
+        Names of the annotation files containing overlapping boxes.
+    """
+    return list(find_overlapping_boxes(directory_path, iou_threshold, log=log))
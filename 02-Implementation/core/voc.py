@@ -0,0 +1,319 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from core import tracing
+from core.yolo_labels import (get_image_size, iter_label_files, normalize_class_mapping, read_yolo_labels,
+                              resolve_image_for_label)
+
+VOC_STATE_FILE = ".yolo8_voc.json"  # Class mapping of the last export, a change rewrites every file
+VOC_STATE_VERSION = 1
+BATCH_SIZE = 64  # Images per worker task
+PROGRESS_INTERVAL = 5000  # Number of written files between two progress messages
+
+
+def build_voc_xml(image_file: str, width: int, height: int, class_ids: np.ndarray, boxes: np.ndarray,
+                  class_mapping: Dict[int, str], log: Callable[[str], None] = print) -> bytes:
+    """
+    Build the VOC XML document for one image.
+
+    Args:
+        image_file: Path of the annotated image.
+        width: Image width in pixels.
+        height: Image height in pixels.
+        class_ids: Array of shape (N,) with the class id of every box.
+        boxes: Array of shape (N, 4) with normalized xywh boxes.
+        class_mapping: Mapping of integer class id to class name.
+        log: Callable receiving a message for every skipped box.
+
+    Returns:
+        The encoded XML document.
+    """
+    annotation = ET.Element("annotation")
+    ET.SubElement(annotation, "filename").text = os.path.basename(image_file)
+    size = ET.SubElement(annotation, "size")
+    ET.SubElement(size, "width").text = str(width)
+    ET.SubElement(size, "height").text = str(height)
+
+    # Convert YOLO normalized coordinates to VOC absolute coordinates
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    xmin = np.maximum(0, ((boxes[:, 0] - boxes[:, 2] / 2) * width).astype(np.int64))
+    ymin = np.maximum(0, ((boxes[:, 1] - boxes[:, 3] / 2) * height).astype(np.int64))
+    xmax = np.minimum(width, ((boxes[:, 0] + boxes[:, 2] / 2) * width).astype(np.int64))
+    ymax = np.minimum(height, ((boxes[:, 1] + boxes[:, 3] / 2) * height).astype(np.int64))
+
+    for class_id, x1, y1, x2, y2 in zip(np.asarray(class_ids).tolist(), xmin.tolist(), ymin.tolist(),
+                                        xmax.tolist(), ymax.tolist()):
+        # Skip invalid bounding boxes
+        if x1 >= x2 or y1 >= y2:
+            log(f"Invalid bounding box skipped: {x1}, {y1}, {x2}, {y2}")
+            continue
+
+        # Create object annotation
+        obj = ET.SubElement(annotation, "object")
+        ET.SubElement(obj, "name").text = class_mapping.get(int(class_id), "unknown")
+        bndbox = ET.SubElement(obj, "bndbox")
+        ET.SubElement(bndbox, "xmin").text = str(x1)
+        ET.SubElement(bndbox, "ymin").text = str(y1)
+        ET.SubElement(bndbox, "xmax").text = str(x2)
+        ET.SubElement(bndbox, "ymax").text = str(y2)
+
+    return ET.tostring(annotation, encoding="utf-8", method="xml")
+
+
+def voc_path(label_path: str) -> str:
+    """Return the path of the VOC XML file written for a YOLO label file."""
+    return os.path.splitext(label_path)[0] + ".xml"
+
+
+def write_voc_file(path: str, voc_xml: bytes):
+    """Write a VOC XML file through a temporary file, so an interrupted export never leaves a truncated file."""
+    temp_path = path + ".part"
+    with open(temp_path, "wb") as xml_out:
+        xml_out.write(voc_xml)
+    os.replace(temp_path, path)
+
+
+def voc_is_current(xml_path: str, label_mtime_ns: int, image_mtime_ns: int) -> bool:
+    """Return True if the XML file exists and is not older than its label file and image."""
+    try:
+        xml_mtime_ns = os.stat(xml_path).st_mtime_ns
+    except OSError:
+        return False
+    return xml_mtime_ns >= label_mtime_ns and xml_mtime_ns >= image_mtime_ns
+
+
+def remove_voc_file(label_path: str):
+    """Remove the XML file of a label file which failed to export, so the next export retries it."""
+    try:
+        os.remove(voc_path(label_path))
+    except OSError:
+        pass
+
+
+def _export_batch(items: List[tuple], class_mapping: Dict[int, str]) -> Tuple[int, List[str]]:
+    """
+    Write the VOC XML files of a batch of labeled images (runs in a worker process).
+
+    Every item is (label_path, image_path, width, height, labels) where width and height are None
+    if the image header still has to be read and labels is None if the label file still has to be
+    read, otherwise (class_ids, boxes).
+
+    Returns:
+        The number of files written and the messages to log.
+    """
+    messages = []
+    written = 0
+    for label_path, image_path, width, height, labels in items:
+        try:
+            if width is None:
+                width, height = get_image_size(image_path)
+            class_ids, boxes = labels if labels is not None else read_yolo_labels(label_path, messages.append)
+            write_voc_file(voc_path(label_path),
+                           build_voc_xml(image_path, width, height, class_ids, boxes, class_mapping, messages.append))
+            written += 1
+        except (OSError, ValueError) as e:
+            messages.append(f"Failed to export {label_path}: {e}")
+            # A stale file would look up to date to the next export
+            remove_voc_file(label_path)
+    return written, messages
+
+
+def iter_export_candidates(yolo_dir: str, log: Callable[[str], None], catalog=None, label_store=None
+                           ) -> Iterator[tuple]:
+    """
+    Yield (item, label_mtime_ns, image_mtime_ns) for every labeled image below yolo_dir, with
+    item as expected by _export_batch.
+
+    The mtimes come from the label store or the catalog when given, so whether an XML file is
+    current can be decided before the image header or the label file is read.
+    """
+    if label_store is not None:
+        for i in label_store.indices(yolo_dir, True):
+            label_path = os.path.join(label_store.root, label_store.label_paths[i])
+            image_path = os.path.join(label_store.root, label_store.image_paths[i])
+            try:
+                image_mtime_ns = os.stat(image_path).st_mtime_ns
+            except OSError as e:
+                log(f"Failed to get image size for {image_path}: {e}")
+                continue
+            width, height, label_mtime_ns = label_store.image_info[i].tolist()
+            # Copied out of the memory map, the item may be sent to a worker process
+            labels = tuple(np.array(array) for array in label_store.labels(i))
+            yield (label_path, image_path, width, height, labels), label_mtime_ns, image_mtime_ns
+    elif catalog is not None:
+        for label_path, image_path, width, height, label_mtime_ns, image_mtime_ns in \
+                catalog.labeled_image_stats(yolo_dir, log):
+            yield (label_path, image_path, width, height, None), label_mtime_ns, image_mtime_ns
+    else:
+        for label_path in iter_label_files(yolo_dir):
+            image_path = resolve_image_for_label(label_path)
+            if image_path is None:
+                log(f"No matching image found for {label_path}")
+                continue
+            try:
+                label_mtime_ns = os.stat(label_path).st_mtime_ns
+                image_mtime_ns = os.stat(image_path).st_mtime_ns
+            except OSError as e:
+                log(f"Failed to export {label_path}: {e}")
+                continue
+            yield (label_path, image_path, None, None, None), label_mtime_ns, image_mtime_ns
+
+
+def _export_state(class_mapping: Dict[int, str]) -> dict:
+    return {"version": VOC_STATE_VERSION, "classes": {str(k): v for k, v in sorted(class_mapping.items())}}
+
+
+def export_state_matches(yolo_dir: str, class_mapping: Dict[int, str]) -> bool:
+    """Return True if the last export into yolo_dir used the same class names, so its files can be kept."""
+    try:
+        with open(os.path.join(yolo_dir, VOC_STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f) == _export_state(class_mapping)
+    except (OSError, ValueError):
+        return False
+
+
+def save_export_state(yolo_dir: str, class_mapping: Dict[int, str]):
+    with open(os.path.join(yolo_dir, VOC_STATE_FILE), "w", encoding="utf-8") as f:
+        json.dump(_export_state(class_mapping), f)
+
+
+def discard_export_state(yolo_dir: str):
+    """Forget the class names of the last export, before its files are rewritten with other names."""
+    try:
+        os.remove(os.path.join(yolo_dir, VOC_STATE_FILE))
+    except FileNotFoundError:
+        pass
+
+
+class VocBatchWriter:
+    """
+    Write VOC XML files in batches of BATCH_SIZE images.
+
+    Full batches are built by a process pool with a bounded number of queued batches. The pool
+    is only started by the second batch: a handful of files is written in this process by close().
+    """
+
+    def __init__(self, class_mapping: Dict[int, str], log: Callable[[str], None] = print,
+                 max_workers: Optional[int] = None):
+        self.class_mapping = class_mapping
+        self.log = log
+        self.counts = {"written": 0, "up_to_date": 0, "failed": 0}
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._batch = []
+        self._pending = {}
+        self._executor = None
+
+    def add(self, item: tuple):
+        """Queue the XML file of one image, item as expected by _export_batch."""
+        self._batch.append(item)
+        if len(self._batch) < BATCH_SIZE:
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._submit()
+        # Bound the number of queued batches so that huge datasets do not fill the memory
+        if len(self._pending) >= self.max_workers * 4:
+            done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+            self._collect(done)
+
+    def skip(self):
+        """Count an image whose XML file is up to date."""
+        self.counts["up_to_date"] += 1
+
+    def fail(self, label_path: str):
+        """Count an image which could not be read before it was queued, removing its stale XML file."""
+        remove_voc_file(label_path)
+        self.counts["failed"] += 1
+
+    def _submit(self):
+        future = self._executor.submit(tracing.timed_call, _export_batch, self._batch, self.class_mapping)
+        self._pending[future] = len(self._batch)
+        self._batch = []
+
+    def _record(self, size: int, written: int, messages: List[str]):
+        for message in messages:
+            self.log(message)
+        before = self.counts["written"]
+        self.counts["written"] += written
+        self.counts["failed"] += size - written
+        if self.counts["written"] // PROGRESS_INTERVAL > before // PROGRESS_INTERVAL:
+            self.log(f"Exported {self.counts['written']} VOC files ({self.counts['up_to_date']} up to date)")
+
+    def _collect(self, done_futures):
+        for future in done_futures:
+            size = self._pending.pop(future)
+            self._record(size, *tracing.worker_result(future.result(), "voc_batch", files=size))
+
+    def close(self) -> Dict[str, int]:
+        """Write the remaining files, wait for the workers and return the counts."""
+        try:
+            if self._batch and self._executor is None:
+                # A handful of edits is exported right here, without starting any worker
+                with tracing.span("voc_batch", files=len(self._batch)):
+                    self._record(len(self._batch), *_export_batch(self._batch, self.class_mapping))
+                self._batch = []
+            elif self._batch:
+                self._submit()
+            self._collect(list(self._pending))
+        finally:
+            self.abort()
+        return self.counts
+
+    def abort(self):
+        """Stop the workers, dropping the queued batches."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self._pending.clear()
+
+
+@tracing.traced("yolo_to_voc")
+def yolo_to_voc(yolo_dir: str, class_mapping: Dict, log: Callable[[str], None] = print, catalog=None,
+                label_store=None, force: bool = False, max_workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Write a VOC XML file next to every YOLO label file below yolo_dir.
+
+    Only XML files older than their label file or image are written again, unless the class
+    mapping changed since the last export. The files are built by a process pool in batches, see
+    VocBatchWriter.
+
+    Args:
+        yolo_dir: Directory containing the YOLO annotation (.txt) files.
+        class_mapping: Mapping of class id to class name.
+        log: Callable receiving progress and error messages.
+        catalog: Optional DatasetCatalog of the dataset, used instead of walking yolo_dir and
+            reading the image headers.
+        label_store: Optional synced LabelStore of the dataset, used instead of reading the label files.
+        force: Write every XML file even if it is up to date.
+        max_workers: Number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+        Number of files per result ('written', 'up_to_date', 'failed').
+    """
+    class_mapping = normalize_class_mapping(class_mapping)
+    # Class names are part of every file
+    if not export_state_matches(yolo_dir, class_mapping):
+        force = True
+        discard_export_state(yolo_dir)
+    writer = VocBatchWriter(class_mapping, log, max_workers)
+    try:
+        for item, label_mtime_ns, image_mtime_ns in iter_export_candidates(yolo_dir, log, catalog, label_store):
+            if not force and voc_is_current(voc_path(item[0]), label_mtime_ns, image_mtime_ns):
+                writer.skip()
+            else:
+                writer.add(item)
+    except BaseException:
+        writer.abort()
+        raise
+    counts = writer.close()
+
+    # Files which failed were removed, so the next run only retries those
+    save_export_state(yolo_dir, class_mapping)
+    log(f"VOC export complete. {counts['written']} written, {counts['up_to_date']} up to date, "
+        f"{counts['failed']} failed.")
+    return counts
@@ -0,0 +1,247 @@
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Image extensions that can be paired with a YOLO label file
+IMAGE_EXTENSIONS = [".png"]
+# Links written by core.splitter.write_split into its output folder, removed once no longer listed
+MATERIALIZED_MANIFEST = "materialized.txt"
+
+EMPTY_CLASSES = np.zeros(0, dtype=np.int32)
+EMPTY_BOXES = np.zeros((0, 4), dtype=np.float32)
+
+
+def parse_yolo_text(text: str) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Parse the content of a YOLO label file into NumPy arrays.
+
+    Args:
+        text: Content of the label file, one 'class x_center y_center width height' line per box.
+
+    Returns:
+        A tuple (class_ids, boxes, invalid_lines) where class_ids is an int32 array of shape (N,),
+        boxes is a float32 array of shape (N, 4) holding normalized xywh and invalid_lines lists
+        the lines which could not be parsed.
+    """
+    tokens = text.split()
+    if not tokens:
+        return EMPTY_CLASSES, EMPTY_BOXES, []
+
+    # Fast path: every line is well formed, parse the whole file in one call
+    if len(tokens) % 5 == 0 and len(tokens) // 5 == sum(1 for line in text.splitlines() if line.strip()):
+        try:
+            values = np.array(tokens, dtype=np.float32).reshape(-1, 5)
+            return values[:, 0].astype(np.int32), np.ascontiguousarray(values[:, 1:]), []
+        except ValueError:
+            pass
+
+    # Slow path: parse line by line and keep track of the malformed ones
+    rows, invalid_lines = [], []
+    for line in text.splitlines():
+        data = line.strip().split()
+        if not data:
+            continue
+        if len(data) != 5:
+            invalid_lines.append(line.strip())
+            continue
+        try:
+            rows.append([float(value) for value in data])
+        except ValueError:
+            invalid_lines.append(line.strip())
+
+    if not rows:
+        return EMPTY_CLASSES, EMPTY_BOXES, invalid_lines
+    values = np.array(rows, dtype=np.float32)
+    return values[:, 0].astype(np.int32), np.ascontiguousarray(values[:, 1:]), invalid_lines
+
+
+def read_yolo_labels(label_path: str, log: Optional[Callable[[str], None]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read a YOLO label file into NumPy arrays.
+
+    Args:
+        label_path: Path to the .txt label file.
+        log: Optional callable receiving a message for every invalid line.
+
+    Returns:
+        A tuple (class_ids, boxes) as returned by parse_yolo_text.
+    """
+    with open(label_path, "r") as f:
+        text = f.read()
+    class_ids, boxes, invalid_lines = parse_yolo_text(text)
+    if log is not None:
+        for line in invalid_lines:
+            log(f"Invalid annotation in {label_path}: {line}")
+    return class_ids, boxes
+
+
+def format_yolo_labels(class_ids: np.ndarray, boxes: np.ndarray, precision: int = 6) -> str:
+    """Format class ids and normalized xywh boxes as YOLO label text."""
+    lines = [
+        f"{int(class_id)} {x:.{precision}f} {y:.{precision}f} {w:.{precision}f} {h:.{precision}f}"
+        for class_id, (x, y, w, h) in zip(class_ids, np.asarray(boxes, dtype=np.float64))
+    ]
+    return "".join(line + "\n" for line in lines)
+
+
+def write_text_atomic(path: str, text: str):
+    """
+    Replace the content of path with text atomically.
+
+    The text is written to a temporary file in the same folder which is then renamed over path,
+    so readers see either the old or the new content, never a partly written file.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    # Unique per writer; created with open() so the file gets the usual permissions
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def xywhn_to_xyxy(boxes: np.ndarray, width: float = 1.0, height: float = 1.0) -> np.ndarray:
+    """
+    Convert normalized center boxes to corner boxes.
+
+    Args:
+        boxes: Array of shape (N, 4) with x_center, y_center, width, height.
+        width: Image width used to scale the x coordinates.
+        height: Image height used to scale the y coordinates.
+
+    Returns:
+        Array of shape (N, 4) with x_min, y_min, x_max, y_max.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    half_w = boxes[:, 2] / 2
+    half_h = boxes[:, 3] / 2
+    xyxy = np.stack([
+        boxes[:, 0] - half_w,
+        boxes[:, 1] - half_h,
+        boxes[:, 0] + half_w,
+        boxes[:, 1] + half_h,
+    ], axis=1)
+    xyxy[:, [0, 2]] *= width
+    xyxy[:, [1, 3]] *= height
+    return xyxy
+
+
+def xyxy_to_xywhn(boxes: np.ndarray, width: float, height: float) -> np.ndarray:
+    """Convert absolute corner boxes to normalized center boxes."""
+    boxes = np.asarray(boxes, dtype=np.float64)
+    xywhn = np.stack([
+        (boxes[:, 0] + boxes[:, 2]) / 2 / width,
+        (boxes[:, 1] + boxes[:, 3]) / 2 / height,
+        (boxes[:, 2] - boxes[:, 0]) / width,
+        (boxes[:, 3] - boxes[:, 1]) / height,
+    ], axis=1)
+    return xywhn.reshape(-1, 4)
+
+
+def normalize_class_mapping(class_mapping: Dict) -> Dict[int, str]:
+    """Return a copy of class_mapping with integer class ids as keys."""
+    return {int(class_id): class_name for class_id, class_name in class_mapping.items()}
+
+
+def resolve_image_for_label(label_path: str) -> Optional[str]:
+    """
+    Find the image belonging to a YOLO label file.
+
+    The image is looked up next to the label file, or in the sibling 'images' folder when the
+    label lives in a 'labels' folder of a split dataset.
+
+    Args:
+        label_path: Path to the .txt label file.
+
+    Returns:
+        Path to the matching image, or None if no image exists.
+    """
+    root, file = os.path.split(label_path)
+    stem = os.path.splitext(file)[0]
+    for ext in IMAGE_EXTENSIONS:
+        possible_image_file = os.path.join(root, stem + ext)
+        # check if testing data has been split
+        if os.path.basename(os.path.normpath(root)) == 'labels':
+            possible_image_file = os.path.join(Path(root).parent, 'images', stem + ext)
+        if os.path.exists(possible_image_file):
+            return possible_image_file
+    return None
+
+
+def label_path_for_image(image_path: str) -> str:
+    """
+    Return the path where the YOLO label file of an image is expected.
+
+    The label lives next to the image, or in the sibling 'labels' folder when the image lives in
+    an 'images' folder of a split dataset.
+    """
+    root, file = os.path.split(image_path)
+    label_name = os.path.splitext(file)[0] + ".txt"
+    if os.path.basename(os.path.normpath(root)) == 'images':
+        return os.path.join(os.path.dirname(os.path.normpath(root)), 'labels', label_name)
+    return os.path.join(root, label_name)
+
+
+def is_split_output(directory: str) -> bool:
+    """
+    Return True for a folder of hardlinks, symlinks or reflinks written by a split.
+
+    Its files are the dataset files once more, so dataset scans do not descend into it.
+    """
+    return os.path.isfile(os.path.join(directory, MATERIALIZED_MANIFEST))
+
+
+def iter_label_files(directory_path: str, skip_dirs: Tuple[str, ...] = ()) -> Iterator[str]:
+    """
+    Yield every YOLO label (.txt) file below directory_path in a stable order.
+
+    Args:
+        directory_path: Root directory to walk. Split outputs below it are skipped.
+        skip_dirs: Directory names which are not descended into.
+    """
+    for root, dirs, files in os.walk(directory_path):
+        dirs[:] = sorted(d for d in dirs if d not in skip_dirs and not is_split_output(os.path.join(root, d)))
+        for file in sorted(files):
+            if file.endswith(".txt"):
+                yield os.path.join(root, file)
+
+
+def iter_labeled_images(directory_path: str,
+                        log: Callable[[str], None] = print) -> Iterator[Tuple[str, str, int, int]]:
+    """
+    Walk directory_path and yield (label_path, image_path, width, height) for every label file
+    with a readable image. Label files without an image, or with an unreadable one, are logged
+    and skipped.
+    """
+    for label_path in iter_label_files(directory_path):
+        image_path = resolve_image_for_label(label_path)
+        if image_path is None:
+            log(f"No matching image found for {label_path}")
+            continue
+        try:
+            width, height = get_image_size(image_path)
+        except Exception as e:
+            log(f"Failed to get image size for {image_path}: {e}")
+            continue
+        yield label_path, image_path, width, height
+
+
+def get_image_size(image_path: str) -> Tuple[int, int]:
+    """Return (width, height) of an image from its header, using the persistent size cache."""
+    from core.image_size import cached_image_size
+
+    try:
+        return cached_image_size(image_path)
+    except Exception as e:
+        raise ValueError(f"Unable to open image: {e}")
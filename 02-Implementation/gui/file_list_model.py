@@ -0,0 +1,142 @@
+import os
+import time
+from typing import List
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt, QThread, pyqtSignal
+
+SCAN_BATCH_SIZE = 2000  # Maximum number of paths per batch sent to the GUI thread
+SCAN_BATCH_INTERVAL = 0.1  # Maximum seconds between two batches
+
+
+class ImageListModel(QAbstractListModel):
+    """
+    Virtual list of image paths for a QListView.
+
+    Only the paths are stored; the view asks for the names of the visible rows, so no
+    per-row widget items are created.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.paths: List[str] = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.paths):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(self.paths[index.row()])
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self.paths[index.row()]  # Full file path
+        return None
+
+    def append_paths(self, paths: List[str]):
+        if not paths:
+            return
+        first = len(self.paths)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        self.paths.extend(paths)
+        self.endInsertRows()
+
+    def set_paths(self, paths: List[str]):
+        self.beginResetModel()
+        # Replaced in place, the GUI keeps a reference to this list
+        self.paths[:] = paths
+        self.endResetModel()
+
+    def clear(self):
+        self.set_paths([])
+
+
+class DirectoryScanner(QThread):
+    """
+    Find .png images below a folder and report them in batches.
+
+    If the folder has a dataset catalog, the catalogued paths are reported right away and the
+    catalog is refreshed afterwards; otherwise the folder is walked with os.scandir and the
+    catalog is built once the walk is done. listing_changed carries the complete list when the
+    refresh found images that were not reported yet, or that no longer exist.
+    """
+    batch_found = pyqtSignal(list)
+    listing_changed = pyqtSignal(list)
+    scan_finished = pyqtSignal(int)
+
+    def __init__(self, folder_path: str, parent=None):
+        super().__init__(parent)
+        self.folder_path = os.path.abspath(folder_path)
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        from core.catalog import DatasetCatalog
+
+        try:
+            catalog = DatasetCatalog(self.folder_path)
+        except Exception:
+            catalog = None  # e.g. a read-only folder, fall back to walking it every time
+        try:
+            reported = catalog.image_paths() if catalog is not None else []
+            if reported:
+                for start in range(0, len(reported), SCAN_BATCH_SIZE):
+                    if self._cancelled:
+                        return
+                    self.batch_found.emit(reported[start:start + SCAN_BATCH_SIZE])
+            else:
+                reported = self._walk()
+            if self._cancelled:
+                return
+            if catalog is not None:
+                catalog.refresh()
+                paths = catalog.image_paths()
+                if set(paths) != set(reported):
+                    self.listing_changed.emit(paths)
+                    reported = paths
+        finally:
+            if catalog is not None:
+                catalog.close()
+        if not self._cancelled:
+            self.scan_finished.emit(len(reported))
+
+    def _walk(self) -> List[str]:
+        from core.yolo_labels import is_split_output
+
+        reported = []
+        batch = []
+        last_emit = time.monotonic()
+        pending_dirs = [self.folder_path]
+        while pending_dirs and not self._cancelled:
+            directory = pending_dirs.pop()
+            sub_dirs = []
+            try:
+                with os.scandir(directory) as entries:
+                    # Files are reported in directory order while scanning, so the first images
+                    # of a huge flat folder show up before the whole folder has been listed
+                    for entry in entries:
+                        if self._cancelled:
+                            return reported
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if not is_split_output(entry.path):
+                                    sub_dirs.append(entry.path)
+                            elif entry.name.lower().endswith(".png"):
+                                batch.append(entry.path)
+                        except OSError:
+                            continue
+                        if len(batch) >= SCAN_BATCH_SIZE or \
+                                (batch and time.monotonic() - last_emit >= SCAN_BATCH_INTERVAL):
+                            self.batch_found.emit(batch)
+                            reported.extend(batch)
+                            batch = []
+                            last_emit = time.monotonic()
+            except OSError:
+                continue
+            # Reverse so that popping from the end walks the sub directories in name order
+            pending_dirs.extend(sorted(sub_dirs, reverse=True))
+        if batch and not self._cancelled:
+            self.batch_found.emit(batch)
+            reported.extend(batch)
+        return reported
@@ -0,0 +1,38 @@
+import time
+from collections import deque
+
+
+class FrameTimer:
+    """Rolling frame-time statistics for the display repaint path."""
+
+    def __init__(self, window: int = 120):
+        self.frame_times = deque(maxlen=window)
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+
+    def stop(self):
+        if self._start is not None:
+            self.frame_times.append(time.perf_counter() - self._start)
+            self._start = None
+
+    def reset(self):
+        self.frame_times.clear()
+        self._start = None
+
+    def average_ms(self) -> float:
+        if not self.frame_times:
+            return 0.0
+        return sum(self.frame_times) / len(self.frame_times) * 1000
+
+    def worst_ms(self) -> float:
+        return max(self.frame_times, default=0.0) * 1000
+
+    def fps(self) -> float:
+        average = self.average_ms()
+        return 1000 / average if average else 0.0
+
+    def summary(self) -> str:
+        return (f"Frame time {self.average_ms():.2f} ms avg, {self.worst_ms():.2f} ms worst "
+                f"({self.fps():.0f} fps over {len(self.frame_times)} frames)")
@@ -0,0 +1,189 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, Optional, Tuple
+
+from PyQt6.QtCore import QObject, QRunnable, QSize, Qt, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+DEFAULT_CACHE_BUDGET = 512 * 1024 * 1024  # Bytes of decoded pixel data kept in memory
+DEFAULT_PREFETCH_COUNT = 3  # Images prefetched in each direction
+
+
+class DecodedImage:
+    """A decoded image together with a copy scaled to the display size."""
+
+    def __init__(self, path: str, mtime_ns: int, image: "Image.Image", display: Optional[QImage]):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.image = image  # Full resolution PIL image, treated as read-only
+        self.display = display  # Display-scaled QImage, or None if no display size was known
+        self.nbytes = image.width * image.height * len(image.getbands())
+        if display is not None:
+            self.nbytes += display.sizeInBytes()
+
+
+def decode_image(path: str, display_size: Optional[QSize] = None) -> DecodedImage:
+    """
+    Decode an image from disk and scale a copy for display.
+
+    Safe to call from worker threads: only QImage (not QPixmap) is used.
+    """
+    from PIL import Image, ImageQt
+
+    mtime_ns = os.stat(path).st_mtime_ns
+    with Image.open(path) as img:
+        img.load()
+        # Copy (or convert) so the pixel data outlives the closed file
+        image = img.copy() if img.mode in ("1", "L", "P", "RGB", "RGBA") else img.convert("RGBA")
+    display = None
+    if display_size is not None and display_size.width() > 0 and display_size.height() > 0:
+        display = ImageQt.ImageQt(image).scaled(
+            display_size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation
+        )
+    return DecodedImage(path, mtime_ns, image, display)
+
+
+class ImageCache:
+    """Thread-safe LRU of decoded images limited by the amount of pixel memory."""
+
+    def __init__(self, budget_bytes: int = DEFAULT_CACHE_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, display_size: Optional[QSize] = None) -> Optional[DecodedImage]:
+        """Return the cached entry for path if it is still current, optionally requiring a display size."""
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None:
+            return None
+        try:
+            if os.stat(path).st_mtime_ns != entry.mtime_ns:
+                self.discard(path)
+                return None
+        except OSError:
+            self.discard(path)
+            return None
+        if display_size is not None and not self._matches(entry, display_size):
+            return None
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        return entry
+
+    @staticmethod
+    def _matches(entry: DecodedImage, display_size: QSize) -> bool:
+        if entry.display is None:
+            return False
+        expected = QSize(entry.image.width, entry.image.height).scaled(display_size, Qt.AspectRatioMode.KeepAspectRatio)
+        return entry.display.size() == expected
+
+    def contains(self, path: str, display_size: Optional[QSize] = None) -> bool:
+        return self.get(path, display_size) is not None
+
+    def put(self, entry: DecodedImage):
+        """Add an entry and evict the least recently used ones until the budget is met."""
+        with self._lock:
+            previous = self._entries.pop(entry.path, None)
+            if previous is not None:
+                self.used_bytes -= previous.nbytes
+            self._entries[entry.path] = entry
+            self.used_bytes += entry.nbytes
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self.used_bytes > self.budget_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.used_bytes -= evicted.nbytes
+
+    def discard(self, path: str):
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is not None:
+                self.used_bytes -= entry.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+
+class _DecodeTask(QRunnable):
+    def __init__(self, prefetcher, path: str, display_size: QSize):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.path = path
+        self.display_size = display_size
+
+    def run(self):
+        self.prefetcher._run_task(self.path, self.display_size)
+
+
+class ImagePrefetcher(QObject):
+    """
+    Decode the neighbours of the current image on a background thread pool.
+
+    Every call to prefetch() replaces the set of wanted paths; queued tasks for paths which are
+    no longer wanted return without decoding, so fast navigation never piles up work.
+    """
+    loaded = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, cache: ImageCache, max_threads: int = 2, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._wanted = set()
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def load(self, path: str, display_size: QSize) -> DecodedImage:
+        """Return the decoded image from the cache, decoding it synchronously on a miss."""
+        entry = self.cache.get(path, display_size)
+        if entry is None:
+            entry = decode_image(path, display_size)
+            self.cache.put(entry)
+        return entry
+
+    def prefetch(self, paths: Iterable[str], display_size: QSize):
+        """Queue the given paths, nearest first, for decoding in the background."""
+        paths = [path for path in paths if not self.cache.contains(path, display_size)]
+        with self._lock:
+            self._wanted = set(paths)
+            queued = [path for path in paths if path not in self._in_flight]
+            self._in_flight.update(queued)
+        for path in queued:
+            self.pool.start(_DecodeTask(self, path, display_size))
+
+    def _run_task(self, path: str, display_size: QSize):
+        try:
+            with self._lock:
+                if path not in self._wanted:
+                    return
+            self.cache.put(decode_image(path, display_size))
+            self.loaded.emit(path)
+        except Exception as e:
+            self.failed.emit(path, str(e))
+        finally:
+            with self._lock:
+                self._in_flight.discard(path)
+
+    def shutdown(self):
+        with self._lock:
+            self._wanted = set()
+        self.pool.clear()
+        self.pool.waitForDone()
+
+
+def neighbour_paths(image_list, index: int, count: int = DEFAULT_PREFETCH_COUNT) -> Tuple[str, ...]:
+    """Return the paths around index ordered by distance, the next image before the previous one."""
+    paths = []
+    for distance in range(1, count + 1):
+        for neighbour in (index + distance, index - distance):
+            if 0 <= neighbour < len(image_list):
+                paths.append(image_list[neighbour])
+    return tuple(paths)
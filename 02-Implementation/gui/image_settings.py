@@ -0,0 +1,50 @@
+from typing import TYPE_CHECKING, NamedTuple, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+SETTINGS_DEBOUNCE_MS = 250  # Idle time after the last slider change before the full resolution render
+
+
+class ImageSettings(NamedTuple):
+    """Values of the image settings controls."""
+    width: int
+    height: int
+    rotation: int
+    brightness: int
+    contrast: int
+
+
+def apply_image_settings(image: "Image.Image", settings: ImageSettings, size: Tuple[int, int] = None) -> "Image.Image":
+    """
+    Resize, rotate and enhance an image according to the settings.
+
+    Args:
+        image: Source image, left unchanged.
+        settings: Values of the image settings controls.
+        size: Output size, defaults to the width and height of the settings. The preview passes a
+            display-sized proxy and the matching display size here.
+
+    Returns:
+        The transformed image.
+    """
+    from PIL import ImageEnhance
+
+    image = image.resize(size or (settings.width, settings.height))
+    # Neutral values are skipped, the enhancers would return an identical copy
+    if settings.rotation:
+        image = image.rotate(settings.rotation)
+    if settings.brightness:
+        image = ImageEnhance.Brightness(image).enhance(settings.brightness / 100.0 + 1.0)
+    if settings.contrast:
+        image = ImageEnhance.Contrast(image).enhance(settings.contrast / 100.0 + 1.0)
+    return image
+
+
+def make_proxy(image: "Image.Image", max_size: Tuple[int, int]) -> "Image.Image":
+    """Return a copy of image which fits into max_size, used for fast previews."""
+    from PIL import Image
+
+    scale = min(max_size[0] / image.width, max_size[1] / image.height, 1.0)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+AUTOSAVE_DELAY = 0.5  # Seconds a label file waits for further edits before it is written
+
+
+class LabelWriter:
+    """
+    Background queue writing label files after a short delay.
+
+    Rapid edits of the same file are coalesced: only the latest text submitted for a path is
+    written, at most AUTOSAVE_DELAY seconds after its first pending edit. Files are written
+    atomically, so a crash never leaves a truncated label file behind.
+    """
+
+    def __init__(self, log: Callable[[str], None] = print, delay: float = AUTOSAVE_DELAY):
+        self.log = log  # Called from the writer thread, must be thread-safe
+        self.delay = delay
+        self._pending: Dict[str, Tuple[float, str]] = {}  # path -> (due time, latest text)
+        self._writing: Optional[str] = None
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="LabelWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, path: str, text: str):
+        """Schedule text to be written to path, replacing any text still pending for it."""
+        with self._condition:
+            due = self._pending[path][0] if path in self._pending else time.monotonic() + self.delay
+            self._pending[path] = (due, text)
+            self._condition.notify_all()
+
+    def discard(self, path: str):
+        """Drop the pending text of path, e.g. because the file is deleted."""
+        with self._condition:
+            self._pending.pop(path, None)
+            while self._writing == path:
+                self._condition.wait()
+
+    def flush(self, path: Optional[str] = None):
+        """Write the pending text of path (or of every file) now and wait until it is on disk."""
+        with self._condition:
+            now = time.monotonic()
+            for pending_path, (_, text) in list(self._pending.items()):
+                if path is None or pending_path == path:
+                    self._pending[pending_path] = (now, text)
+            self._condition.notify_all()
+            while self._busy(path):
+                self._condition.wait()
+
+    def _busy(self, path: Optional[str]) -> bool:
+        if path is None:
+            return bool(self._pending) or self._writing is not None
+        return path in self._pending or self._writing == path
+
+    def shutdown(self):
+        """Write every pending file and stop the writer thread."""
+        self.flush()
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped and not self._pending:
+                        return
+                    if self._pending:
+                        path, (due, text) = min(self._pending.items(), key=lambda item: item[1][0])
+                        timeout = due - time.monotonic()
+                        if timeout <= 0:
+                            break
+                        self._condition.wait(timeout)
+                    else:
+                        self._condition.wait()
+                del self._pending[path]
+                self._writing = path
+            try:
+                from core.yolo_labels import write_text_atomic  # numpy is only loaded with the first write
+
+                write_text_atomic(path, text)
+            except OSError as e:
+                self.log(f"Failed to save annotations to {path}: {e}")
+            finally:
+                with self._condition:
+                    self._writing = None
+                    self._condition.notify_all()
@@ -1,18 +1,7 @@
-import sys
 import os
-import shutil
-import numpy as np
-import subprocess
-import importlib.util
-import json
-import xmltodict
-from PIL import Image
-from pathlib import Path
 import random
-from typing import List, Tuple
-import xml.etree.ElementTree as ET
+from typing import Tuple
 from PyQt6.QtWidgets import (
-    QApplication,
     QMainWindow,
     QLabel,
     QVBoxLayout,
@@ -23,8 +12,7 @@ from PyQt6.QtWidgets import (
     QStatusBar,
     QTextEdit,
     QSplitter,
-    QListWidget,
-    QListWidgetItem,
+    QListView,
     QPushButton,
     QSizePolicy,
     QSpinBox,
@@ -32,23 +20,33 @@ from PyQt6.QtWidgets import (
     QFormLayout,
     QGroupBox,
     QLineEdit,
+    QComboBox,
+    QCheckBox,
+    QInputDialog,
     QMessageBox,
-    QToolButton,
-    QSpacerItem,
-    QSizePolicy
+    QDialog,
 )
-from PyQt6.QtGui import QPixmap, QAction, QIcon, QImage, QPainter, QPen
-from PyQt6.QtCore import Qt, QPoint, QRect
-from PIL import Image, ImageEnhance, ImageQt
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QFileDialog, QMessageBox
-from PyQt6.QtWidgets import QApplication, QMainWindow, QToolBar, QToolButton, QSpacerItem, QSizePolicy
-
-import os
-from PyQt6.QtWidgets import QMessageBox
+from PyQt6.QtGui import QPixmap, QAction, QIcon, QPainter, QPen
+from PyQt6.QtCore import Qt, QPoint, QRect, QSize, QThread, QThreadPool, QTimer, pyqtSignal
+
+# Qt-free dataset operations. Modules importing numpy or PIL are imported where they are first
+# used, so that the window shows up without loading them (see main.py --profile-startup).
+from core import tracing
+from gui.file_list_model import DirectoryScanner, ImageListModel
+from gui.frame_timer import FrameTimer
+from gui.image_cache import ImageCache, ImagePrefetcher, neighbour_paths
+from gui.label_writer import LabelWriter
+from gui.image_settings import SETTINGS_DEBOUNCE_MS, ImageSettings
+
+# Class of drawn boxes, which are saved with the annotation class; kept in sync with core.box_store,
+# which imports NumPy
+UNASSIGNED_CLASS = -1
 
 class DataSplitterInputDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
+        from core.splitter import SPLIT_MODES
+
         self.setWindowTitle("Enter Test Dataset Ratio")
         self.layout = QVBoxLayout()
 #custom import
@@ -74,10 +72,25 @@ class DataSplitterInputDialog(QDialog):
         self.layout.addWidget(self.path_label)
         self.layout.addWidget(self.path_input)
         self.layout.addWidget(self.browse_button)
+        self.mode_label = QLabel("Split mode (list and link modes keep the source folder unchanged):")
+        self.mode_input = QComboBox()
+        self.mode_input.addItems(SPLIT_MODES)
+        self.layout.addWidget(self.mode_label)
+        self.layout.addWidget(self.mode_input)
+        self.stratify_input = QCheckBox("Keep the class balance of every split")
+        self.layout.addWidget(self.stratify_input)
+        self.dedup_input = QCheckBox("Keep near-duplicate images in one split")
+        self.layout.addWidget(self.dedup_input)
         self.submit_button = QPushButton("Submit")
         self.submit_button.clicked.connect(self.accept)
         self.layout.addWidget(self.submit_button)
         self.setLayout(self.layout)
+    def get_mode(self):
+        return self.mode_input.currentText()
+    def get_stratify(self):
+        return self.stratify_input.isChecked()
+    def get_dedup(self):
+        return self.dedup_input.isChecked()
     def browse_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Dataset Spliter location")
         if folder_path:
@@ -118,7 +131,68 @@ class CategoryInputDialog(QDialog):
         return self.id_input.text(), self.name_input.text(), self.path_input.text()
 
 
+class PngConverterThread(QThread):
+    """Run the PNG conversion in the background and forward its log messages to the GUI thread."""
+    message = pyqtSignal(str)
+
+    def __init__(self, directory_path, width, height, parent=None):
+        super().__init__(parent)
+        self.directory_path = directory_path
+        self.width = width
+        self.height = height
+
+    def run(self):
+        from core.converter import convert_all_images_in_directory
+
+        try:
+            convert_all_images_in_directory(self.directory_path, self.width, self.height, self.message.emit)
+        except Exception as e:
+            self.message.emit(f"Conversion failed: {e}")
+
+
+class AugmentThread(QThread):
+    """Run the dataset augmentation in the background and forward its log messages to the GUI thread."""
+    message = pyqtSignal(str)
+
+    def __init__(self, directory_path, variants, seed, output_size, parent=None):
+        super().__init__(parent)
+        self.directory_path = directory_path
+        self.variants = variants
+        self.seed = seed
+        self.output_size = output_size
+
+    def run(self):
+        from core.augment import AugmentOptions, augment_dataset
+
+        try:
+            augment_dataset(self.directory_path, self.variants, self.seed,
+                            AugmentOptions(output_size=self.output_size), log=self.message.emit)
+        except Exception as e:
+            self.message.emit(f"Augmentation failed: {e}")
+
+
+class PreannotateThread(QThread):
+    """Run an ONNX model over a folder in the background and forward its log messages to the GUI thread."""
+    message = pyqtSignal(str)
+
+    def __init__(self, directory_path, model_path, parent=None):
+        super().__init__(parent)
+        self.directory_path = directory_path
+        self.model_path = model_path
+
+    def run(self):
+        from core.preannotate import preannotate_folder
+
+        try:
+            preannotate_folder(self.directory_path, self.model_path, log=self.message.emit)
+        except Exception as e:
+            self.message.emit(f"Pre-annotation failed: {e}")
+
+
 class Yolo8AnnotationTool(QMainWindow):
+    image_settings_ready = pyqtSignal(int, object, object)  # generation, original image, result
+    log_message = pyqtSignal(str)  # Thread-safe way to append to the log window
+
     def __init__(self):
         super().__init__()
         self.annotation_x_label = None
@@ -131,16 +205,38 @@ class Yolo8AnnotationTool(QMainWindow):
         except Exception as e:
             print(f"Error setting window icon: {e}")
 
-        # Initialize image list and index
-        self.image_list = []
+        # Initialize image index, the image list is created with the file list model
         self.current_index = 0
         self.current_image = None  # Store the current image as a PIL image
-        self.bounding_boxes = []  # List to store bounding boxes
-        self.undo_stack = []  # Stack to store undo actions
-        self.redo_stack = []  # Stack to store redo actions
+        self.box_store = None  # core.box_store.BoxStore of the current image, with its undo log
         self.image_path = None  # Path of image selected in the display window
         self.load_images = None  # Path of image selected in the display window
         self.directory_path = None # save dir for annotation files
+        self.png_converter_thread = None  # Background PNG conversion
+        self.augment_thread = None  # Background dataset augmentation
+        self.preannotate_thread = None  # Background ONNX pre-annotation
+        self.pyramid_thread = None  # Background tile pyramid build of a large image
+        self.large_image = False  # True while a large image is shown through the tiled view
+        self.original_display = None  # Display-scaled QImage of the original image
+        self.image_cache = ImageCache()  # Decoded images, filled by the prefetcher
+        self.image_prefetcher = ImagePrefetcher(self.image_cache, parent=self)
+        self._base_pixmap = None  # Display-scaled pixmap of the current image
+        self._base_pixmap_key = None
+        self._boxes_pixmap = None  # Base pixmap with the committed boxes drawn on it
+        self._boxes_pixmap_key = None
+        self.frame_timer = FrameTimer()  # Frame times of update_display while drawing
+        self._preview = None  # (image it previews, display pixmap, full resolution width) of the settings preview
+        self._settings_proxy = None  # (original image, display size, display-sized copy) used for previews
+        self._settings_generation = 0  # Incremented for every full resolution settings render
+        self.settings_pool = QThreadPool(self)
+        self.settings_pool.setMaxThreadCount(1)
+        self.image_settings_timer = QTimer(self)
+        self.image_settings_timer.setSingleShot(True)
+        self.image_settings_timer.setInterval(SETTINGS_DEBOUNCE_MS)
+        self.image_settings_timer.timeout.connect(self.apply_full_image_settings)
+        self.image_settings_ready.connect(self.on_image_settings_ready)
+        self.log_message.connect(self.log)
+        self.label_writer = LabelWriter(self.log_message.emit)  # Write-behind queue of the autosaved label files
 
         # Create central widget and main layout
         central_widget = QWidget(self)
@@ -164,18 +260,24 @@ class Yolo8AnnotationTool(QMainWindow):
         """)
         file_list_layout.addWidget(self.file_list_label)
 
-        self.file_list_widget = QListWidget(self)
+        # Virtual list: the model only stores paths, the view renders the visible rows
+        self.image_list_model = ImageListModel(self)
+        self.image_list = self.image_list_model.paths
+        self.directory_scanner = None  # Background scan of the loaded folder
+        self.file_list_widget = QListView(self)
+        self.file_list_widget.setModel(self.image_list_model)
+        self.file_list_widget.setUniformItemSizes(True)
         self.file_list_widget.setStyleSheet("""
-            QListWidget {
+            QListView {
                 border: 1px solid black;  /* Border thickness and color */
                 border-radius: 5px;       /* Rounded corners */
                 padding: 5px;             /* Padding inside the widget */
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 5px;             /* Padding for items inside the list */
             }
         """)
-        self.file_list_widget.currentItemChanged.connect(self.on_file_selected)
+        self.file_list_widget.selectionModel().currentChanged.connect(self.on_file_selected)
         file_list_layout.addWidget(self.file_list_widget)
 
         # Add navigation buttons
@@ -232,6 +334,9 @@ class Yolo8AnnotationTool(QMainWindow):
         self.image_label.mouseReleaseEvent = self.finish_drawing
         display_layout.addWidget(self.image_label)
 
+        # Images too large to decode are shown tile by tile, the view is created by the first one
+        self.tiled_view = None
+
         self.display_bay.setLayout(display_layout)
 
         # Create Annotation Bay (10%)
@@ -284,25 +389,23 @@ class Yolo8AnnotationTool(QMainWindow):
     def show_next_image(self):
         """Show the next image in the list."""
         if self.image_list and self.current_index < len(self.image_list) - 1:
-            self.current_index += 1
-            self.file_list_widget.setCurrentRow(self.current_index)
-            self.load_image(self.image_list[self.current_index])
+            # Selecting the row loads the image through on_file_selected
+            self.file_list_widget.setCurrentIndex(self.image_list_model.index(self.current_index + 1))
         else:
             self.log("No more images to show.")
 
     def show_previous_image(self):
         """Show the previous image in the list."""
         if self.image_list and self.current_index > 0:
-            self.current_index -= 1
-            self.file_list_widget.setCurrentRow(self.current_index)
-            self.load_image(self.image_list[self.current_index])
+            # Selecting the row loads the image through on_file_selected
+            self.file_list_widget.setCurrentIndex(self.image_list_model.index(self.current_index - 1))
         else:
             self.log("No more images to show.")
 
     def on_file_selected(self, current, previous):
         """Load the selected image from the file list."""
-        if current:
-            file_path = current.toolTip()  # Get the full file path from tooltip
+        if current.isValid():
+            file_path = self.image_list[current.row()]
             self.load_image(file_path)
 
     def create_image_settings_controls(self):
@@ -497,6 +600,10 @@ class Yolo8AnnotationTool(QMainWindow):
         self.save_annotations_button.clicked.connect(self.save_annotations)
         layout.addWidget(self.save_annotations_button)
 
+        # Autosave: every box edit writes the label file in the background, the image is not saved
+        self.autosave_checkbox = QCheckBox("Autosave Annotations", self)
+        layout.addWidget(self.autosave_checkbox)
+
         # Load Annotations Button
         self.load_annotations_button = QPushButton("Load Annotations", self)
         self.load_annotations_button.clicked.connect(self.load_annotations)
@@ -534,10 +641,15 @@ class Yolo8AnnotationTool(QMainWindow):
         """Add an annotation to the bounding box."""
         annotation_text = self.annotation_input.text()
         if annotation_text:
-            if self.bounding_boxes:
-                last_box = self.bounding_boxes[-1]
+            box_id = self.box_store.last_id() if self.box_store is not None else None
+            if box_id is not None:
+                _, (x1, y1, _, _) = self.box_store.get(box_id)
+                if annotation_text.strip().isdigit():
+                    # Recorded in the undo log like the other edits
+                    self.box_store.set_class(box_id, int(annotation_text))
+                    self.autosave_annotations()
                 self.log(
-                    f"Annotation added to box (x={last_box.left()}, y={last_box.top()}): {annotation_text}"
+                    f"Annotation added to box (x={int(x1)}, y={int(y1)}): {annotation_text}"
                 )
             else:
                 self.log("No bounding box to annotate.")
@@ -549,7 +661,11 @@ class Yolo8AnnotationTool(QMainWindow):
     def reset_image_settings(self):
         """Reset image settings to default values."""
         if hasattr(self, 'original_image'):
-            self.current_image = self.original_image.copy()  # Reset to the original image
+            self.current_image = self.original_image  # Reset to the original image
+            # Drop the settings preview and any pending full resolution render
+            self._preview = None
+            self.image_settings_timer.stop()
+            self._settings_generation += 1
             self.update_display()
             self.log("Image reset to original.")
         else:
@@ -569,6 +685,8 @@ class Yolo8AnnotationTool(QMainWindow):
         right = left + crop_width
         bottom = top + crop_height
 
+        from PIL import Image
+
         cropped_image = self.current_image.crop((left, top, right, bottom))
         self.current_image = cropped_image.resize(original_size, Image.Resampling.LANCZOS)
         self.update_display()
@@ -579,6 +697,8 @@ class Yolo8AnnotationTool(QMainWindow):
             self.log("No image loaded.")
             return
 
+        from PIL import Image
+
         self.current_image = self.current_image.transpose(Image.FLIP_LEFT_RIGHT)
         self.update_display()
         self.log("Image flipped horizontally.")
@@ -588,41 +708,77 @@ class Yolo8AnnotationTool(QMainWindow):
             self.log("No image loaded.")
             return
 
+        from PIL import ImageEnhance
+
         enhancer = ImageEnhance.Color(self.current_image)
         factor = random.uniform(0.5, 1.5)  # Randomly change color balance
         self.current_image = enhancer.enhance(factor)
         self.update_display()
         self.log("Color jitter applied.")
+    def current_image_settings(self):
+        return ImageSettings(self.width_spinbox.value(), self.height_spinbox.value(), self.rotation_slider.value(),
+                             self.brightness_slider.value(), self.contrast_slider.value())
+
     def update_image_settings(self):
-        """Update image settings based on user input."""
+        """Preview the image settings on a display-sized proxy and schedule the full resolution update."""
+        from PIL import ImageQt
+        from gui.image_settings import apply_image_settings, make_proxy
+
         try:
-            if not self.image_list:
+            original_image = getattr(self, 'original_image', None)
+            if not self.image_list or original_image is None:
                 self.log("No image loaded.")
                 return
 
-            image_path = self.image_list[self.current_index]
-            image = Image.open(image_path)
-            width = self.width_spinbox.value()
-            height = self.height_spinbox.value()
-            image = image.resize((width, height))
-
-            rotation_angle = self.rotation_slider.value()
-            brightness = self.brightness_slider.value() / 100.0 + 1.0
-            contrast = self.contrast_slider.value() / 100.0 + 1.0
-
-            image = image.rotate(rotation_angle)
-            image = ImageEnhance.Brightness(image).enhance(brightness)
-            image = ImageEnhance.Contrast(image).enhance(contrast)
-
-            self.current_image = image
-            self.image_size = (int(width), int(height))
-            qt_image = ImageQt.ImageQt(image)
-            final_pixmap = QPixmap.fromImage(qt_image)
-            self.image_label.setPixmap(
-                final_pixmap.scaled(self.image_label.size(), Qt.AspectRatioMode.KeepAspectRatio)
-            )
+            settings = self.current_image_settings()
+            label_size = self.image_label.size()
+            proxy_key = (label_size.width(), label_size.height())
+            if self._settings_proxy is None or self._settings_proxy[0] is not original_image \
+                    or self._settings_proxy[1] != proxy_key:
+                self._settings_proxy = (original_image, proxy_key, make_proxy(original_image, proxy_key))
+            display_size = QSize(settings.width, settings.height).scaled(label_size, Qt.AspectRatioMode.KeepAspectRatio)
+            preview = apply_image_settings(self._settings_proxy[2], settings,
+                                           (max(1, display_size.width()), max(1, display_size.height())))
+
+            # Show the preview until the full resolution image is ready
+            self.image_size = (int(settings.width), int(settings.height))
+            self._preview = (self.current_image, QPixmap.fromImage(ImageQt.ImageQt(preview)), settings.width)
+            self.update_display()
         except Exception as e:
             self.log(f"Error updating image settings: {e}")
+            return
+
+        # Restart the debounce timer, the full resolution image is computed once the controls are idle
+        self.image_settings_timer.start()
+
+    def apply_full_image_settings(self):
+        """Compute the image settings at full resolution in the background."""
+        from gui.image_settings import apply_image_settings
+
+        original_image = getattr(self, 'original_image', None)
+        if original_image is None:
+            return
+        self._settings_generation += 1
+        generation = self._settings_generation
+        settings = self.current_image_settings()
+
+        def render():
+            try:
+                image = apply_image_settings(original_image, settings)
+            except Exception as e:
+                self.log_message.emit(f"Error updating image settings: {e}")
+                return
+            self.image_settings_ready.emit(generation, original_image, image)
+
+        self.settings_pool.start(render)
+
+    def on_image_settings_ready(self, generation, original_image, image):
+        """Replace the preview with the full resolution image unless newer settings or another image exist."""
+        if generation != self._settings_generation or original_image is not getattr(self, 'original_image', None):
+            return
+        self.current_image = image
+        self._preview = None
+        self.update_display()
 
     def create_toolbar(self):
         """Create the main toolbar."""
@@ -653,11 +809,30 @@ class Yolo8AnnotationTool(QMainWindow):
         convert_coco_annotations_action.triggered.connect(self.show_category_coco_input_dialog)
         toolbar.addAction(convert_coco_annotations_action)
 
+        # COCO, VOC, CSV (and Parquet with pyarrow) in a single pass over the dataset
+        export_all_action = QAction("ALL FORMATS", self)
+        export_all_action.triggered.connect(self.show_category_export_input_dialog)
+        toolbar.addAction(export_all_action)
+
         # Image Reload
         dataset_spliter_action = QAction("TRAINING DATASET", self)
         dataset_spliter_action.triggered.connect(self.show_testing_dataset_input_dialog)
         toolbar.addAction(dataset_spliter_action)
 
+        augment_dataset_action = QAction("AUGMENT DATASET", self)
+        augment_dataset_action.triggered.connect(self.augment_dataset)
+        toolbar.addAction(augment_dataset_action)
+
+        preannotate_action = QAction("PRE-ANNOTATE", self)
+        preannotate_action.triggered.connect(self.preannotate_images)
+        toolbar.addAction(preannotate_action)
+
+        self.trace_action = QAction("TRACE", self)
+        self.trace_action.setCheckable(True)
+        self.trace_action.setToolTip("Record timings until unchecked, then save them as a Chrome trace")
+        self.trace_action.toggled.connect(self.toggle_tracing)
+        toolbar.addAction(self.trace_action)
+
     def image_reload(self):
         """reload images"""
         if not hasattr(self, 'image_path') or not self.load_images:
@@ -671,6 +846,63 @@ class Yolo8AnnotationTool(QMainWindow):
         if folder_path:
             self.convert_all_images_in_directory(folder_path)
 
+    def augment_dataset(self):
+        """Write augmented copies of the labeled images in a folder, with transformed boxes, to its 'augmented' folder."""
+        if self.augment_thread is not None and self.augment_thread.isRunning():
+            self.log("Augmentation is already running.")
+            return
+        folder_path = QFileDialog.getExistingDirectory(self, "Select Annotated Folder")
+        if not folder_path:
+            return
+        variants, ok = QInputDialog.getInt(self, "Augment Dataset", "Augmented copies per image:", 10, 1, 100)
+        if not ok:
+            return
+        # The augmented images are resized to the width and height of the image settings
+        output_size = (self.width_spinbox.value(), self.height_spinbox.value())
+        self.augment_thread = AugmentThread(folder_path, variants, 0, output_size, self)
+        self.augment_thread.message.connect(self.log)
+        self.augment_thread.start()
+
+    def toggle_tracing(self, enabled):
+        """Start recording timing spans, or stop and save them as a Chrome trace."""
+        if enabled:
+            tracing.reset()
+            tracing.enable()
+            self.log("Tracing started, uncheck TRACE to save the trace.")
+            return
+        tracing.enable(False)
+        self.log(tracing.format_summary())
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Trace", "trace.json", "Chrome trace (*.json)")
+        if not file_path:
+            return
+        try:
+            count = tracing.export_chrome_trace(file_path)
+        except OSError as e:
+            self.log(f"Failed to save the trace: {e}")
+            return
+        self.log(f"{count} trace events written to {file_path}, open it in chrome://tracing or ui.perfetto.dev")
+
+    def preannotate_images(self):
+        """Write the detections of an ONNX model as labels of the unlabeled images in a folder, for correction."""
+        if self.preannotate_thread is not None and self.preannotate_thread.isRunning():
+            self.log("Pre-annotation is already running.")
+            return
+        model_path, _ = QFileDialog.getOpenFileName(self, "Select ONNX Model", "", "ONNX Models (*.onnx)")
+        if not model_path:
+            return
+        folder_path = QFileDialog.getExistingDirectory(self, "Select Image Folder")
+        if not folder_path:
+            return
+        self.preannotate_thread = PreannotateThread(folder_path, model_path, self)
+        self.preannotate_thread.message.connect(self.log)
+        self.preannotate_thread.finished.connect(self.on_preannotate_finished)
+        self.preannotate_thread.start()
+
+    def on_preannotate_finished(self):
+        # Show the proposals of the current image unless boxes were drawn meanwhile
+        if self.image_path and (self.box_store is None or not len(self.box_store)) and os.path.exists(self.annotation_path()):
+            self.load_annotations()
+
     def load_images_annotation(self):
         """Add a folder containing images."""
         folder_path = QFileDialog.getExistingDirectory(self, "Select Folder")
@@ -681,18 +913,52 @@ class Yolo8AnnotationTool(QMainWindow):
     def load_images_from_folder(self, folder_path):
         """Load images from the selected folder."""
         self.load_images = folder_path
-        self.file_list_widget.clear()
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith(".png"):
-                    file_path = os.path.join(root, file)
-                    self.image_list.append(file_path)
-                    item = QListWidgetItem(file)
-                    item.setToolTip(file_path)  # Set tooltip with file path
-                    self.file_list_widget.addItem(item)
-        if self.image_list:
-            self.current_index = 0
-            self.load_image(self.image_list[self.current_index])
+        self.image_cache.clear()
+        if self.directory_scanner is not None:
+            self.directory_scanner.cancel()
+            self.directory_scanner.wait()
+        self.image_list_model.clear()
+        self.current_index = 0
+
+        # Scan in the background, the list fills up batch by batch
+        self.directory_scanner = DirectoryScanner(folder_path, self)
+        self.directory_scanner.batch_found.connect(self.on_images_found)
+        self.directory_scanner.listing_changed.connect(self.on_image_listing_changed)
+        self.directory_scanner.scan_finished.connect(self.on_image_scan_finished)
+        self.directory_scanner.start()
+
+    def on_images_found(self, paths):
+        """Append a batch of scanned images and show the first image as soon as it is known."""
+        if self.sender() is not self.directory_scanner:
+            return  # Batch of a cancelled scan
+        first_batch = not self.image_list
+        self.image_list_model.append_paths(paths)
+        if first_batch and self.image_list:
+            self.file_list_widget.setCurrentIndex(self.image_list_model.index(0))
+
+    def on_image_listing_changed(self, paths):
+        """Replace the list with the refreshed catalog listing, keeping the current image selected."""
+        if self.sender() is not self.directory_scanner:
+            return
+        current_path = self.image_list[self.current_index] if self.image_list else None
+        if current_path not in paths:
+            self.image_list_model.set_paths(paths)
+            if self.image_list:
+                self.file_list_widget.setCurrentIndex(self.image_list_model.index(0))
+            return
+        # The current image is still listed, select its new row without reloading it
+        selection_model = self.file_list_widget.selectionModel()
+        selection_model.blockSignals(True)
+        self.image_list_model.set_paths(paths)
+        self.current_index = paths.index(current_path)
+        self.file_list_widget.setCurrentIndex(self.image_list_model.index(self.current_index))
+        selection_model.blockSignals(False)
+
+    def on_image_scan_finished(self, count):
+        if self.sender() is not self.directory_scanner:
+            return
+        if count:
+            self.log(f"Found {count} images in {self.load_images}.")
         else:
             self.log("No images found in the selected folder.")
     def show_testing_dataset_input_dialog(self):
@@ -709,7 +975,8 @@ class Yolo8AnnotationTool(QMainWindow):
             if not train_ratio or not val_ratio or not test_ratio or not folder_path:
                 QMessageBox.warning(self, "Invalid Input", "All fields are required.")
                 return
-            self.create_yolo8_folders(folder_path, train_ratio, val_ratio, test_ratio)
+            self.create_yolo8_folders(folder_path, train_ratio, val_ratio, test_ratio, dialog.get_mode(),
+                                      dialog.get_stratify(), dialog.get_dedup())
     def show_category_voc_input_dialog(self):
         dialog = CategoryInputDialog(self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
@@ -735,256 +1002,75 @@ class Yolo8AnnotationTool(QMainWindow):
             }
             self.yolo_to_coco(txt_file_path, class_mapping)
 
+    def show_category_export_input_dialog(self):
+        dialog = CategoryInputDialog(self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            category_id, category_name, txt_file_path = dialog.get_inputs()
+            if not category_id or not category_name or not txt_file_path:
+                QMessageBox.warning(self, "Invalid Input", "All fields are required.")
+                return
+            class_mapping = {
+                category_id: category_name
+            }
+            self.export_all_formats(txt_file_path, class_mapping)
+
+    def open_catalog(self, directory_path):
+        """
+        Open and refresh the dataset catalog covering directory_path.
+
+        The catalog of the loaded image folder is used when directory_path lies inside it.
+        Returns None if no catalog can be written, the operations then scan the files.
+        """
+        from core.catalog import open_catalog
+
+        root = os.path.abspath(directory_path)
+        if self.load_images:
+            loaded = os.path.abspath(self.load_images)
+            if root == loaded or root.startswith(loaded + os.sep):
+                root = loaded
+        return open_catalog(root, log=self.log)
+
     def yolo_to_coco(self, yolo_dir, class_mapping):
-        # yolo_dir = os.path.dirname(yolo_dir)
-        # print(yolo_dir)
-        coco_data = {
-            "images": [],
-            "annotations": [],
-            "categories": []
-        }
-
-        # Prepare categories for COCO format
-        for class_id, class_name in class_mapping.items():
-            coco_data["categories"].append({
-                "id": class_id,
-                "name": class_name
-            })
-
-        annotation_id = 1
-        for root, dirs, files in os.walk(yolo_dir):
-            for file in files:
-                if file.endswith(".txt"):
-                    yolo_file = os.path.join(root, file)
-                    image_file = None
-
-                    # Support multiple image extensions
-                    for ext in [".png"]:
-                        possible_image_file = os.path.join(root, os.path.splitext(file)[0] + ext)
-                        # check if testing data has been split
-                        # Normalize the path to handle different OS path separators
-                        normalized_path = os.path.normpath(possible_image_file)
-                        # Split the path into components
-                        path_components = normalized_path.split(os.sep)
-                        if path_components[-2] == 'labels':
-                            # Convert the string to a Path object
-                            possible_image_file = Path(possible_image_file)
-                            # Remove the last two components
-                            possible_image_file = possible_image_file.parent.parent
-                            possible_image_file = os.path.join(possible_image_file, 'images', path_components[-1])
-                        if os.path.exists(possible_image_file):
-                            image_file = possible_image_file
-                            break
-
-                    if image_file is None:
-                            self.log(f"No matching image found for {yolo_file}")
-                            print(possible_image_file)
-                            continue
-
-                    try:
-                        # Get image dimensions
-                        with Image.open(image_file) as img:
-                            width, height = img.size
-                    except Exception as e:
-                        self.log(f"Failed to get image size for {image_file}: {e}")
-                        continue
-
-                    # Add image metadata to COCO
-                    image_id = len(coco_data["images"]) + 1
-                    coco_data["images"].append({
-                        "id": image_id,
-                        "file_name": os.path.basename(image_file),
-                        "width": width,
-                        "height": height
-                    })
-
-                    # Process YOLO annotations
-                    with open(yolo_file, "r") as f:
-                        lines = f.readlines()
-
-                    for line in lines:
-                        data = line.strip().split()
-
-                        # Parse YOLO format data
-                        try:
-                            class_id, x_center, y_center, bbox_width, bbox_height = map(float, data)
-                        except ValueError as e:
-                            self.log(f"Invalid annotation in {yolo_file}: {line.strip()} - {e}")
-                            continue
-
-                        # Convert YOLO normalized coordinates to absolute COCO bbox format
-                        x_min = (x_center - bbox_width / 2) * width
-                        y_min = (y_center - bbox_height / 2) * height
-                        box_width = bbox_width * width
-                        box_height = bbox_height * height
-
-                        # Clamp bounding box values to image dimensions
-                        x_min = max(0, x_min)
-                        y_min = max(0, y_min)
-                        box_width = min(width - x_min, box_width)
-                        box_height = min(height - y_min, box_height)
-
-                        # Add annotation to COCO
-                        coco_data["annotations"].append({
-                            "id": annotation_id,
-                            "image_id": image_id,
-                            "category_id": int(class_id),
-                            "bbox": [x_min, y_min, box_width, box_height],
-                            "area": box_width * box_height,
-                            "iscrowd": 0
-                        })
-                        annotation_id += 1
-        output_json = "coco_annotations.json"
-        # create json file
-        output_path = os.path.join(yolo_dir, output_json)
-        # Save COCO JSON to file
-        with open(output_path, "w") as json_out:
-            json.dump(coco_data, json_out, indent=4)
-
-        self.log(f"COCO JSON file created at {output_json}")
+        from core.coco import yolo_to_coco
+
+        catalog = self.open_catalog(yolo_dir)
+        try:
+            yolo_to_coco(yolo_dir, class_mapping, self.log, catalog=catalog)
+        finally:
+            if catalog is not None:
+                catalog.close()
 
     def yolo_to_voc(self, yolo_dir, class_mapping):
+        from core.voc import yolo_to_voc
+
         yolo_dir = os.path.dirname(yolo_dir)
-        for root, dirs, files in os.walk(yolo_dir):
-            for file in files:
-                if file.endswith(".txt"):
-                    yolo_file = os.path.join(root, file)
-                    image_file = None
-
-                    # Support multiple image extensions
-                    for ext in [".png"]:
-                        possible_image_file = os.path.join(root, os.path.splitext(file)[0] + ext)
-
-                        # check if testing data has been split
-                        # Normalize the path to handle different OS path separators
-                        normalized_path = os.path.normpath(possible_image_file)
-                        # Split the path into components
-                        path_components = normalized_path.split(os.sep)
-                        #print(path_components)
-                        if path_components[-2] == 'labels':
-                            # Convert the string to a Path object
-                            possible_image_file = Path(possible_image_file)
-                            # Remove the last two components
-                            possible_image_file = possible_image_file.parent.parent
-                            possible_image_file = os.path.join(possible_image_file, 'images', path_components[-1])
-                        if os.path.exists(possible_image_file):
-                            image_file = possible_image_file
-                            break
-
-                    if image_file is None:
-                            self.log(f"No matching image found for {yolo_file}")
-                            continue
-
-                    try:
-                        width, height = self.get_image_size(image_file)
-                    except Exception as e:
-                        self.log(f"Failed to get image size for {image_file}: {e}")
-                        continue
-
-                    with open(yolo_file, "r") as f:
-                        lines = f.readlines()
-
-                    annotation = ET.Element("annotation")
-                    ET.SubElement(annotation, "filename").text = os.path.basename(image_file)
-                    size = ET.SubElement(annotation, "size")
-                    ET.SubElement(size, "width").text = str(width)
-                    ET.SubElement(size, "height").text = str(height)
-
-                    for line in lines:
-                        data = line.strip().split()
-
-                        # Parse YOLO format data
-                        try:
-                            class_id, x_center, y_center, bbox_width, bbox_height = map(float, data)
-                        except ValueError as e:
-                            self.log(f"Invalid annotation in {yolo_file}: {line.strip()} - {e}")
-                            continue
-
-                        # Convert YOLO normalized coordinates to VOC absolute coordinates
-                        xmin = max(0, int((x_center - bbox_width / 2) * width))
-                        ymin = max(0, int((y_center - bbox_height / 2) * height))
-                        xmax = min(width, int((x_center + bbox_width / 2) * width))
-                        ymax = min(height, int((y_center + bbox_height / 2) * height))
-
-                        # Skip invalid bounding boxes
-                        if xmin >= xmax or ymin >= ymax:
-                            self.log(f"Invalid bounding box skipped: {xmin}, {ymin}, {xmax}, {ymax}")
-                            continue
-
-                        # Get class name from mapping
-                        class_name = class_mapping.get(int(class_id), "unknown")
-
-                        # Create object annotation
-                        obj = ET.SubElement(annotation, "object")
-                        ET.SubElement(obj, "name").text = class_name
-                        bndbox = ET.SubElement(obj, "bndbox")
-                        ET.SubElement(bndbox, "xmin").text = str(xmin)
-                        ET.SubElement(bndbox, "ymin").text = str(ymin)
-                        ET.SubElement(bndbox, "xmax").text = str(xmax)
-                        ET.SubElement(bndbox, "ymax").text = str(ymax)
-
-                    # Save as VOC XML
-                    voc_xml = ET.tostring(annotation, encoding="utf-8", method="xml")
-                    voc_file = os.path.join(root, os.path.splitext(file)[0] + ".xml")
-                    with open(voc_file, "wb") as xml_out:
-                        xml_out.write(voc_xml)
-
-                    self.log(f"Converted {yolo_file} to {voc_file}")
-
-    # def yolo_to_voc(self, yolo_dir, class_mapping):
-    #     yolo_dir = os.path.dirname(yolo_dir)
-    #     for root, dirs, files in os.walk(yolo_dir):
-    #         for file in files:
-    #             if file.endswith(".txt"):
-    #                 yolo_file = os.path.join(root, file)
-    #                 image_file = None
-    #                 for ext in [".png"]:
-    #                     possible_image_file = os.path.join(root, os.path.splitext(file)[0] + ext)
-    #                     if os.path.exists(possible_image_file):
-    #                         image_file = possible_image_file
-    #                         break
-    #                 if image_file is None:
-    #                     continue  # Skip if no image is found
-    #                 try:
-    #                     width, height = self.get_image_size(image_file)
-    #                 except Exception as e:
-    #                     self.log(f"Failed to get image size for {image_file}: {e}")
-    #                     continue  # Skip if unable to read image size
-    #                 with open(yolo_file, "r") as f:
-    #                     lines = f.readlines()
-    #                 annotation = ET.Element("annotation")
-    #                 ET.SubElement(annotation, "filename").text = os.path.basename(image_file)
-    #                 size = ET.SubElement(annotation, "size")
-    #                 ET.SubElement(size, "width").text = str(width)
-    #                 ET.SubElement(size, "height").text = str(height)
-    #                 for line in lines:
-    #                     data = line.strip().split()
-    #                     class_id, x_center, y_center, bbox_width, bbox_height = map(float, data)
-    #                     xmin = int((x_center - bbox_width / 2) * width)
-    #                     ymin = int((y_center - bbox_height / 2) * height)
-    #                     xmax = int((x_center + bbox_width / 2) * width)
-    #                     ymax = int((y_center + bbox_height / 2) * height)
-    #                     class_name = class_mapping.get(int(class_id), "unknown")
-    #                     obj = ET.SubElement(annotation, "object")
-    #                     ET.SubElement(obj, "name").text = class_name
-    #                     bndbox = ET.SubElement(obj, "bndbox")
-    #                     ET.SubElement(bndbox, "xmin").text = str(xmin)
-    #                     ET.SubElement(bndbox, "ymin").text = str(ymin)
-    #                     ET.SubElement(bndbox, "xmax").text = str(xmax)
-    #                     ET.SubElement(bndbox, "ymax").text = str(ymax)
-    #                 voc_xml = ET.tostring(annotation, encoding="utf-8", method="xml")
-    #                 voc_file = os.path.join(root, os.path.splitext(file)[0] + ".xml")
-    #                 with open(voc_file, "wb") as xml_out:
-    #                     xml_out.write(voc_xml)
-    #                 self.log(f"Converted {yolo_file} to {voc_file}")
+        catalog = self.open_catalog(yolo_dir)
+        try:
+            yolo_to_voc(yolo_dir, class_mapping, self.log, catalog=catalog)
+        finally:
+            if catalog is not None:
+                catalog.close()
 
+    def export_all_formats(self, yolo_dir, class_mapping):
+        import importlib.util
 
-    def get_image_size(self, image_path):
+        from core.exporters import create_sinks, export_dataset
+
+        formats = ["coco", "voc", "csv"]
+        if importlib.util.find_spec("pyarrow") is not None:
+            formats.append("parquet")
+        catalog = self.open_catalog(yolo_dir)
         try:
-            with Image.open(image_path) as img:
-                return img.size  # (width, height)
-        except Exception as e:
-            raise ValueError(f"Unable to open image: {e}")
+            export_dataset(yolo_dir, create_sinks(formats, yolo_dir, class_mapping, self.log), self.log,
+                           catalog=catalog)
+        finally:
+            if catalog is not None:
+                catalog.close()
+
+    def get_image_size(self, image_path):
+        from core.yolo_labels import get_image_size
+
+        return get_image_size(image_path)
 
     def next_image(self):
         """Show the next image in the list."""
@@ -1009,26 +1095,94 @@ class Yolo8AnnotationTool(QMainWindow):
         self.rotation_slider.setValue((current_angle + 90) % 360)  # Rotate right by 90 degrees
 
 
+    @tracing.traced("load_image", "gui")
     def load_image(self, file_path):
         """Load an image from the specified file path."""
+        from core.pyramid import needs_pyramid
+        from core.yolo_labels import get_image_size
+
         try:
             self.image_path = file_path
-            self.current_index = self.file_list_widget.row(self.file_list_widget.currentItem())
-            image = Image.open(file_path)
-            self.original_image = image.copy()  # Store the original image
-            self.current_image = image
-            self.update_image_settings()
+            self.current_index = self.file_list_widget.currentIndex().row()
+            width, height = get_image_size(file_path)
+            if needs_pyramid(width, height):
+                self.load_large_image(file_path, width, height)
+                return
+            self.show_tiled_view(False)
+            # Decoded images are read-only: every image operation below returns a new image
+            entry = self.image_prefetcher.load(file_path, self.image_label.size())
+            self.original_image = entry.image  # Store the original image
+            self.original_display = entry.display
+            self.current_image = entry.image
+            self.image_size = (self.width_spinbox.value(), self.height_spinbox.value())
             self.log(f"Loaded image: {file_path}")
-            self.bounding_boxes = []
-            self.undo_stack = []
-            self.redo_stack = []
+            self.reset_boxes()
 
             self.reset_image_settings()
+            self.load_autosaved_annotations()
+
+            # Decode the neighbouring images in the background
+            if 0 <= self.current_index < len(self.image_list):
+                self.image_prefetcher.prefetch(neighbour_paths(self.image_list, self.current_index),
+                                               self.image_label.size())
 
         except Exception as e:
 
             self.log(f"Failed to load image: {e}")
 
+    def show_tiled_view(self, visible):
+        """Switch the display bay between the image label and the tiled view of large images."""
+        if visible and self.tiled_view is None:
+            from gui.tiled_view import TiledImageView
+
+            # Boxes are drawn in full resolution coordinates
+            self.tiled_view = TiledImageView(self.display_bay)
+            self.tiled_view.box_drawn.connect(self.on_tiled_box_drawn)
+            self.tiled_view.mouse_moved.connect(self.on_tiled_mouse_moved)
+            self.display_bay.layout().addWidget(self.tiled_view)
+        self.large_image = visible
+        self.image_label.setVisible(not visible)
+        if self.tiled_view is not None:
+            self.tiled_view.setVisible(visible)
+            if not visible:
+                self.tiled_view.set_pyramid(None)
+
+    def load_large_image(self, file_path, width, height):
+        """Show an image with more than PYRAMID_MIN_PIXELS pixels through its tile pyramid."""
+        from gui.tiled_view import PyramidBuildThread
+
+        # The full image is never decoded here, the image settings do not apply to it
+        self.original_image = self.current_image = None
+        self.original_display = None
+        self.image_size = (width, height)
+        self.reset_boxes()
+        self.show_tiled_view(True)
+        self.tiled_view.set_pyramid(None)
+        self.update_display()
+        self.log(f"Loaded image: {file_path} ({width}x{height}, tiled)")
+        self.load_autosaved_annotations()
+
+        self.pyramid_thread = PyramidBuildThread(file_path, self)
+        self.pyramid_thread.built.connect(self.on_pyramid_built)
+        self.pyramid_thread.failed.connect(self.on_pyramid_failed)
+        self.pyramid_thread.message.connect(self.log)
+        self.pyramid_thread.start()
+
+    def on_pyramid_built(self, file_path, pyramid):
+        if self.large_image and file_path == self.image_path:
+            self.tiled_view.set_pyramid(pyramid)
+
+    def on_pyramid_failed(self, file_path, message):
+        self.log(f"Failed to load image: {file_path}: {message}")
+
+    def on_tiled_box_drawn(self, box):
+        self.add_box(box)
+        self.update_display()
+        self.autosave_annotations()
+
+    def on_tiled_mouse_moved(self, x, y):
+        self.mouse_position_label.setText(f"Mouse Position: X={x}, Y={y}")
+
     def save_image(self):
         """Save the current image."""
         if not self.current_image:
@@ -1043,6 +1197,8 @@ class Yolo8AnnotationTool(QMainWindow):
             # Resize the image to the specified width and height
             width = self.width_spinbox.value()
             height = self.height_spinbox.value()
+            from PIL import Image
+
             resized_image = self.current_image.resize((width, height), Image.Resampling.LANCZOS)
 
             # Save the resized image
@@ -1057,6 +1213,7 @@ class Yolo8AnnotationTool(QMainWindow):
                 self.drawing = True
                 self.start_point = event.position().toPoint() - self.offset
                 self.current_rect = QRect(self.start_point, self.start_point).normalized()
+                self.frame_timer.reset()
 
     def update_drawing(self, event):
         """Update the bounding box while drawing."""
@@ -1094,34 +1251,74 @@ class Yolo8AnnotationTool(QMainWindow):
         if self.drawing:
             self.drawing = False
             if not self.current_rect.isNull() and self.current_rect.width() > 0 and self.current_rect.height() > 0:
-                self.bounding_boxes.append(self.current_rect)
-                self.undo_stack.append(('add', self.current_rect))
-                self.redo_stack.clear()  # Clear redo stack when a new action is performed
+                self.add_box(self.current_rect)
+                self.autosave_annotations()
             self.update_display()
+            if self.frame_timer.frame_times:
+                self.statusBar().showMessage(self.frame_timer.summary(), 5000)
+
+    def reset_boxes(self):
+        """Start an empty box store, and undo log, for a newly loaded image."""
+        from core.box_store import BoxStore
+
+        self.box_store = BoxStore()
+
+    def add_box(self, rect):
+        """Add a drawn box, given in image coordinates, to the box store; its class is the annotation class."""
+        if self.box_store is None:
+            self.reset_boxes()
+        self.box_store.add(UNASSIGNED_CLASS, rect.left(), rect.top(), rect.left() + rect.width(),
+                           rect.top() + rect.height())
+
+    def box_rects(self):
+        """Return the boxes of the current image as QRects in image coordinates."""
+        if self.box_store is None:
+            return []
+        return [QRect(int(x1), int(y1), int(x2 - x1), int(y2 - y1)) for x1, y1, x2, y2 in self.box_store.boxes().tolist()]
 
     def undo_bounding_box(self):
-        if self.undo_stack:
-            action, box = self.undo_stack.pop()
-            if action == 'add':
-                self.bounding_boxes.remove(box)
-                self.redo_stack.append(('add', box))
-            elif action == 'remove':
-                self.bounding_boxes.append(box)
-                self.redo_stack.append(('remove', box))
+        # One logged command is reverted, whatever the number of boxes
+        if self.box_store is not None and self.box_store.undo():
             self.update_display()
+            self.autosave_annotations()
 
     def redo_bounding_box(self):
-        if self.redo_stack:
-            action, box = self.redo_stack.pop()
-            if action == 'add':
-                self.bounding_boxes.append(box)
-                self.undo_stack.append(('add', box))
-            elif action == 'remove':
-                self.bounding_boxes.remove(box)
-                self.undo_stack.append(('remove', box))
+        if self.box_store is not None and self.box_store.redo():
             self.update_display()
+            self.autosave_annotations()
+
+    def annotation_path(self):
+        """Return the path of the YOLO label file of the current image, which lives next to the image."""
+        return os.path.splitext(self.image_path)[0] + ".txt"
+
+    def yolo_annotation_text(self):
+        """Format the bounding boxes of the current image as YOLO label text."""
+        image_width, image_height = self.image_size
+        if self.box_store is None:
+            return ""
+        object_class_id = self.annotation_input.text().strip()
+        annotations = []
+        for class_id, (x1, y1, x2, y2) in zip(self.box_store.classes().tolist(), self.box_store.boxes().tolist()):
+            # Normalized (class, x_center, y_center, width, height); drawn boxes take the annotation class
+            box_class = object_class_id if class_id == UNASSIGNED_CLASS else class_id
+            x_norm = (x1 + x2) / 2 / image_width
+            y_norm = (y1 + y2) / 2 / image_height
+            width_norm = (x2 - x1) / image_width
+            height_norm = (y2 - y1) / image_height
+            annotations.append(f"{box_class} {x_norm:.6f} {y_norm:.6f} {width_norm:.6f} {height_norm:.6f}\n")
+        return "".join(annotations)
+
+    def image_pixels_changed(self):
+        """Return True if saving the image would change its pixels: settings were applied or it is resized."""
+        original_image = getattr(self, 'original_image', None)
+        if self.current_image is None or original_image is None:
+            return False
+        return (self.current_image is not original_image
+                or original_image.size != (self.width_spinbox.value(), self.height_spinbox.value()))
 
     def save_annotations(self):
+        from core.yolo_labels import write_text_atomic
+
         if not hasattr(self, 'image_path') or not self.image_path:
             self.log("Error: Image path is not set.")
             return
@@ -1130,57 +1327,38 @@ class Yolo8AnnotationTool(QMainWindow):
             QMessageBox.warning(self, "Warning!", "Update Annotation Class")
             return
 
-        # Get the base name of the image file without extension
-        image_name = os.path.basename(self.image_path)
-        file_name, _ = os.path.splitext(image_name)
-        # Get the directory path
-        directory_path = os.path.dirname(self.image_path)
-        # Create text file name using the image file name
-        annotation_file_name = f"{file_name}.txt"
-
-        annotation_file_path = os.path.join(directory_path, annotation_file_name)
-        # Get image dimensions
-        image_width, image_height = self.image_size
-
-        # Prepare annotations in YOLO format (or another format)
-        annotations = []
-        for box in self.bounding_boxes:
-
-            width = box.width()
-            height = box.height()
-            x_min = box.left()
-            y_min = box.top()
-            x_max = box.width() + x_min
-            y_max = box.height() + y_min
-
-            center_x = (x_min + x_max) / 2
-            center_y = (y_min + y_max) / 2
-            width = x_max - x_min
-            height = y_max - y_min
-
-            x_norm = center_x / image_width
-            y_norm = center_y / image_width
-            width_norm = width / image_width
-            height_norm = height / image_width
-
-            object_class_id = self.annotation_input.text()  # Assuming this returns object class ID
-
-            # Append the YOLO formatted data (class, x_center, y_center, width, height)
-            annotations.append(f"{object_class_id} {x_norm:.2f} {y_norm:.2f} {width_norm:.2f} {height_norm:.2f}")
-
-        # Save to a text file
-        with open(annotation_file_path, 'w') as f:
-            for annotation in annotations:
-                f.write(annotation + "\n")
+        annotation_file_path = self.annotation_path()
+        text = self.yolo_annotation_text()
+        # A pending autosave holds older boxes, it must not overwrite this file afterwards
+        self.label_writer.discard(annotation_file_path)
+        try:
+            write_text_atomic(annotation_file_path, text)
+        except OSError as e:
+            self.log(f"Failed to save annotations to {annotation_file_path}: {e}")
+            return
 
-        if not annotations:
-            self.log(f"Annotations is missing, try to draw bounding box.")
+        if not text:
+            self.log("Annotations is missing, try to draw bounding box.")
         else:
             self.log(f"Annotations saved in {annotation_file_path}.")
 
+        # Re-encode the image only when its pixels differ from the file on disk
+        if self.image_pixels_changed():
+            self.save_image()
+
+    def autosave_annotations(self):
+        """Queue the label file of the current image for writing if autosave is enabled."""
+        if not self.autosave_checkbox.isChecked() or not self.image_path:
+            return
+        if self.annotation_input.text().strip() == "":
+            self.statusBar().showMessage("Autosave paused: enter an annotation class", 5000)
+            return
+        self.label_writer.submit(self.annotation_path(), self.yolo_annotation_text())
 
-        # save image with updated DIM
-        self.save_image()
+    def load_autosaved_annotations(self):
+        """In autosave mode show the saved boxes of a newly loaded image, so edits extend instead of replace them."""
+        if self.autosave_checkbox.isChecked() and os.path.exists(self.annotation_path()):
+            self.load_annotations()
 
     def delete_annotations(self):
         if not hasattr(self, 'image_path') or not self.image_path:
@@ -1205,6 +1383,7 @@ class Yolo8AnnotationTool(QMainWindow):
 
             if reply == QMessageBox.StandardButton.Yes:
                 try:
+                    self.label_writer.discard(annotation_file_path)
                     os.remove(annotation_file_path)
                     QMessageBox.information(self, 'Success', f'File {annotation_file_path} deleted successfully.')
                 except Exception as e:
@@ -1218,6 +1397,8 @@ class Yolo8AnnotationTool(QMainWindow):
         if not hasattr(self, 'image_path') or not self.image_path:
             self.log("Error: Image path is not set.")
             return
+        # Read the latest autosaved boxes
+        self.label_writer.flush(self.annotation_path())
         try:
             image_width, image_height = self.image_size
             # Get the base name of the image file without extension
@@ -1245,18 +1426,12 @@ class Yolo8AnnotationTool(QMainWindow):
 
                     x = int(x - (width / 2))
                     y = int(y - (height / 2))
-                    annotations.append((x, y, width, height))
-
-            # Iterate over each bounding box in annotations
-            for box in annotations:
-                # Extract the x, y, width, and height from the box
-                x = int(box[0])
-                y = int(box[1])
-                width = int(box[2])
-                height = int(box[3])
+                    annotations.append((int(class_id), (x, y, x + width, y + height)))
 
-                # Create a QRect object using the extracted values
-                self.bounding_boxes.append(QRect(x, y, width, height))
+            # The loaded boxes are the state the undo log starts from
+            if self.box_store is None:
+                self.reset_boxes()
+            self.box_store.extend([class_id for class_id, _ in annotations], [box for _, box in annotations])
 
             self.log("Annotations loaded.")
             self.update_display()
@@ -1264,37 +1439,87 @@ class Yolo8AnnotationTool(QMainWindow):
             self.log("No annotation file found.")
 
 
+    def display_base_pixmap(self):
+        """Return the display-scaled pixmap of the current image, rebuilt only when the image or size changes."""
+        if self._preview is not None and self._preview[0] is self.current_image:
+            if self._base_pixmap_key != ('preview', self._preview[1].cacheKey()):
+                self._base_pixmap = self._preview[1]
+                self._base_pixmap_key = ('preview', self._preview[1].cacheKey())
+                self._boxes_pixmap_key = None
+            return self._base_pixmap
+        label_size = self.image_label.size()
+        key = (self.current_image, label_size.width(), label_size.height())
+        if self._base_pixmap_key is None or self._base_pixmap_key[0] is not key[0] \
+                or self._base_pixmap_key[1:] != key[1:]:
+            image_size = QSize(self.current_image.width, self.current_image.height)
+            display_size = image_size.scaled(label_size, Qt.AspectRatioMode.KeepAspectRatio)
+            if (self.current_image is self.original_image and self.original_display is not None
+                    and self.original_display.size() == display_size):
+                # Prefetched display-scaled copy of the unmodified image
+                self._base_pixmap = QPixmap.fromImage(self.original_display)
+            else:
+                from PIL import ImageQt
+
+                self._base_pixmap = QPixmap.fromImage(
+                    ImageQt.ImageQt(self.current_image).scaled(label_size, Qt.AspectRatioMode.KeepAspectRatio)
+                )
+            self._base_pixmap_key = key
+            self._boxes_pixmap_key = None
+        return self._base_pixmap
+
+    def draw_boxes(self, pixmap, boxes):
+        """Draw boxes given in image coordinates on a display-scaled pixmap."""
+        painter = QPainter(pixmap)
+        if self._preview is not None and self._preview[0] is self.current_image:
+            source_width = self._preview[2]
+        else:
+            source_width = self.current_image.width
+        if source_width > 0:
+            scale = pixmap.width() / source_width
+            painter.scale(scale, scale)
+        pen = QPen(Qt.GlobalColor.red, 2)
+        painter.setPen(pen)
+        for box in boxes:
+            painter.drawRect(box)
+        painter.end()
+
+    @tracing.traced("update_display", "gui")
     def update_display(self):
+        if self.large_image:
+            self.tiled_view.set_boxes(self.box_rects())
+            self.update_bounding_box_details()
+            return
         if self.current_image:
-            qt_image = ImageQt.ImageQt(self.current_image)
-            pixmap = QPixmap.fromImage(qt_image)
-
-            # Draw bounding boxes
-            painter = QPainter(pixmap)
-            pen = QPen(Qt.GlobalColor.red, 2)
-            painter.setPen(pen)
-            for box in self.bounding_boxes:
-                painter.drawRect(box)
-            if self.drawing:
-                painter.drawRect(self.current_rect)
-            painter.end()
+            self.frame_timer.start()
+            base_pixmap = self.display_base_pixmap()
 
-            self.image_label.setPixmap(pixmap.scaled(self.image_label.size(), Qt.AspectRatioMode.KeepAspectRatio))
+            # The committed boxes are cached as a layer, only the box being drawn is repainted per frame
+            boxes_key = (self.box_store, self.box_store.version if self.box_store is not None else None)
+            if self._boxes_pixmap_key != boxes_key:
+                self._boxes_pixmap = QPixmap(base_pixmap)
+                self.draw_boxes(self._boxes_pixmap, self.box_rects())
+                self._boxes_pixmap_key = boxes_key
+
+            if self.drawing:
+                pixmap = QPixmap(self._boxes_pixmap)
+                self.draw_boxes(pixmap, [self.current_rect])
+            else:
+                pixmap = self._boxes_pixmap
+            self.image_label.setPixmap(pixmap)
 
             # Update bounding box details
             self.update_bounding_box_details()
+            self.frame_timer.stop()
+            if self.drawing:
+                self.statusBar().showMessage(self.frame_timer.summary())
+
     def update_bounding_box_details(self):
-        if self.bounding_boxes:
-            last_box = self.bounding_boxes[-1]  # Show details for the last box added
+        box_id = self.box_store.last_id() if self.box_store is not None else None
+        if box_id is not None:
+            _, (x_min, y_min, x_max, y_max) = self.box_store.get(box_id)  # Show details for the last box added
 
             # Calculate normalized values
             image_width, image_height = self.image_size
-            width = last_box.width()
-            height = last_box.height()
-            x_min = last_box.left()
-            y_min = last_box.top()
-            x_max = last_box.width() + x_min
-            y_max = last_box.height() + y_min
 
             center_x = (x_min + x_max) / 2
             center_y = (y_min + y_max) / 2
@@ -1321,7 +1546,20 @@ class Yolo8AnnotationTool(QMainWindow):
     def log(self, message):
         self.log_window.append(message)
 
-    def create_yolo8_folders(self, folder_path, train_ratio, val_ratio, test_ratio):
+    def closeEvent(self, event):
+        if self.directory_scanner is not None:
+            self.directory_scanner.cancel()
+            self.directory_scanner.wait()
+        self.image_settings_timer.stop()
+        self.settings_pool.waitForDone()
+        self.image_prefetcher.shutdown()
+        if self.pyramid_thread is not None:
+            self.pyramid_thread.wait()
+        self.label_writer.shutdown()
+        super().closeEvent(event)
+
+    def create_yolo8_folders(self, folder_path, train_ratio, val_ratio, test_ratio, mode='move', stratify=False,
+                             dedup=False):
         """
         Create the necessary folder structure for YOLOv8 training data.
 
@@ -1337,10 +1575,16 @@ class Yolo8AnnotationTool(QMainWindow):
 
         # Check is 'yolo8_dataset' folder already exist
             # Define the folder structure
-        self.organize_files(folder_path, train_ratio, val_ratio, test_ratio)
+        try:
+            self.organize_files(folder_path, train_ratio, val_ratio, test_ratio, mode, stratify, dedup)
+        except (OSError, ValueError) as e:
+            self.log(f"Error creating training dataset: {e}")
+            QMessageBox.warning(self, "Error", f"Training dataset could not be generated.\n{e}")
+            return
         QMessageBox.information(self, "Success", f"Training dataset generated. {folder_path}")
 
-    def organize_files(self, source_dir, train_ratio, val_ratio, test_ratio):
+    def organize_files(self, source_dir, train_ratio, val_ratio, test_ratio, mode='move', stratify=False,
+                       dedup=False):
         """
         Organize files into separate 'images' and 'labels' folders for training, validation, and testing.
 
@@ -1349,193 +1593,73 @@ class Yolo8AnnotationTool(QMainWindow):
         train_ratio (float): Proportion of data to use for training.
         val_ratio (float): Proportion of data to use for validation.
         test_ratio (float): Proportion of data to use for testing.
+        mode (str): 'move' the files, or write list files ('list') and optionally link the files.
+        stratify (bool): Keep the class balance of every split.
+        dedup (bool): Keep near-duplicate images in one split.
         """
-        # Create folder path for Images and labels
-        base_dataset = "test_dataset"
-
-        # Ensure the target directories exist
-        ext_source_dir = os.path.join(source_dir, base_dataset)
-
-        # List all files in the source directory
-        dataset_splits = ['train', 'val', 'test']
-        for split in dataset_splits:
-            # Construct full file path
-            for folder in ['images', 'labels']:
-
-                # Determine file extension
-
-                # Check if file is an image or a label
-                    # Move image files
-                os.makedirs(os.path.join(ext_source_dir, split, folder), exist_ok=True)
-                    # Move label files
-
-
-
-        # Paths for images and labels
-
-        # Ensure these directories exist
-
-        # Get list of all images
-        all_ann_txt = [f for f in os.listdir(source_dir) if f.endswith('.txt')]
-
-        # Shuffle and split
-        np.random.shuffle(all_ann_txt)
-
-        total_ann_txt = len(all_ann_txt)
-        train_end = int(train_ratio * total_ann_txt)
-        val_end = int((train_ratio + val_ratio) * total_ann_txt)
+        from core.dedup import DEFAULT_MAX_DISTANCE
+        from core.splitter import organize_files, write_split
 
-        train_ann_txt = all_ann_txt[:train_end]
-        val_ann_txt = all_ann_txt[train_end:val_end]
-        test_ann_txt = all_ann_txt[val_end:]
-
-        def get_related_files(ann_txt_files, src_dir):
-            images, xml_files = [], []
-            for txt_file in ann_txt_files:
-            # Get the base name without extension and add .png
-                base_name = os.path.splitext(txt_file)[0]
-                png_file = base_name + '.png'
-                xml_file = base_name + '.xml'
-
-            # Get the base name without extension and add .png
-                if os.path.exists(os.path.join(src_dir, png_file)):
-                    images.append(png_file)
-                if os.path.exists(os.path.join(src_dir, xml_file)):
-                    xml_files.append(xml_file)
-
-            return images, xml_files
-
-            # Get the base name without extension and add .png
-        train_images, train_xml = get_related_files(train_ann_txt, source_dir)
-        val_images, val_xml = get_related_files(val_ann_txt, source_dir)
-        test_images, test_xml = get_related_files(test_ann_txt, source_dir)
-
-        # Helper function to move files
-        def move_files(file_list, src_folder, dst_folder, optional_files=False):
-            for file in file_list:
-                src_path = os.path.join(src_folder, file)
-                dst_path = os.path.join(dst_folder, file)
-
-                try:
-                    shutil.move(src_path, dst_path)
-                except FileNotFoundError:
-                    if not optional_files:
-                        print(f"File not found and skipped: {file}")
-
-        move_files(train_images, source_dir, os.path.join(ext_source_dir, 'train/images'))
-        move_files(train_xml, source_dir, os.path.join(ext_source_dir, 'train/labels'), optional_files=True)
-        move_files(train_ann_txt, source_dir, os.path.join(ext_source_dir, 'train/labels'))
-
-        # Move files to respective folders
-        move_files(val_images, source_dir, os.path.join(ext_source_dir, 'val/images'))
-        move_files(val_xml, source_dir, os.path.join(ext_source_dir, 'val/labels'), optional_files=True)
-        move_files(val_ann_txt, source_dir, os.path.join(ext_source_dir, 'val/labels'))
-
-        # Move files to respective folders
-        move_files(test_images, source_dir, os.path.join(ext_source_dir, 'test/images'))
-        move_files(test_xml, source_dir, os.path.join(ext_source_dir, 'test/labels'), optional_files=True)
-        move_files(test_ann_txt, source_dir, os.path.join(ext_source_dir, 'test/labels'))
+        dedup_distance = DEFAULT_MAX_DISTANCE if dedup else None
+        catalog = self.open_catalog(source_dir)
+        try:
+            if mode == 'move':
+                organize_files(source_dir, train_ratio, val_ratio, test_ratio, self.log, catalog=catalog,
+                               stratify=stratify, dedup_distance=dedup_distance)
+            else:
+                write_split(source_dir, train_ratio, val_ratio, test_ratio, mode, log=self.log, catalog=catalog,
+                            stratify=stratify, dedup_distance=dedup_distance)
+        finally:
+            if catalog is not None:
+                catalog.close()
 
     def validate_overlap_annotations(self):
         self.list_overlap_annotations(self.image_path)
 
     def compute_iou(self, box1: Tuple[float, float, float, float], box2: Tuple[float, float, float, float]) -> float:
-        """
-        Compute Intersection over Union (IoU) between two bounding boxes.
+        """Compute Intersection over Union (IoU) between two (x_min, y_min, x_max, y_max) boxes."""
+        from core.validation import compute_iou
 
-        Args:
-            box1: Tuple (x_min, y_min, x_max, y_max) for the first box.
-            box2: Tuple (x_min, y_min, x_max, y_max) for the second box.
-
-        Returns:
-            IoU: A float value between 0 and 1 representing the IoU.
-        """
-        x_min_inter = max(box1[0], box2[0])
-        y_min_inter = max(box1[1], box2[1])
-        x_max_inter = min(box1[2], box2[2])
-        y_max_inter = min(box1[3], box2[3])
-
-        if x_min_inter >= x_max_inter or y_min_inter >= y_max_inter:
-            return 0.0
-
-        intersection = (x_max_inter - x_min_inter) * (y_max_inter - y_min_inter)
-        box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
-
-        return intersection / (box1_area + box2_area - intersection)
+        return compute_iou(box1, box2)
 
     def list_overlap_annotations(self, directory_path: str, iou_threshold: float = 0.5, gui_enabled: bool = True):
         """
         Detect overlapping bounding boxes in annotation files in YOLO format.
 
         Args:
-            directory_path: Path to the directory containing annotation (.txt) files.
+            directory_path: Path of a file inside the directory containing annotation (.txt) files.
             iou_threshold: Threshold for IoU to consider bounding boxes as overlapping.
-            gui_enabled: Whether to display results using a GUI (QMessageBox) or print to console.
+            gui_enabled: Whether to display results using a GUI (QMessageBox) or only in the log.
         """
-        overlapping_files = []  # List to store files with overlapping annotations
+        from core.validation import find_overlapping_boxes
 
         # Validate and normalize the directory path
         directory_path = os.path.dirname(directory_path)
-        print(directory_path)
-        if not os.path.isdir(directory_path):
-            raise FileNotFoundError(f"The directory {directory_path} does not exist.")
-
-        # Get all .txt files in the directory
-        txt_files = [f for f in os.listdir(directory_path) if f.endswith('.txt')]
-
-        for txt_file in txt_files:
-            txt_path = os.path.join(directory_path, txt_file)
-            try:
-                with open(txt_path, 'r') as file:
-                    lines = file.readlines()
-            except Exception as e:
-                print(f"Error reading {txt_file}: {e}")
-                continue
-
-            # Convert YOLO to absolute coordinates
-            boxes = []
-            try:
-                for line in lines:
-                    _, x_center, y_center, width, height = map(float, line.strip().split())
-                    x_min = x_center - width / 2
-                    y_min = y_center - height / 2
-                    x_max = x_center + width / 2
-                    y_max = y_center + height / 2
-                    boxes.append((x_min, y_min, x_max, y_max))
-            except ValueError as e:
-                print(f"Error parsing annotations in {txt_file}: {e}")
-                continue
-
-            # Check for overlaps
-            has_overlap = False
-            for i in range(len(boxes)):
-                for j in range(i + 1, len(boxes)):
-                    if self.compute_iou(boxes[i], boxes[j]) > iou_threshold:
-                        has_overlap = True
-                        break
-                if has_overlap:
-                    break
-
-            if has_overlap:
-                overlapping_files.append(txt_file)
+        catalog = self.open_catalog(directory_path)
+        try:
+            overlaps = find_overlapping_boxes(directory_path, iou_threshold, log=self.log, catalog=catalog)
+        finally:
+            if catalog is not None:
+                catalog.close()
 
         # Display results
-        if overlapping_files:
-            overlapping_files_str = "\n".join(overlapping_files)
+        if overlaps:
+            overlapping_files_str = "\n".join(
+                f"{txt_file}: " + ", ".join(f"box {i}/{j} (IoU {iou:.2f})" for i, j, iou in pairs)
+                for txt_file, pairs in overlaps.items()
+            )
             if gui_enabled:
                 QMessageBox.warning(
                     None, "Validation Result",
                     f"The following files have overlapping annotations:\n{overlapping_files_str}"
                 )
             else:
-                print("Validation Result:")
-                print(f"The following files have overlapping annotations:\n{overlapping_files_str}")
+                self.log(f"Validation Result: The following files have overlapping annotations:\n{overlapping_files_str}")
         else:
             if gui_enabled:
                 QMessageBox.information(None, "Validation Result", "No overlapping annotations found.")
             else:
-                print("Validation Result: No overlapping annotations found.")
+                self.log("Validation Result: No overlapping annotations found.")
 
 
     def validate_annotations(self):
@@ -1545,17 +1669,19 @@ class Yolo8AnnotationTool(QMainWindow):
         # Get the directory path
         directory_path = os.path.dirname(self.image_path)
         if directory_path:
-            # Get the base names of all .txt and .png files
-            txt_files = {os.path.splitext(f)[0] for f in os.listdir(directory_path) if f.endswith('.txt')}
-            png_files = {os.path.splitext(f)[0] for f in os.listdir(directory_path) if f.endswith('.png')}
+            from core.validation import find_missing_annotations
+
+            catalog = self.open_catalog(directory_path)
+            try:
+                txt_files, missing_files = find_missing_annotations(directory_path, catalog)
+            finally:
+                if catalog is not None:
+                    catalog.close()
 
             if not txt_files:
                 QMessageBox.warning(self, "Validation Result", f"Missing Annotation .txt files")
                 return
 
-            # Find .txt files without corresponding .png files
-            missing_files = [f"{png_file}.txt" for png_file in png_files if png_file not in txt_files]
-
             if missing_files:
                 missing_files_str = "\n".join(missing_files)
                 QMessageBox.warning(self, "Validation Result",
@@ -1566,14 +1692,14 @@ class Yolo8AnnotationTool(QMainWindow):
                                                                    "corresponding .png files.")
 
     def convert_image_to_png(self, input_path, output_path):
+        from core.converter import convert_image_to_png
+
         try:
-            with Image.open(input_path) as img:
-                img.save(output_path, 'PNG')
-                self.log(f"Converted {input_path} to {output_path}")
+            convert_image_to_png(input_path, output_path)
+            self.log(f"Converted {input_path} to {output_path}")
         except Exception as e:
             self.log(f"Error converting {input_path}: {e}")
 
-
     def convert_all_images_in_directory(self, directory_path):
         """
         Convert and resize all valid image files in the specified directory to PNG format.
@@ -1581,43 +1707,10 @@ class Yolo8AnnotationTool(QMainWindow):
         Args:
             directory_path: Path to the directory containing image files.
         """
-
-        self.log("Convert and resize all images in the specified directory to PNG format.")
-        width = self.width_spinbox.value()
-        height = self.height_spinbox.value()
-        # Ensure the output directory exists
-        output_directory = os.path.join(directory_path, 'converted_png')
-        os.makedirs(output_directory, exist_ok=True)
-
-        self.log("Starting conversion and resizing of images...")
-
-        # Loop through all files in the directory and subdirectories
-        for root, _, files in os.walk(directory_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-
-                # Skip files in the output directory to avoid infinite loops
-                if output_directory in file_path:
-                    continue
-
-                try:
-                    # Open the image to verify if it's a valid image file
-                    with Image.open(file_path) as img:
-                        # Resize the image
-                        resized_image = img.resize((width, height), Image.Resampling.LANCZOS)
-
-                        # Construct the output file path in the output directory
-                        relative_path = os.path.relpath(root, directory_path)
-                        output_subdirectory = os.path.join(output_directory, relative_path)
-                        os.makedirs(output_subdirectory, exist_ok=True)
-                        output_file_path = os.path.join(output_subdirectory, f"{os.path.splitext(file)[0]}.png")
-
-                        # Save the resized image in PNG format
-                        resized_image.save(output_file_path, "PNG")
-                        self.log(f"Converted and resized {file_path} to {output_file_path}")
-                except IOError:
-                    self.log(f"Skipping non-image or unreadable file: {file_path}")
-                except Exception as e:
-                    self.log(f"Failed to process {file_path}: {e}")
-
-        self.log(f"Conversion and resizing complete. All PNG images are saved in: {output_directory}")
+        if self.png_converter_thread is not None and self.png_converter_thread.isRunning():
+            self.log("PNG conversion is already running.")
+            return
+        self.png_converter_thread = PngConverterThread(directory_path, self.width_spinbox.value(),
+                                                       self.height_spinbox.value(), self)
+        self.png_converter_thread.message.connect(self.log)
+        self.png_converter_thread.start()
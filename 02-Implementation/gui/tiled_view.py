@@ -0,0 +1,195 @@
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional
+
+from PyQt6.QtCore import QPointF, QRect, QRectF, Qt, QThread, pyqtSignal
+from PyQt6.QtGui import QColor, QImage, QPainter, QPen
+from PyQt6.QtWidgets import QWidget
+
+if TYPE_CHECKING:
+    from core.pyramid import ImagePyramid
+
+TILE_CACHE_BUDGET = 256 * 1024 * 1024  # Bytes of decoded tiles kept in memory
+ZOOM_STEP = 1.25  # Zoom factor per wheel notch
+MAX_ZOOM = 8.0  # Display pixels per image pixel
+
+_TILE_FORMATS = {1: QImage.Format.Format_Grayscale8, 3: QImage.Format.Format_RGB888, 4: QImage.Format.Format_RGBA8888}
+
+
+class PyramidBuildThread(QThread):
+    """Open (and on the first use build) the tile pyramid of an image in the background."""
+    built = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+    message = pyqtSignal(str)
+
+    def __init__(self, image_path: str, parent=None):
+        super().__init__(parent)
+        self.image_path = image_path
+
+    def run(self):
+        from core.pyramid import open_pyramid
+
+        try:
+            self.built.emit(self.image_path, open_pyramid(self.image_path, log=self.message.emit))
+        except Exception as e:
+            self.failed.emit(self.image_path, str(e))
+
+
+class TiledImageView(QWidget):
+    """
+    Zoomable viewer for very large images backed by an ImagePyramid.
+
+    Only the tiles intersecting the view are decoded, from the level matching the zoom. Boxes
+    are kept and reported in full resolution image coordinates. Use the wheel to zoom, the
+    right or middle button to pan and the left button to draw a box.
+    """
+    box_drawn = pyqtSignal(QRect)
+    mouse_moved = pyqtSignal(int, int)  # Full resolution image coordinates under the cursor
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pyramid: Optional["ImagePyramid"] = None
+        self.scale = 1.0  # Display pixels per image pixel
+        self.origin = QPointF()  # Image coordinates shown at the top-left corner
+        self.boxes: List[QRect] = []
+        self._tiles = OrderedDict()
+        self._tile_bytes = 0
+        self._pan_start = None
+        self._draw_start = None
+        self._draw_rect = None
+        self.setMouseTracking(True)
+        self.setMinimumSize(200, 200)
+
+    def set_pyramid(self, pyramid: Optional["ImagePyramid"]):
+        self.pyramid = pyramid
+        self._tiles.clear()
+        self._tile_bytes = 0
+        self._draw_start = self._draw_rect = None
+        self.fit_to_view()
+
+    def set_boxes(self, boxes: List[QRect]):
+        self.boxes = list(boxes)
+        self.update()
+
+    def fit_scale(self) -> float:
+        if self.pyramid is None:
+            return 1.0
+        return min(self.width() / self.pyramid.width, self.height() / self.pyramid.height)
+
+    def fit_to_view(self):
+        """Show the whole image centered in the widget."""
+        if self.pyramid is not None:
+            self.scale = self.fit_scale()
+            self.origin = QPointF((self.pyramid.width - self.width() / self.scale) / 2,
+                                  (self.pyramid.height - self.height() / self.scale) / 2)
+        self.update()
+
+    def widget_to_image(self, point: QPointF) -> QPointF:
+        return QPointF(self.origin.x() + point.x() / self.scale, self.origin.y() + point.y() / self.scale)
+
+    def _clamped_image_point(self, point: QPointF) -> QPointF:
+        image_point = self.widget_to_image(point)
+        return QPointF(min(max(image_point.x(), 0.0), float(self.pyramid.width)),
+                       min(max(image_point.y(), 0.0), float(self.pyramid.height)))
+
+    def _tile(self, level: int, col: int, row: int) -> QImage:
+        key = (level, col, row)
+        image = self._tiles.get(key)
+        if image is not None:
+            self._tiles.move_to_end(key)
+            return image
+        pixels = self.pyramid.read_tile(level, col, row)
+        height, width, channels = pixels.shape
+        # copy() detaches the QImage from the NumPy buffer
+        image = QImage(pixels.data, width, height, width * channels, _TILE_FORMATS[channels]).copy()
+        self._tiles[key] = image
+        self._tile_bytes += image.sizeInBytes()
+        while self._tile_bytes > TILE_CACHE_BUDGET and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self._tile_bytes -= evicted.sizeInBytes()
+        return image
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(48, 48, 48))
+        if self.pyramid is None:
+            painter.setPen(Qt.GlobalColor.white)
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Preparing tiles...")
+            return
+
+        level = self.pyramid.level_for_scale(self.scale)
+        factor = 2 ** level  # Image pixels per level pixel
+        tile_extent = self.pyramid.tile_size * factor  # Image pixels covered by one tile
+        cols, rows = self.pyramid.tile_grid(level)
+        visible = self.widget_to_image(QPointF(self.width(), self.height()))
+        first_col, first_row = max(0, int(self.origin.x() // tile_extent)), max(0, int(self.origin.y() // tile_extent))
+        last_col = min(cols - 1, int(visible.x() // tile_extent))
+        last_row = min(rows - 1, int(visible.y() // tile_extent))
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, factor * self.scale < 2)
+        painter.scale(self.scale, self.scale)
+        painter.translate(-self.origin)
+        # Border tiles are padded, only the image itself is painted
+        painter.setClipRect(QRectF(0, 0, self.pyramid.width, self.pyramid.height))
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                target = QRectF(col * tile_extent, row * tile_extent, tile_extent, tile_extent)
+                painter.drawImage(target, self._tile(level, col, row))
+        painter.setClipping(False)
+
+        pen = QPen(Qt.GlobalColor.red, 2)
+        pen.setCosmetic(True)  # Constant width at every zoom level
+        painter.setPen(pen)
+        for box in self.boxes:
+            painter.drawRect(QRectF(box))
+        if self._draw_rect is not None:
+            painter.drawRect(self._draw_rect)
+        painter.restore()
+
+    def zoom(self, factor: float, anchor: QPointF):
+        """Zoom by factor keeping the image point under anchor (widget coordinates) in place."""
+        if self.pyramid is None:
+            return
+        image_anchor = self.widget_to_image(anchor)
+        self.scale = min(max(self.scale * factor, self.fit_scale() / 2), MAX_ZOOM)
+        self.origin = QPointF(image_anchor.x() - anchor.x() / self.scale, image_anchor.y() - anchor.y() / self.scale)
+        self.update()
+
+    def wheelEvent(self, event):
+        self.zoom(ZOOM_STEP ** (event.angleDelta().y() / 120), event.position())
+
+    def mousePressEvent(self, event):
+        if self.pyramid is None:
+            return
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._draw_start = self._clamped_image_point(event.position())
+            self._draw_rect = QRectF(self._draw_start, self._draw_start)
+        elif event.button() in (Qt.MouseButton.RightButton, Qt.MouseButton.MiddleButton):
+            self._pan_start = (event.position(), QPointF(self.origin))
+
+    def mouseMoveEvent(self, event):
+        if self.pyramid is None:
+            return
+        image_point = self._clamped_image_point(event.position())
+        self.mouse_moved.emit(int(image_point.x()), int(image_point.y()))
+        if self._pan_start is not None:
+            start, origin = self._pan_start
+            delta = event.position() - start
+            self.origin = QPointF(origin.x() - delta.x() / self.scale, origin.y() - delta.y() / self.scale)
+            self.update()
+        elif self._draw_start is not None:
+            self._draw_rect = QRectF(self._draw_start, image_point).normalized()
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() in (Qt.MouseButton.RightButton, Qt.MouseButton.MiddleButton):
+            self._pan_start = None
+        elif event.button() == Qt.MouseButton.LeftButton and self._draw_rect is not None:
+            box = self._draw_rect.toRect()
+            self._draw_start = self._draw_rect = None
+            if box.width() > 0 and box.height() > 0:
+                self.box_drawn.emit(box)
+            self.update()
+
+    def mouseDoubleClickEvent(self, event):
+        self.fit_to_view()
@@ -1,12 +1,15 @@
 import sys
+import time
+
+START_TIME = time.perf_counter()  # Taken before the other imports, reported by --profile-startup
+
+import argparse
 import subprocess
 import importlib.util
+import threading
 from PyQt6.QtCore import QCoreApplication
 from PyQt6.QtWidgets import QApplication
 
-# Custom imports
-from gui.pyqt6_gui import Yolo8AnnotationTool
-
 # List of required packages with version specifications
 required_packages = {
     'numpy': '1.26.4',
@@ -15,6 +18,11 @@ required_packages = {
 }
 python_version = "3.9"  # Python version for running code
 
+STARTUP_TARGET_MS = 500  # Time budget from the start of main.py to the first painted window
+# Deferred by the GUI until first used; imported in the background once the window is shown
+PRELOAD_MODULES = ["numpy", "PIL.Image", "PIL.ImageQt", "core.yolo_labels", "core.pyramid", "core.catalog"]
+HEAVY_MODULES = ["numpy", "PIL", "xmltodict", "onnxruntime"]
+
 
 def check_python_version(version):
     """Check if a specific version of Python is installed."""
@@ -70,12 +78,53 @@ def validate_packages():
             install_package(package_name, version)
 
 
+def preload_modules(names):
+    """Import modules the GUI defers, so that the first image loads without waiting for them."""
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def report_startup(marks):
+    """Print the duration of every startup phase given as (name, perf_counter) marks."""
+    previous = START_TIME
+    for name, mark in marks:
+        print(f"{name:<24} {(mark - previous) * 1000:8.1f} ms")
+        previous = mark
+    total = (previous - START_TIME) * 1000
+    print(f"{'first window':<24} {total:8.1f} ms (target {STARTUP_TARGET_MS} ms)")
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"Heavy modules loaded at startup: {', '.join(loaded) or 'none'}")
+    if total > STARTUP_TARGET_MS:
+        print("Run 'python -X importtime main.py --profile-startup' to find the slow imports.")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="YOLO8 annotation tool")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print the import and window construction times and exit")
+    # Remaining arguments are left to Qt (e.g. -platform)
+    args, qt_args = parser.parse_known_args()
+    marks = [("main.py imports", time.perf_counter())]
 
     QCoreApplication.setApplicationName("YOLO8 ANNOTATION TOOL")
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
+    marks.append(("QApplication", time.perf_counter()))
+    from gui.pyqt6_gui import Yolo8AnnotationTool
+    marks.append(("GUI imports", time.perf_counter()))
     window = Yolo8AnnotationTool()
+    marks.append(("window construction", time.perf_counter()))
     window.show()
+    app.processEvents()
+    marks.append(("show and first paint", time.perf_counter()))
+
+    if args.profile_startup:
+        report_startup(marks)
+        window.close()
+        return
+    threading.Thread(target=preload_modules, args=(PRELOAD_MODULES,), name="Preload", daemon=True).start()
     sys.exit(app.exec())
 
 
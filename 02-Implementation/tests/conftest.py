@@ -0,0 +1,40 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# The packages live in 02-Implementation, which is not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# core.image_size reads the cache location on import, keep the tests out of the user's cache
+os.environ["YOLO8_CACHE_DIR"] = tempfile.mkdtemp(prefix="yolo8_cache_")
+atexit.register(shutil.rmtree, os.environ["YOLO8_CACHE_DIR"], ignore_errors=True)
+
+from benchmarks.synthetic import DATASET_DIRECTORY, generate_dataset  # noqa: E402
+
+IMAGES = 40
+BOXES = 5
+CLASSES = 3
+
+
+def quiet(message: str):
+    pass
+
+
+@pytest.fixture(scope="session")
+def synthetic_root(tmp_path_factory):
+    """A small synthetic dataset, generated once per test session."""
+    root = str(tmp_path_factory.mktemp("synthetic"))
+    generate_dataset(root, images=IMAGES, boxes=BOXES, width=64, height=48, classes=CLASSES, raw_format=None,
+                     max_workers=1, log=quiet)
+    return root
+
+
+@pytest.fixture
+def dataset_dir(synthetic_root, tmp_path):
+    """A private copy of the synthetic dataset which a test may modify."""
+    directory = str(tmp_path / DATASET_DIRECTORY)
+    shutil.copytree(os.path.join(synthetic_root, DATASET_DIRECTORY), directory)
+    return directory
@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import quiet
+from core.augment import (OUTPUT_DIRECTORY, augment_dataset, crop_boxes, flip_boxes, resize_boxes,
+                          rotate_boxes)
+
+
+@pytest.mark.parametrize("variants", [0, -1])
+def test_variants_below_one_are_rejected(dataset_dir, variants):
+    with pytest.raises(ValueError):
+        augment_dataset(dataset_dir, variants, log=quiet, max_workers=1)
+    assert not os.path.exists(os.path.join(dataset_dir, OUTPUT_DIRECTORY))
+
+
+def test_flip_boxes():
+    boxes = np.array([[10.0, 20.0, 30.0, 40.0], [0.0, 0.0, 100.0, 5.0]])
+    np.testing.assert_allclose(flip_boxes(boxes, 100), [[70, 20, 90, 40], [0, 0, 100, 5]])
+
+
+def test_crop_boxes_clips_and_drops_hidden_boxes():
+    boxes = np.array([
+        [0.0, 0.0, 20.0, 20.0],  # Keeps 100 of 400 pixels, below the visibility
+        [20.0, 20.0, 40.0, 40.0],  # Inside the crop
+        [50.0, 30.0, 70.0, 50.0],  # Keeps 200 of 400 pixels
+        [70.0, 70.0, 80.0, 80.0],  # Outside the crop
+    ])
+    clipped, keep = crop_boxes(boxes, (10, 10, 60, 60), min_visibility=0.3)
+    np.testing.assert_array_equal(keep, [False, True, True, False])
+    np.testing.assert_allclose(clipped, [[10, 10, 30, 30], [40, 20, 50, 40]])
+
+    clipped, keep = crop_boxes(boxes, (10, 10, 60, 60))
+    np.testing.assert_array_equal(keep, [True, True, True, False])
+    np.testing.assert_allclose(clipped[0], [0, 0, 10, 10])
+
+
+def test_rotate_boxes_follows_pil():
+    # A quarter turn counter-clockwise maps (x, y) to (y, width - x) in a square image
+    boxes = np.array([[10.0, 20.0, 30.0, 40.0]])
+    np.testing.assert_allclose(rotate_boxes(boxes, 90, 100, 100), [[20, 70, 40, 90]], atol=1e-9)
+
+    image = Image.new("L", (100, 100))
+    image.paste(255, (10, 20, 30, 40))
+    assert image.rotate(90).getbbox() == (20, 70, 40, 90)
+
+
+def test_rotate_boxes_rebounds_and_clips():
+    # The corners of a square turned by 45 degrees lie half a diagonal away from its center
+    half_diagonal = 10 * np.sqrt(2)
+    np.testing.assert_allclose(rotate_boxes(np.array([[40.0, 40.0, 60.0, 60.0]]), 45, 100, 100),
+                               [[50 - half_diagonal, 50 - half_diagonal, 50 + half_diagonal, 50 + half_diagonal]])
+    # Corner boxes leave the image and are clipped to it
+    np.testing.assert_allclose(rotate_boxes(np.array([[0.0, 0.0, 100.0, 100.0]]), 45, 100, 100),
+                               [[0, 0, 100, 100]])
+
+
+def test_resize_boxes():
+    boxes = np.array([[10.0, 20.0, 30.0, 40.0]])
+    np.testing.assert_allclose(resize_boxes(boxes, 2, 0.5), [[20, 10, 60, 20]])
+
+
+def read_outputs(directory):
+    outputs = {}
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            outputs[name] = f.read()
+    return outputs
+
+
+def test_same_seed_gives_identical_outputs(dataset_dir, tmp_path):
+    runs = {}
+    for run, seed, max_workers in [("first", 7, 1), ("second", 7, 2), ("other", 8, 1)]:
+        output_dir = str(tmp_path / run)
+        counts = augment_dataset(dataset_dir, 2, seed, output_dir=output_dir, log=quiet, max_workers=max_workers)
+        assert counts["failed"] == 0
+        runs[run] = read_outputs(output_dir)
+
+    assert len(runs["first"]) == counts["written"] * 2
+    assert not any(name.endswith(".part") for name in runs["first"])
+    # Neither the number of workers nor the processing order changes the result
+    assert runs["first"] == runs["second"]
+    assert runs["first"] != runs["other"]
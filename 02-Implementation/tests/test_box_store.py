@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+import pytest
+
+from core.box_store import BoxStore
+
+
+def assert_state(store, expected):
+    assert store.ids().tolist() == [box_id for box_id, _, _ in expected]
+    assert store.classes().tolist() == [class_id for _, class_id, _ in expected]
+    np.testing.assert_array_equal(store.boxes().reshape(-1, 4), np.array([box for _, _, box in expected]).reshape(-1, 4))
+    assert store.last_id() == (expected[-1][0] if expected else None)
+
+
+def test_edits_and_undo():
+    store = BoxStore()
+    first, second = store.extend([1, 2], [[0, 0, 10, 10], [5, 5, 20, 20]]).tolist()
+    assert not store.can_undo()
+    third = store.add(0, 1, 2, 3, 4)
+    store.move(first, 2, 3)
+    store.resize(second, 0, 0, 1, 1)
+    store.set_class(third, 7)
+    store.delete(first)
+    assert_state(store, [(second, 2, (0, 0, 1, 1)), (third, 7, (1, 2, 3, 4))])
+
+    for _ in range(5):
+        assert store.undo()
+    assert not store.undo()
+    assert_state(store, [(first, 1, (0, 0, 10, 10)), (second, 2, (5, 5, 20, 20))])
+    for _ in range(5):
+        assert store.redo()
+    assert not store.redo()
+    assert_state(store, [(second, 2, (0, 0, 1, 1)), (third, 7, (1, 2, 3, 4))])
+
+    with pytest.raises(KeyError):
+        store.move(first, 1, 1)
+
+
+def test_random_edits_match_a_list_model():
+    rng = random.Random(0)
+    store = BoxStore()
+    history, cursor = [[]], 0
+    for _ in range(2000):
+        state = list(history[cursor])
+        action = rng.random()
+        if action < 0.3 or not state:
+            box = tuple(float(rng.randint(0, 99)) for _ in range(4))
+            state.append((store.add(rng.randint(0, 5), *box), store.classes()[-1].item(), box))
+        elif action < 0.5:
+            # Deleting the last box often also covers dropping several boxes at the end
+            index = len(state) - 1 if rng.random() < 0.5 else rng.randrange(len(state))
+            store.delete(state.pop(index)[0])
+        elif action < 0.6:
+            index = rng.randrange(len(state))
+            box_id, class_id, (x1, y1, x2, y2) = state[index]
+            store.move(box_id, 2, -1)
+            state[index] = (box_id, class_id, (x1 + 2, y1 - 1, x2 + 2, y2 - 1))
+        elif action < 0.7:
+            index = rng.randrange(len(state))
+            box_id, _, box = state[index]
+            store.set_class(box_id, 9)
+            state[index] = (box_id, 9, box)
+        else:
+            if action < 0.85:
+                cursor -= store.undo()
+            else:
+                cursor += store.redo()
+            assert_state(store, history[cursor])
+            continue
+        history, cursor = history[:cursor + 1] + [state], cursor + 1
+        assert_state(store, state)
+
+    while store.undo():
+        cursor -= 1
+        assert_state(store, history[cursor])
+    assert cursor == 0
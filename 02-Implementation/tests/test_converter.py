@@ -0,0 +1,28 @@
+import os
+
+from PIL import Image
+
+from core.converter import OUTPUT_DIRECTORY, convert_all_images_in_directory
+
+
+def test_rerun_skips_known_non_images_and_survives_broken_links(tmp_path):
+    Image.new("RGB", (40, 30), (10, 20, 30)).save(tmp_path / "a.jpg")
+    (tmp_path / "a.txt").write_text("0 0.5 0.5 0.2 0.2\n")
+    os.symlink(tmp_path / "missing.jpg", tmp_path / "broken.jpg")
+
+    messages = []
+    counts = convert_all_images_in_directory(str(tmp_path), 16, 12, log=messages.append, max_workers=1)
+    assert counts == {"converted": 1, "unchanged": 0, "up_to_date": 0, "skipped": 1, "failed": 1}
+    assert any(message.startswith("Skipping non-image file") for message in messages)
+    with Image.open(tmp_path / OUTPUT_DIRECTORY / "a.png") as img:
+        assert img.size == (16, 12)
+
+    messages = []
+    counts = convert_all_images_in_directory(str(tmp_path), 16, 12, log=messages.append, max_workers=1)
+    assert counts == {"converted": 0, "unchanged": 0, "up_to_date": 1, "skipped": 1, "failed": 1}
+    assert not any(message.startswith("Skipping") for message in messages)
+
+    # A changed file is looked at again
+    (tmp_path / "a.txt").write_text("0 0.5 0.5 0.2 0.2\n1 0.1 0.1 0.1 0.1\n")
+    counts = convert_all_images_in_directory(str(tmp_path), 16, 12, log=messages.append, max_workers=1)
+    assert counts["skipped"] == 1 and any(message.startswith("Skipping non-image file") for message in messages)
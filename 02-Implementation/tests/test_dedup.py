@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from core.dedup import connected_components, group_hashes, hamming_distances, near_duplicate_pairs
+
+
+def brute_force_pairs(hashes, max_distance):
+    return {(i, j) for i in range(len(hashes)) for j in range(i + 1, len(hashes))
+            if bin(int(hashes[i]) ^ int(hashes[j])).count("1") <= max_distance}
+
+
+def test_hamming_distances():
+    a = np.array([0, 0xFF, 2 ** 64 - 1], dtype=np.uint64)
+    b = np.array([1, 0x0F, 0], dtype=np.uint64)
+    assert hamming_distances(a, b).tolist() == [1, 4, 64]
+
+
+@pytest.mark.parametrize("max_distance", [0, 2, 4])
+def test_near_duplicate_pairs_match_brute_force(max_distance):
+    rng = np.random.default_rng(max_distance)
+    hashes = rng.integers(0, 2 ** 63, 200, dtype=np.uint64)
+    # Copies with a few flipped bits
+    flips = np.uint64(1) << rng.integers(0, 64, (100, 3)).astype(np.uint64)
+    copies = hashes[:100] ^ flips[:, 0] ^ flips[:, 1] ^ flips[:, 2]
+    hashes = np.concatenate([hashes, copies])
+    i, j = near_duplicate_pairs(hashes, max_distance)
+    found = {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+    assert found == brute_force_pairs(hashes, max_distance)
+
+
+def test_connected_components():
+    labels = connected_components(6, np.array([4, 1, 2]), np.array([5, 2, 0]))
+    assert labels.tolist() == [0, 0, 0, 3, 4, 4]
+
+
+def test_group_hashes_is_transitive():
+    hashes = {"a.png": 0b0000, "b.png": 0b0011, "c.png": 0b1111, "d.png": 2 ** 64 - 1}
+    assert group_hashes(hashes, max_distance=2) == [["a.png", "b.png", "c.png"]]
+    assert group_hashes(hashes, max_distance=0) == []
@@ -0,0 +1,138 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from conftest import BOXES, CLASSES, IMAGES, quiet
+from core import exporters
+from core.catalog import DatasetCatalog
+from core.coco import yolo_to_coco
+from core.exporters import create_sinks, export_dataset
+from core.importers import import_coco, import_voc
+from core.voc import voc_path, yolo_to_voc
+from core.yolo_labels import iter_label_files, read_yolo_labels
+
+CLASS_MAPPING = {class_id: f"class{class_id}" for class_id in range(CLASSES)}
+
+
+@pytest.fixture
+def image_copy(dataset_dir, tmp_path):
+    """The images of the dataset without their labels."""
+    directory = tmp_path / "images"
+    directory.mkdir()
+    for name in os.listdir(dataset_dir):
+        if name.endswith(".png"):
+            shutil.copy(os.path.join(dataset_dir, name), directory / name)
+    return str(directory)
+
+
+def assert_same_labels(dataset_dir, imported_dir, atol):
+    label_paths = list(iter_label_files(dataset_dir))
+    assert len(label_paths) == IMAGES
+    for label_path in label_paths:
+        class_ids, boxes = read_yolo_labels(label_path)
+        imported_ids, imported_boxes = read_yolo_labels(os.path.join(imported_dir, os.path.basename(label_path)))
+        np.testing.assert_array_equal(imported_ids, class_ids)
+        np.testing.assert_allclose(imported_boxes, boxes, atol=atol)
+
+
+def test_coco_round_trip(dataset_dir, image_copy, tmp_path):
+    output_json = str(tmp_path / "coco.json")
+    yolo_to_coco(dataset_dir, CLASS_MAPPING, log=quiet, output_json=output_json)
+    class_mapping, counts = import_coco(output_json, image_copy, log=quiet)
+    assert class_mapping == CLASS_MAPPING
+    assert counts == {"images": IMAGES, "boxes": IMAGES * BOXES, "skipped": 0, "existing": 0, "missing": 0}
+    assert_same_labels(dataset_dir, image_copy, atol=1e-4)
+
+
+def test_voc_round_trip(dataset_dir, image_copy):
+    counts = yolo_to_voc(dataset_dir, CLASS_MAPPING, log=quiet, max_workers=1)
+    assert counts == {"written": IMAGES, "up_to_date": 0, "failed": 0}
+    # Unchanged files are not written again
+    assert yolo_to_voc(dataset_dir, CLASS_MAPPING, log=quiet, max_workers=1)["up_to_date"] == IMAGES
+
+    class_mapping, counts = import_voc(dataset_dir, image_copy, CLASS_MAPPING, log=quiet, max_workers=1)
+    assert counts["images"] == IMAGES and counts["boxes"] == IMAGES * BOXES and counts["failed"] == 0
+    # VOC holds whole pixels of the 64x48 images
+    assert_same_labels(dataset_dir, image_copy, atol=1.5 / 48)
+
+
+def test_single_pass_export_matches_the_single_format_exports(dataset_dir, tmp_path):
+    expected_json = str(tmp_path / "expected.json")
+    yolo_to_coco(dataset_dir, CLASS_MAPPING, log=quiet, output_json=expected_json)
+
+    sinks = create_sinks(["coco", "voc", "csv"], dataset_dir, CLASS_MAPPING, quiet,
+                         {"coco": {"output_json": str(tmp_path / "coco.json")}, "voc": {"max_workers": 1},
+                          "csv": {"output_csv": str(tmp_path / "boxes.csv")}})
+    assert export_dataset(dataset_dir, sinks, quiet) == IMAGES
+    with open(expected_json) as expected, open(tmp_path / "coco.json") as exported:
+        assert json.load(exported) == json.load(expected)
+    with open(tmp_path / "boxes.csv") as f:
+        assert len(f.readlines()) == 1 + IMAGES * BOXES
+    assert all(os.path.exists(voc_path(label_path)) for label_path in iter_label_files(dataset_dir))
+
+
+def test_failed_voc_files_are_rewritten_after_a_class_change(dataset_dir):
+    yolo_to_voc(dataset_dir, CLASS_MAPPING, log=quiet, max_workers=1)
+    label_path = list(iter_label_files(dataset_dir))[0]
+    # An undecodable label file makes its rewrite fail; its mtime is kept, so only the removed
+    # XML file makes the next run retry it
+    stat = os.stat(label_path)
+    with open(label_path, "rb") as f:
+        original = f.read()
+    with open(label_path, "wb") as f:
+        f.write(b"\xff\xfe not utf-8\n")
+    os.utime(label_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    renamed = {class_id: f"renamed{class_id}" for class_id in range(CLASSES)}
+    counts = yolo_to_voc(dataset_dir, renamed, log=quiet, max_workers=1)
+    assert counts == {"written": IMAGES - 1, "up_to_date": 0, "failed": 1}
+    assert not os.path.exists(voc_path(label_path))
+
+    with open(label_path, "wb") as f:
+        f.write(original)
+    os.utime(label_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    counts = yolo_to_voc(dataset_dir, renamed, log=quiet, max_workers=1)
+    assert counts == {"written": 1, "up_to_date": IMAGES - 1, "failed": 0}
+    with open(voc_path(label_path), encoding="utf-8") as f:
+        assert "renamed" in f.read()
+    assert yolo_to_voc(dataset_dir, renamed, log=quiet, max_workers=1)["up_to_date"] == IMAGES
+
+
+def test_single_pass_voc_export_skips_current_files_unread(dataset_dir, monkeypatch):
+    reads = []
+    monkeypatch.setattr(exporters, "read_yolo_labels", lambda path, log: reads.append(path) or read_yolo_labels(path))
+    with DatasetCatalog(dataset_dir) as catalog:
+        catalog.refresh()
+        export_dataset(dataset_dir, create_sinks(["voc"], dataset_dir, CLASS_MAPPING, quiet), quiet, catalog)
+        assert len(reads) == IMAGES
+
+        reads.clear()
+        messages = []
+        sinks = create_sinks(["voc"], dataset_dir, CLASS_MAPPING, quiet)
+        assert export_dataset(dataset_dir, sinks, messages.append, catalog) == 0
+        assert reads == []
+        assert f"VOC XML files: 0 written, {IMAGES} up to date, 0 failed" in messages
+
+
+def test_single_pass_export_skips_unreadable_label_files(dataset_dir, tmp_path):
+    yolo_to_voc(dataset_dir, CLASS_MAPPING, log=quiet, max_workers=1)
+    label_path = list(iter_label_files(dataset_dir))[0]
+    with open(label_path, "wb") as f:
+        f.write(b"\xff\xfe not utf-8\n")
+
+    messages = []
+    sinks = create_sinks(["coco", "voc", "csv"], dataset_dir, CLASS_MAPPING, quiet,
+                         {"coco": {"output_json": str(tmp_path / "coco.json")}, "voc": {"max_workers": 1},
+                          "csv": {"output_csv": str(tmp_path / "boxes.csv")}})
+    assert export_dataset(dataset_dir, sinks, messages.append) == IMAGES - 1
+    assert any(message.startswith(f"Failed to export {label_path}") for message in messages)
+    assert f"VOC XML files: 0 written, {IMAGES - 1} up to date, 1 failed" in messages
+    # The stale XML file is removed, so the next export retries the image
+    assert not os.path.exists(voc_path(label_path))
+    with open(tmp_path / "coco.json") as f:
+        assert len(json.load(f)["images"]) == IMAGES - 1
+    with open(tmp_path / "boxes.csv") as f:
+        assert len(f.readlines()) == 1 + (IMAGES - 1) * BOXES
@@ -0,0 +1,44 @@
+import io
+import json
+
+import pytest
+
+from core.importers import _JsonStream
+
+DOCUMENT = '[1e5, -2.5E-3, true, false, null, -Infinity, "caf\\u00e9 \\"x\\"", {"a": [10, 20]}, 123456789]'
+
+
+class CountingReader(io.StringIO):
+    """Text file counting the characters read."""
+
+    def __init__(self, text: str):
+        super().__init__(text)
+        self.characters = 0
+
+    def read(self, size=-1):
+        text = super().read(size)
+        self.characters += len(text)
+        return text
+
+
+@pytest.mark.parametrize("chunk_size", range(1, 12))
+def test_values_cut_by_the_chunks_are_decoded(chunk_size):
+    stream = _JsonStream(io.StringIO(DOCUMENT), chunk_size)
+    assert json.dumps(stream.value()) == json.dumps(json.loads(DOCUMENT))
+    assert stream.peek() == ""
+
+
+def test_malformed_json_fails_without_reading_the_rest():
+    reader = CountingReader('{"images": [1, 2,, 3], "padding": "' + "x" * 1_000_000 + '"}')
+    stream = _JsonStream(reader, chunk_size=64)
+    stream.expect("{")
+    assert stream.value() == "images"
+    stream.expect(":")
+    with pytest.raises(ValueError, match="character 17"):
+        stream.value()
+    assert reader.characters < 1000
+
+
+def test_truncated_json_fails():
+    with pytest.raises(ValueError):
+        _JsonStream(io.StringIO('[1, 2, "unterminated'), chunk_size=4).value()
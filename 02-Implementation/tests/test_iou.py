@@ -0,0 +1,45 @@
+import numpy as np
+
+from core import iou
+from core.iou import iou_matrix, non_max_suppression, overlapping_pairs
+
+
+def random_boxes(count, seed=0):
+    rng = np.random.default_rng(seed)
+    top_left = rng.uniform(0, 1000, (count, 2))
+    return np.hstack([top_left, top_left + rng.uniform(1, 40, (count, 2))])
+
+
+def test_iou_matrix_values():
+    boxes1 = np.array([[0, 0, 10, 10], [0, 0, 0, 0]])
+    boxes2 = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    np.testing.assert_allclose(iou_matrix(boxes1, boxes2), [[1, 50 / 150, 0], [0, 0, 0]])
+
+
+def test_sweep_and_prune_matches_the_dense_path(monkeypatch):
+    boxes = random_boxes(iou.DENSE_BOX_LIMIT + 500)
+    # Duplicates, and a pair in the middle of the x range, guarantee overlaps
+    boxes[10] = boxes[3]
+    boxes[800] = boxes[700] + 1
+    dense = iou._dense_pairs(boxes, 0.3)
+    # Small chunks also exercise the grouping of candidate pairs
+    monkeypatch.setattr(iou, "PAIR_CHUNK_SIZE", 64)
+    i, j, values = overlapping_pairs(boxes, 0.3)
+    assert len(i) >= 2
+    np.testing.assert_array_equal(i, dense[0])
+    np.testing.assert_array_equal(j, dense[1])
+    np.testing.assert_allclose(values, dense[2])
+
+
+def test_overlapping_pairs_of_few_boxes():
+    i, j, values = overlapping_pairs(np.array([[0, 0, 10, 10], [1, 0, 11, 10], [50, 50, 60, 60]]), 0.5)
+    assert i.tolist() == [0] and j.tolist() == [1]
+    np.testing.assert_allclose(values, [90 / 110])
+    assert len(overlapping_pairs(np.zeros((1, 4)))[0]) == 0
+
+
+def test_non_max_suppression_per_class():
+    boxes = np.array([[0, 0, 10, 10], [1, 0, 11, 10], [1, 0, 11, 10], [50, 50, 60, 60]])
+    scores = np.array([0.6, 0.9, 0.8, 0.5])
+    assert non_max_suppression(boxes, scores, 0.5).tolist() == [1, 3]
+    assert non_max_suppression(boxes, scores, 0.5, class_ids=np.array([0, 0, 1, 0])).tolist() == [1, 2, 3]
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+from conftest import IMAGES, quiet
+from core.label_store import export_label_store, sync_label_store
+from core.yolo_labels import read_yolo_labels
+
+
+def test_export_restores_the_label_files(dataset_dir, tmp_path):
+    store = sync_label_store(dataset_dir, log=quiet)
+    assert len(store) == IMAGES
+
+    output_dir = str(tmp_path / "exported")
+    assert export_label_store(store, output_dir, log=quiet) == IMAGES
+    assert len(os.listdir(output_dir)) == IMAGES  # No temporary files are left behind
+    for label_path in store.label_paths:
+        class_ids, boxes = read_yolo_labels(os.path.join(output_dir, label_path))
+        expected_ids, expected_boxes = read_yolo_labels(os.path.join(dataset_dir, label_path))
+        np.testing.assert_array_equal(class_ids, expected_ids)
+        np.testing.assert_allclose(boxes, expected_boxes, atol=1e-6)
+
+
+def test_unreadable_label_files_are_left_out(dataset_dir):
+    label_name = sorted(name for name in os.listdir(dataset_dir) if name.endswith(".txt"))[0]
+    label_path = os.path.join(dataset_dir, label_name)
+    with open(label_path, "rb") as f:
+        original = f.read()
+    with open(label_path, "wb") as f:
+        f.write(b"\xff\xfe\x00 not utf-8\n")
+
+    messages = []
+    store = sync_label_store(dataset_dir, log=messages.append)
+    assert len(store) == IMAGES - 1
+    assert store.find(label_path) is None
+    assert any(message.startswith(f"Failed to read {label_path}") for message in messages)
+
+    # The file is read again once it is fixed
+    with open(label_path, "wb") as f:
+        f.write(original)
+    store = sync_label_store(dataset_dir, log=quiet)
+    assert len(store) == IMAGES
+    np.testing.assert_array_equal(store.labels(store.find(label_path))[0], read_yolo_labels(label_path)[0])
@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import quiet
+from core.preannotate import PAD_VALUE, decode_predictions, letterbox, preannotate_folder, to_yolo_boxes
+from core.yolo_labels import read_yolo_labels
+
+INPUT_SIZE = 64
+# Raw output of the test model, (1, 4 + 2 classes, 4 anchors): center x, center y, width, height in
+# input pixels, then the class scores
+FIXED_OUTPUT = np.array([[
+    [20, 21, 21, 40],
+    [36, 36, 36, 40],
+    [20, 20, 20, 10],
+    [20, 20, 20, 10],
+    [0.9, 0.8, 0.0, 0.1],  # Anchor 1 overlaps anchor 0 of the same class
+    [0.0, 0.0, 0.7, 0.0],  # Anchor 2 overlaps anchor 0, but is of another class
+]], dtype=np.float32)
+
+
+def fixed_output_model(path: str):
+    """Write an ONNX model returning FIXED_OUTPUT for every image of a (B, 3, 64, 64) batch."""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    nodes = [
+        # Zeros of shape (B, 1, 1) broadcast the output to the batch size
+        helper.make_node("ReduceMean", ["images"], ["mean"], axes=[1, 2, 3], keepdims=1),
+        helper.make_node("Mul", ["mean", "zero"], ["zeros"]),
+        helper.make_node("Reshape", ["zeros", "shape"], ["batch_zeros"]),
+        helper.make_node("Add", ["batch_zeros", "fixed"], ["output0"]),
+    ]
+    graph = helper.make_graph(
+        nodes, "fixed_output",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, INPUT_SIZE, INPUT_SIZE])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", 6, 4])],
+        initializer=[
+            numpy_helper.from_array(np.zeros(1, dtype=np.float32), "zero"),
+            numpy_helper.from_array(np.array([-1, 1, 1], dtype=np.int64), "shape"),
+            numpy_helper.from_array(FIXED_OUTPUT, "fixed"),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+
+
+def test_letterbox_maps_boxes_back():
+    pixels, scale, padding = letterbox(Image.new("RGB", (128, 64), (255, 0, 0)), INPUT_SIZE)
+    assert pixels.shape == (3, INPUT_SIZE, INPUT_SIZE)
+    assert scale == 0.5
+    assert padding == (0, 16)
+    # Rows 16 to 47 hold the image, the rest is padding
+    assert (pixels[:, :16] == PAD_VALUE).all() and (pixels[:, 48:] == PAD_VALUE).all()
+    assert (pixels[0, 16:48] == 255).all()
+
+    boxes = to_yolo_boxes(np.array([[0, 16, 64, 48], [10, 26, 30, 46]]), (128, 64), scale, padding)
+    np.testing.assert_allclose(boxes, [[0.5, 0.5, 1, 1], [40 / 128, 40 / 64, 40 / 128, 40 / 64]])
+
+
+def test_decode_predictions_applies_per_class_nms():
+    output = np.concatenate([FIXED_OUTPUT, FIXED_OUTPUT[:, :, ::-1]])
+    detections = decode_predictions(output, conf_threshold=0.25, iou_threshold=0.45)
+    assert len(detections) == 2
+    for class_ids, scores, boxes in detections:
+        order = np.argsort(-scores)
+        np.testing.assert_array_equal(class_ids[order], [0, 1])
+        np.testing.assert_allclose(scores[order], [0.9, 0.7], rtol=1e-6)
+        np.testing.assert_allclose(boxes[order], [[10, 26, 30, 46], [11, 26, 31, 46]])
+
+
+def test_preannotate_folder_writes_yolo_labels(tmp_path):
+    pytest.importorskip("onnxruntime")
+    model_path = str(tmp_path / "model.onnx")
+    fixed_output_model(model_path)
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    for name in ["a", "b", "c"]:
+        Image.new("RGB", (128, 64)).save(image_dir / f"{name}.png")
+    # Labeled images are skipped
+    (image_dir / "c.txt").write_text("1 0.5 0.5 0.1 0.1\n")
+
+    counts = preannotate_folder(str(image_dir), model_path, batch_size=2, log=quiet, max_workers=1)
+    assert counts == {"images": 2, "boxes": 4, "failed": 0}
+    for name in ["a", "b"]:
+        with open(image_dir / f"{name}.txt") as f:
+            assert f.read() == ("0 0.312500 0.625000 0.312500 0.625000\n"
+                                "1 0.328125 0.625000 0.312500 0.625000\n")
+    assert read_yolo_labels(os.path.join(image_dir, "c.txt"))[0].tolist() == [1]
@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from conftest import BOXES, CLASSES, IMAGES, quiet
+from core.catalog import DatasetCatalog
+from core.coco import yolo_to_coco
+from core.splitter import BASE_DATASET, DATASET_SPLITS, organize_files, split_label_files, write_split
+from core.yolo_labels import iter_label_files
+
+
+@pytest.mark.parametrize("mode", ["hardlink", "symlink"])
+def test_linked_split_is_not_exported_again(dataset_dir, mode):
+    splits = write_split(dataset_dir, 0.6, 0.2, 0.2, mode=mode, log=quiet)
+    assert sum(len(images) for images in splits.values()) == IMAGES
+    assert os.listdir(os.path.join(dataset_dir, BASE_DATASET, "train", "labels"))
+
+    assert len(list(iter_label_files(dataset_dir))) == IMAGES
+    with DatasetCatalog(dataset_dir) as catalog:
+        catalog.refresh()
+        assert len(catalog.image_paths(dataset_dir)) == IMAGES
+
+    output_json = os.path.join(dataset_dir, "coco.json")
+    yolo_to_coco(dataset_dir, {class_id: f"class{class_id}" for class_id in range(CLASSES)}, log=quiet,
+                 output_json=output_json)
+    with open(output_json, "r", encoding="utf-8") as f:
+        coco = json.load(f)
+    assert len(coco["images"]) == IMAGES
+    assert len(coco["annotations"]) == IMAGES * BOXES
+
+
+
+def names(count, start=0):
+    return [f"frame{index:05d}.txt" for index in range(start, start + count)]
+
+
+def test_split_depends_only_on_the_stems():
+    splits = split_label_files(names(300), 0.6, 0.2)
+    assert sum(len(files) for files in splits.values()) == 300
+    assert split_label_files(list(reversed(names(300))), 0.6, 0.2) == splits
+    # The same stems with another extension land in the same splits
+    images = split_label_files([name.replace(".txt", ".png") for name in names(300)], 0.6, 0.2)
+    assert {split: [name.replace(".png", ".txt") for name in files] for split, files in images.items()} == splits
+    assert 150 < len(splits["train"]) < 210
+
+
+def test_existing_files_keep_their_split():
+    # An earlier run, e.g. with other ratios, placed every file in test
+    existing = {name[:-4]: "test" for name in names(100)}
+    splits = split_label_files(names(150), 0.6, 0.2, existing)
+    assert set(names(100)) <= set(splits["test"])
+    # The new files are placed as if they were split on their own
+    fresh = split_label_files(names(50, start=100), 0.6, 0.2)
+    for split in DATASET_SPLITS:
+        assert [name for name in splits[split] if name not in names(100)] == fresh[split]
+
+
+def test_organize_files_only_moves_new_files(dataset_dir, tmp_path):
+    # Keep some images back, they are added after the first run
+    held_back = tmp_path / "held_back"
+    held_back.mkdir()
+    for name in sorted(os.listdir(dataset_dir))[:20]:
+        shutil.move(os.path.join(dataset_dir, name), held_back / name)
+
+    first = organize_files(dataset_dir, 0.6, 0.2, 0.2, log=quiet)
+    assert sum(len(files) for files in first.values()) == IMAGES - 10
+    placed = {split: sorted(os.listdir(os.path.join(dataset_dir, BASE_DATASET, split, "labels")))
+              for split in DATASET_SPLITS}
+
+    new_labels = sorted(name for name in os.listdir(held_back) if name.endswith(".txt"))
+    for name in os.listdir(held_back):
+        shutil.move(held_back / name, os.path.join(dataset_dir, name))
+    second = organize_files(dataset_dir, 0.6, 0.2, 0.2, log=quiet)
+    assert sorted(name for files in second.values() for name in files) == new_labels
+    for split in DATASET_SPLITS:
+        labels = set(os.listdir(os.path.join(dataset_dir, BASE_DATASET, split, "labels")))
+        # Every file of the first run is still in its split, next to the new ones
+        assert set(placed[split]) | set(second[split]) == labels
+        images = os.listdir(os.path.join(dataset_dir, BASE_DATASET, split, "images"))
+        assert len(images) == len(labels)
+    assert not [name for name in os.listdir(dataset_dir) if name.endswith((".png", ".txt"))]
+
+
+def test_strata_keep_every_class_near_the_ratios():
+    files = names(1000)
+    # A rare class in every 20th file, the rest share a common class
+    strata = {name: "rare" if index % 20 == 0 else "common" for index, name in enumerate(files)}
+    splits = split_label_files(files, 0.6, 0.2, strata=strata)
+    for stratum, total in [("rare", 50), ("common", 950)]:
+        for split, ratio in zip(DATASET_SPLITS, [0.6, 0.2, 0.2]):
+            count = sum(1 for name in splits[split] if strata[name] == stratum)
+            assert abs(count - ratio * total) <= 1, (stratum, split, count)
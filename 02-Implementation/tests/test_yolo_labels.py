@@ -0,0 +1,41 @@
+import numpy as np
+
+from core.yolo_labels import format_yolo_labels, parse_yolo_text, xyxy_to_xywhn, xywhn_to_xyxy
+
+
+def test_parse_well_formed_text():
+    class_ids, boxes, invalid = parse_yolo_text("0 0.5 0.5 0.2 0.4\n2 0.1 0.2 0.3 0.4\n\n")
+    assert class_ids.dtype == np.int32 and boxes.dtype == np.float32
+    np.testing.assert_array_equal(class_ids, [0, 2])
+    np.testing.assert_allclose(boxes, [[0.5, 0.5, 0.2, 0.4], [0.1, 0.2, 0.3, 0.4]])
+    assert invalid == []
+
+
+def test_parse_reports_invalid_lines():
+    class_ids, boxes, invalid = parse_yolo_text("1 0.5 0.5 0.2 0.4\n1 0.5 0.5\nx 0.1 0.2 0.3 0.4\n")
+    np.testing.assert_array_equal(class_ids, [1])
+    assert boxes.shape == (1, 4)
+    assert invalid == ["1 0.5 0.5", "x 0.1 0.2 0.3 0.4"]
+
+
+def test_parse_empty_text():
+    class_ids, boxes, invalid = parse_yolo_text(" \n")
+    assert class_ids.shape == (0,) and boxes.shape == (0, 4) and invalid == []
+
+
+def test_format_round_trip():
+    class_ids = np.array([3, 0])
+    boxes = np.array([[0.25, 0.5, 0.125, 0.75], [0.5, 0.5, 1.0, 1.0]])
+    text = format_yolo_labels(class_ids, boxes)
+    assert text.splitlines()[0] == "3 0.250000 0.500000 0.125000 0.750000"
+    parsed_ids, parsed_boxes, invalid = parse_yolo_text(text)
+    np.testing.assert_array_equal(parsed_ids, class_ids)
+    np.testing.assert_allclose(parsed_boxes, boxes)
+    assert invalid == []
+
+
+def test_box_conversions_are_inverse():
+    boxes = np.array([[0.5, 0.5, 0.2, 0.4], [0.1, 0.9, 0.2, 0.2]])
+    xyxy = xywhn_to_xyxy(boxes, 200, 100)
+    np.testing.assert_allclose(xyxy[0], [80, 30, 120, 70])
+    np.testing.assert_allclose(xyxy_to_xywhn(xyxy, 200, 100), boxes)